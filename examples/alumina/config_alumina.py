@@ -97,6 +97,12 @@ class Plan(plan.BasePlan):
         # copy experimental file
         gsas.gsas_copy_expfile(self.name, "TRIAL", "Test Parameters")
 
+        # restrict the TOF range of each histogram at low fidelity
+        if self.fidelity < 1.0:
+            for j in range(self.detectors[0].bank_number):
+                gsas.gsas_change_max_tof(j + 1, self.fidelity * self.detectors[0].max_tof,
+                                         debug=self.debug)
+
         # loop over phases
         for i, phase in enumerate(self.phases):
 
@@ -10,7 +10,7 @@ def gaussian_2d(x, y, scale=-30, mean=[2, 3]):
     and a scale factor that multiples the PDF.
     """
     var = stats.multivariate_normal(mean=mean, cov=[[0.5, 0], [0, 0.5]])
-    return scale * var.pdf([x, y])
+    return scale * var.pdf(numpy.stack([x, y], axis=-1))
 
 def analytical_function(x, y):
     """ The analytical response function to evaluate.
@@ -19,6 +19,9 @@ def analytical_function(x, y):
 
 class Plan(plan.BasePlan):
 
+    # compute works on arrays of parameter values
+    vectorized = True
+
     # required to have solution_file, state_file, num_solvers, and tag
     seed = 0
     configuration = {
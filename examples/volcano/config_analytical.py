@@ -7,6 +7,9 @@ from spotlight import plan
 
 class Plan(plan.BasePlan):
 
+    # compute works on arrays of parameter values
+    vectorized = True
+
     # required to have solution_file, state_file, and num_solvers
     configuration = {
         "solution_file" : "solution.db",
@@ -45,7 +48,7 @@ class Plan(plan.BasePlan):
 
         # get value at Gaussian function x and y
         var = stats.multivariate_normal(mean=[0, 0], cov=[[0.5, 0],[0, 0.5]])
-        gauss = -50.0 * var.pdf([x, y])
+        gauss = -50.0 * var.pdf(numpy.stack([x, y], axis=-1))
 
         # get value at volcano function x and y
         r = numpy.sqrt(x**2 + y**2)
@@ -0,0 +1,162 @@
+""" This module contains classes for reusing cost function values of parameter
+vectors that were already evaluated.
+"""
+
+import collections
+import math
+import os
+import pickle
+import socket
+import threading
+
+class EvaluationCache:
+    """ This class stores cost function values keyed by the parameter vector.
+    Each parameter is rounded to the number of significant digits given by
+    ``relative_tolerance``, so parameter vectors that only differ by less
+    than about that relative amount share a value.
+
+    The cache holds at most ``max_size`` values and evicts the least recently
+    used value first. If ``path`` is given then new values are appended to a
+    file of this process in the directory ``path`` when ``save`` is called,
+    and values in all files in the directory are loaded when the cache is
+    created.
+
+    Attributes
+    ----------
+    relative_tolerance : float
+        The relative tolerance for parameter vectors to share a value.
+    max_size : {None, int}
+        The maximum number of values in the cache.
+    path : {None, str}
+        Path of the directory to persist values.
+    hits : int
+        The number of lookups that found a value.
+    misses : int
+        The number of lookups that did not find a value.
+
+    Parameters
+    ----------
+    relative_tolerance : float
+        The relative tolerance for parameter vectors to share a value. Default
+        is ``1e-10``.
+    max_size : {None, int}
+        The maximum number of values in the cache. Default is ``None`` which
+        does not limit the number of values.
+    path : {None, str}
+        Path of the directory to persist values. Default is ``None`` which does
+        not persist values.
+    """
+
+    def __init__(self, relative_tolerance=1e-10, max_size=None, path=None):
+        if not 0.0 < relative_tolerance < 1.0:
+            raise ValueError("The relative tolerance of the cache must be between 0 and 1!")
+        self.relative_tolerance = relative_tolerance
+        self.max_size = max_size
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._digits = max(1, int(round(-math.log10(relative_tolerance))))
+        self._values = collections.OrderedDict()
+        self._unsaved = []
+        self._lock = threading.Lock()
+        if self.path is not None:
+            self.load()
+
+    def __len__(self):
+        return len(self._values)
+
+    def key(self, p):
+        """ Returns the key of a parameter vector.
+
+        Parameters
+        ----------
+        p : list
+            A `list` of the floating-point values.
+
+        Returns
+        -------
+        tuple
+            The parameters rounded to the significant digits of the cache.
+        """
+        return tuple("{:.{}e}".format(float(x), self._digits - 1) for x in p)
+
+    def get(self, p):
+        """ Returns the value of a parameter vector, or ``None`` if there is
+        no value in the cache.
+
+        Parameters
+        ----------
+        p : list
+            A `list` of the floating-point values.
+
+        Returns
+        -------
+        {None, float}
+            The value of the cost function.
+        """
+        key = self.key(p)
+        with self._lock:
+            value = self._values.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._values.move_to_end(key)
+            return value
+
+    def put(self, p, value):
+        """ Adds the value of a parameter vector to the cache.
+
+        Parameters
+        ----------
+        p : list
+            A `list` of the floating-point values.
+        value : float
+            The value of the cost function.
+        """
+        key = self.key(p)
+        with self._lock:
+            self._insert(key, float(value))
+            if self.path is not None:
+                self._unsaved.append((key, float(value)))
+
+    def load(self):
+        """ Adds the values in all files in the directory ``path`` to the cache.
+        """
+        if not os.path.isdir(self.path):
+            return
+        for fname in sorted(os.listdir(self.path)):
+            with open(os.path.join(self.path, fname), "rb") as fp:
+                while True:
+                    try:
+                        items = pickle.load(fp)
+                    except (EOFError, pickle.UnpicklingError):
+                        break
+                    with self._lock:
+                        for key, value in items:
+                            self._insert(key, value)
+
+    def save(self):
+        """ Appends the values added since the last call to the file of this
+        process in the directory ``path``.
+        """
+        if self.path is None:
+            return
+        with self._lock:
+            items, self._unsaved = self._unsaved, []
+        if not items:
+            return
+        if not os.path.exists(self.path):
+            os.makedirs(self.path, exist_ok=True)
+        output_file = os.path.join(self.path, "{}_{}.pkl".format(socket.gethostname(), os.getpid()))
+        with open(output_file, "ab") as fp:
+            pickle.dump(items, fp)
+
+    def _insert(self, key, value):
+        """ Adds a value and evicts the least recently used values if the cache
+        is full.
+        """
+        self._values[key] = value
+        self._values.move_to_end(key)
+        while self.max_size is not None and len(self._values) > self.max_size:
+            self._values.popitem(last=False)
@@ -0,0 +1,115 @@
+""" This module contains classes for deciding when to checkpoint a local solver.
+"""
+
+import math
+from spotlight import container
+
+class CheckpointPolicy(container.Container):
+    """ This class chooses the number of ``Solver.step`` calls between
+    checkpoints.
+
+    With only ``stride`` the number of steps between checkpoints is fixed.
+    Otherwise, the time of a step and the time of writing a checkpoint are
+    measured as the optimization runs and the stride is chosen so that a
+    checkpoint is written about every ``seconds`` of stepping, but never so
+    often that writing checkpoints takes more than ``max_overhead_fraction``
+    of the wall time.
+
+    Attributes
+    ----------
+    stride : int
+        Number of steps before the first measurement, or between every
+        checkpoint if the policy is not adaptive.
+    seconds : {None, float}
+        Target wall time in seconds between checkpoints.
+    max_overhead_fraction : {None, float}
+        Maximum fraction of wall time spent writing checkpoints.
+    smoothing : float
+        Weight of the latest measurement in the moving averages of the step
+        and write times.
+    step_time : {None, float}
+        Moving average of the time in seconds of a single step.
+    write_time : {None, float}
+        Moving average of the time in seconds of writing a checkpoint.
+
+    Parameters
+    ----------
+    stride : int
+        Number of steps before the first measurement, or between every
+        checkpoint if the policy is not adaptive. Default is 1.
+    seconds : {None, float}
+        Target wall time in seconds between checkpoints.
+    max_overhead_fraction : {None, float}
+        Maximum fraction of wall time spent writing checkpoints.
+    smoothing : float
+        Weight of the latest measurement in the moving averages. Default
+        is 0.5.
+    """
+
+    def __init__(self, stride=1, seconds=None, max_overhead_fraction=None, smoothing=0.5):
+        super().__init__(stride=stride, seconds=seconds,
+                         max_overhead_fraction=max_overhead_fraction,
+                         smoothing=smoothing)
+        if self.max_overhead_fraction is not None and \
+                not 0.0 < self.max_overhead_fraction < 1.0:
+            raise ValueError("The maximum checkpoint overhead fraction must be between 0 and 1!")
+        self.step_time = None
+        self.write_time = None
+
+    @property
+    def adaptive(self):
+        """ Returns if the stride is chosen from measured times.
+        """
+        return self.seconds is not None or self.max_overhead_fraction is not None
+
+    @property
+    def next_stride(self):
+        """ Returns the number of steps to take before the next checkpoint.
+        """
+
+        # use fixed stride until both times have been measured
+        if not self.adaptive or self.step_time is None or self.write_time is None:
+            return max(1, int(self.stride))
+        step_time = max(self.step_time, 1e-9)
+
+        # stride that writes a checkpoint about every number of seconds
+        stride = 1
+        if self.seconds is not None:
+            stride = max(stride, int(self.seconds / step_time))
+
+        # smallest stride that keeps the overhead under the maximum fraction
+        if self.max_overhead_fraction is not None:
+            fraction = self.max_overhead_fraction
+            stride = max(stride, math.ceil(self.write_time * (1.0 - fraction) / (fraction * step_time)))
+
+        return stride
+
+    def update_step(self, duration, nsteps):
+        """ Records the time taken for a number of steps.
+
+        Parameters
+        ----------
+        duration : float
+            Time in seconds of the steps.
+        nsteps : int
+            Number of steps taken.
+        """
+        if nsteps > 0:
+            self.step_time = self._average(self.step_time, duration / nsteps)
+
+    def update_write(self, duration):
+        """ Records the time taken to write a checkpoint.
+
+        Parameters
+        ----------
+        duration : float
+            Time in seconds of writing the checkpoint.
+        """
+        self.write_time = self._average(self.write_time, duration)
+
+    def _average(self, average, value):
+        """ Returns the updated exponential moving average.
+        """
+        if average is None:
+            return value
+        return self.smoothing * value + (1.0 - self.smoothing) * average
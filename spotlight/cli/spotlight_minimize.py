@@ -3,13 +3,24 @@
 """
 
 import argparse
+import json
+import multiprocessing
 import numpy
 import os
 import socket
+import sys
+import threading
 import time
 from mystic import termination
 from mystic import tools
+from spotlight import early_stop
+from spotlight import filesystem
+from spotlight import gsas
+from spotlight import sampling
+from spotlight import streams
+from spotlight import timing
 from spotlight import version
+from spotlight.io import checkpoint_writer
 from spotlight.io import configuration_file
 from spotlight.io import solution_file
 from spotlight.io import state_file
@@ -29,6 +40,648 @@ except ImportError:
     size = 1
     rank = 0
 
+# message tags for dynamic scheduling of walkers
+REQUEST_TAG = 1
+WALKER_TAG = 2
+
+def get_walker_tag(config, index, seed):
+    """ Returns the archive key of a walker. The key only depends on the global
+    index of the walker so that the same walker can be resumed regardless of
+    which process runs it.
+
+    Parameters
+    ----------
+    config : ConfigurationFile
+        The configuration of the optimization.
+    index : int
+        Global index of the walker.
+    seed : int
+        The base random seed.
+
+    Returns
+    -------
+    str
+        The key used for the walker in the solution and state archives.
+    """
+    rank_i, i = divmod(index, config.num_solvers)
+    return "_".join(map(str, [rank_i, i, config.tag if hasattr(config, "tag") else seed + rank_i]))
+
+def get_initial_points(config, nwalkers, seed):
+    """ Returns the starting points of all walkers indexed by the global index
+    of the walker. The points are drawn at once with a random number generator
+    seeded with the base random seed, so a walker starts from the same point
+    regardless of which process runs it.
+
+    Parameters
+    ----------
+    config : ConfigurationFile
+        The configuration of the optimization.
+    nwalkers : int
+        The total number of walkers.
+    seed : int
+        The base random seed.
+
+    Returns
+    -------
+    {None, numpy.array}
+        An array with shape ``(nwalkers, ndim)`` of starting points, or
+        ``None`` if the sampling method cannot draw the points before the
+        walkers start or the walkers are ensemble solvers.
+    """
+    method = sampling.sampling_methods[config.solver_kwargs["sampling_method"]]
+    if not method.predraw or config.solver_kwargs.get("ensemble_solver"):
+        return None
+    sampler = method(config.lower_bounds, config.upper_bounds,
+                     random_state=numpy.random.RandomState(seed))
+    return sampler.sample(nwalkers)
+
+def run_walker(config, cost, writer, stopper, index, seed, initial_points=None,
+               global_streams=True):
+    """ Runs a single walker to termination. If there is a previous state for
+    the walker in the archives then the walker resumes from there.
+
+    Parameters
+    ----------
+    config : ConfigurationFile
+        The configuration of the optimization.
+    cost : Plan
+        A refinement plan instance.
+    writer : CheckpointWriter
+        The writer for the solution and state archives.
+    stopper : EarlyStop
+        Decides when all walkers should stop.
+    index : int
+        Global index of the walker.
+    seed : int
+        The base random seed.
+    initial_points : {None, numpy.array}
+        The starting points of all walkers indexed by the global index of the
+        walker. Default is ``None`` which draws the starting point of a new
+        walker with the sampling method of the solver.
+    global_streams : bool
+        If the walker sets its random number streams as the global generators
+        while it steps, see ``streams.WalkerRandomState``. Default is ``True``.
+    """
+    if stopper.stopped:
+        return
+    local_tag = get_walker_tag(config, index, seed)
+    i = index % config.num_solvers
+    fp_sol = writer.fp_sol
+    fp_state = writer.fp_state
+
+    # check the manifest to skip terminated walkers without loading them
+    if fp_sol.manifest.is_terminated(local_tag):
+        print("Optimization loop already terminated for {}".format(local_tag))
+        return
+
+    # check if there is a previous state for a local solver
+    fp_sol.arch.load(local_tag)
+    fp_state.arch.load(local_tag)
+    if local_tag in fp_sol.arch.keys() and local_tag in fp_state.arch.keys():
+
+        # if the local solver has not terminated then start from there
+        # we have to explicltly set the termination conditions because Mystic
+        # parses ``__doc__`` for getting the conditions YIKES!
+        if fp_sol.arch[local_tag][4] == 0:
+            print("Loading a previous state for {}".format(local_tag))
+            local_solver = fp_state.arch[local_tag]
+            local_solver.local_solver.SetEvaluationLimits(
+                local_solver.max_iterations,
+                local_solver.max_evaluations)
+            local_solver.stop = termination.NormalizedChangeOverGeneration(
+                local_solver.stop_change, local_solver.stop_generations)
+            if local_solver.random_state is not None:
+                local_solver.random_state.global_streams = global_streams
+
+        # otherwise the local solver has terminated
+        # so record it in the manifest for the next restart
+        else:
+            print("Optimization loop already terminated for {}".format(local_tag))
+            sol = fp_sol.arch[local_tag]
+            fp_sol.manifest.update(local_tag, True, sol[3], sol[7])
+            return
+
+    # if there is not a previous state initialize local solver
+    else:
+        print("Initializing a state for {}".format(local_tag))
+        # the walker draws random numbers from its own streams
+        kwargs = {} if initial_points is None else {"initial_point" : initial_points[index]}
+        local_solver = config.get_solver(arch=fp_sol, iteration=i,
+                                         random_state=streams.WalkerRandomState(
+                                             seed, index, global_streams=global_streams),
+                                         **kwargs)
+
+    # print statement
+    print("Process {} of {} running walker {} of {} on {}".format(
+              rank + 1, size, i + 1, config.num_solvers, hostname))
+
+    # only count timings and failed evaluations from here on for this walker
+    timing.profiler.pop_walker()
+    cost.pop_failures()
+    cost.pop_cache_counts()
+    cost.pop_surrogate_counts()
+    if cost.surrogate is not None:
+        cost.surrogate.reset()
+    cost.pop_fidelity_counts()
+    if cost.fidelity_screen is not None:
+        cost.fidelity_screen.reset()
+        cost.fidelity_screen.pop_values()
+
+    # main optimization loop with checkpointing
+    policy = config.get_checkpoint_policy()
+    if policy is not None:
+        stop = False
+        while not stop:
+
+            # set timer
+            t_start = time.time()
+
+            # take steps in optimization
+            nsteps = 0
+            for _ in range(policy.next_stride):
+                stop = local_solver.step(cost)
+                nsteps += 1
+                if stop:
+                    break
+
+            # end timer
+            duration = time.time() - t_start
+            policy.update_step(duration, nsteps)
+
+            # save output
+            t_start = time.time()
+            writer.save(local_tag, local_solver, duration, get_walker_info(cost))
+            policy.update_write(time.time() - t_start)
+
+            # stop before termination if the ensemble of walkers is done
+            if stopper.update(local_solver.local_solver.bestEnergy):
+                break
+
+    # main optimization loop without checkpointing
+    else:
+        t_start = time.time()
+        local_solver.solve(cost)
+        duration = time.time() - t_start
+        writer.save(local_tag, local_solver, duration, get_walker_info(cost))
+        stopper.update(local_solver.local_solver.bestEnergy)
+
+    # wait for the final checkpoint of the walker
+    writer.flush()
+
+    # print statement
+    print("Evaluation time for process {} of {} running walker {} of {} on {} is {}s".format(
+              rank, size, i + 1, config.num_solvers, hostname, fp_sol.arch[local_tag][5]))
+    failures = fp_sol.arch[local_tag][8].get("failures")
+    if failures:
+        print("Failed evaluations for walker {} of {} are {}".format(
+                  i + 1, config.num_solvers, failures))
+    cache_counts = fp_sol.arch[local_tag][8].get("cache")
+    if cache_counts:
+        print("Cache lookups for walker {} of {} are {}".format(
+                  i + 1, config.num_solvers, cache_counts))
+    surrogate_counts = fp_sol.arch[local_tag][8].get("surrogate")
+    if surrogate_counts:
+        print("Surrogate screening for walker {} of {} is {}".format(
+                  i + 1, config.num_solvers, surrogate_counts))
+    fidelity_info = fp_sol.arch[local_tag][8].get("fidelity")
+    if fidelity_info:
+        print("Fidelity screening for walker {} of {} is {}".format(
+                  i + 1, config.num_solvers,
+                  {key : fidelity_info.get(key, 0) for key in ["low", "full", "screened"]}))
+
+def run_walkers(config, cost, writer, stopper, indices, seed, nthreads=1, workspace=None,
+                initial_points=None):
+    """ Runs walkers one after another. If ``nthreads`` is greater than one
+    then that many walkers run at the same time in separate threads, which
+    overlaps the time walkers spend waiting on external programs such as GSAS.
+    Walkers in threads do not set their random number streams as the global
+    generators, since they would take the streams of each other.
+
+    Each thread has its own refinement plan and works in its own directory
+    ``<tmp_dir>_<rank>_<thread>`` which is set with ``gsas.set_working_dir``.
+    Thread directories are cloned from the prepared workspace if there is
+    one, otherwise the refinement plan of each thread is initialized in its
+    directory.
+
+    Parameters
+    ----------
+    config : ConfigurationFile
+        The configuration of the optimization.
+    cost : {None, Plan}
+        A refinement plan instance used if there is a single thread.
+    writer : CheckpointWriter
+        The writer for the solution and state archives.
+    stopper : EarlyStop
+        Decides when all walkers should stop.
+    indices : iterable
+        The global indices of the walkers to run.
+    seed : int
+        The base random seed.
+    nthreads : int
+        Number of walkers to run at the same time. Default is 1.
+    workspace : {None, str}
+        Path of the prepared workspace to clone.
+    initial_points : {None, numpy.array}
+        The starting points of all walkers, see ``get_initial_points``.
+    """
+
+    # run walkers in this thread
+    if nthreads == 1:
+        for index in indices:
+            run_walker(config, cost, writer, stopper, index, seed, initial_points)
+        return
+
+    # every thread takes the next walker index when it finishes a walker
+    indices = iter(indices)
+    lock = threading.Lock()
+    errors = []
+    def run_thread(thread_dir):
+        gsas.set_working_dir(thread_dir)
+        try:
+            thread_cost = config.get_refinement_plan(initialize=workspace is None)
+            while True:
+                with lock:
+                    index = next(indices, None)
+                if index is None:
+                    return
+                run_walker(config, thread_cost, writer, stopper, index, seed, initial_points,
+                           global_streams=False)
+        except BaseException as error:
+            errors.append(error)
+
+    # make a directory for each thread next to the directory of this process
+    # so relative paths in the refinement plan are the same
+    threads = []
+    for thread in range(nthreads):
+        thread_dir = "{}_{}".format(os.getcwd(), thread)
+        if workspace:
+            filesystem.clone(workspace, thread_dir,
+                             method=getattr(config, "workspace_clone", "reflink"))
+        else:
+            filesystem.mkdir(thread_dir)
+        threads.append(threading.Thread(target=run_thread, args=(thread_dir,)))
+
+    # run threads
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise RuntimeError("A walker thread failed!") from errors[0]
+
+def get_walker_info(cost):
+    """ Returns the extra information to store with a checkpoint of a walker.
+    This is the number of failed evaluations, cache lookups, and screened
+    parameter vectors of the walker since the previous checkpoint and, if
+    profiling, the timing statistics of the walker. New values in the cache
+    are also saved.
+
+    Parameters
+    ----------
+    cost : Plan
+        The refinement plan instance of the walker.
+
+    Returns
+    -------
+    info : dict
+        The information to merge into the solution archive.
+    """
+    info = {"failures" : cost.pop_failures()}
+    if cost.cache is not None:
+        info["cache"] = cost.pop_cache_counts()
+        cost.cache.save()
+    if cost.surrogate is not None:
+        info["surrogate"] = cost.pop_surrogate_counts()
+    if cost.fidelity_screen is not None:
+        info["fidelity"] = cost.pop_fidelity_counts()
+        info["fidelity"].update(cost.fidelity_screen.pop_values())
+    if timing.profiler.enabled:
+        info["timing"] = timing.profiler.pop_walker()
+    return info
+
+def report_profile(fp_sol):
+    """ Writes the timing statistics of this process next to the solution
+    archive and prints a summary. With MPI, rank 0 also prints a summary of
+    all ranks.
+
+    Parameters
+    ----------
+    fp_sol : SolutionFile
+        The solution archive.
+    """
+    if not timing.profiler.enabled:
+        return
+    output_file = timing.profiler.save(fp_sol.path + ".profile", rank=rank, size=size,
+                                       hostname=hostname)
+    wall_time = time.time() - timing.profiler.t_start
+    print("Timing of process {} of {} on {} written to {}\n{}".format(
+              rank + 1, size, hostname, output_file,
+              timing.summary(timing.profiler.stats, wall_time)))
+    if comm:
+        gathered = comm.gather((timing.profiler.stats, wall_time), root=0)
+        if rank == 0:
+            print_profile_summary(gathered)
+
+def print_profile_summary(gathered):
+    """ Prints a summary of the timing statistics of all processes.
+
+    Parameters
+    ----------
+    gathered : list
+        A ``list`` of tuples of the statistics and the wall time of each process.
+    """
+    stats = {}
+    for other, _ in gathered:
+        timing.merge_statistics(stats, other)
+    wall_time = sum(wall_time for _, wall_time in gathered)
+    print("Timing of all {} processes\n{}".format(len(gathered), timing.summary(stats, wall_time)))
+
+def get_checkpoint_writer(config, fp_sol, fp_state):
+    """ Returns a writer for checkpoints. If ``checkpoint_async`` is set in the
+    configuration file then checkpoints are written in a background thread,
+    which is flushed when the process exits or is terminated.
+
+    Parameters
+    ----------
+    config : ConfigurationFile
+        The configuration of the optimization.
+    fp_sol : SolutionFile
+        The solution archive.
+    fp_state : StateFile
+        The state archive.
+
+    Returns
+    -------
+    writer : CheckpointWriter
+        The writer for the solution and state archives.
+    """
+    background = bool(getattr(config, "checkpoint_async", False))
+    writer = checkpoint_writer.CheckpointWriter(fp_sol, fp_state, background=background)
+    if background:
+        writer.close_on_exit()
+    return writer
+
+def close_checkpoint_writer(writer):
+    """ Writes all pending checkpoints and the status of the walkers that did
+    not terminate to the manifest, and prints how much archive I/O was
+    hidden from the optimization loop and how long the optimization loop spent
+    taking snapshots of the local solvers.
+
+    Parameters
+    ----------
+    writer : CheckpointWriter
+        The writer for the solution and state archives.
+    """
+    writer.close()
+    writer.fp_sol.manifest.flush()
+    if writer.background:
+        print("Process {} of {} wrote {} of {} checkpoints and hid {}s of {}s archive I/O "
+              "after {}s of snapshots".format(
+                  rank + 1, size, writer.num_written, writer.num_saved,
+                  writer.hidden_time, writer.io_time, writer.snapshot_time))
+
+def get_early_stop(config, shared=None, nprocs=1):
+    """ Returns an instance that decides when all walkers should stop from the
+    ``target_cost`` and ``global_stop_generations`` options.
+
+    Parameters
+    ----------
+    config : ConfigurationFile
+        The configuration of the optimization.
+    shared : {None, multiprocessing.Array}
+        Shared memory if running on a local process pool.
+    nprocs : int
+        Number of processes in the local process pool.
+
+    Returns
+    -------
+    stopper : EarlyStop
+        Decides when all walkers should stop.
+    """
+    kwargs = dict(target_cost=getattr(config, "target_cost", None),
+                  stop_generations=getattr(config, "global_stop_generations", None))
+    if kwargs["target_cost"] is None and kwargs["stop_generations"] is None:
+        return early_stop.EarlyStop()
+    elif shared is not None:
+        return early_stop.SharedEarlyStop(shared, nprocs, **kwargs)
+    elif comm:
+        return early_stop.MPIEarlyStop(comm, **kwargs)
+    return early_stop.EarlyStop(**kwargs)
+
+def schedule_walkers(comm, num_walkers, stopper, poll_seconds=0.01, num_workers=None):
+    """ Hands out walker indices to the worker ranks on request until the
+    total number of walkers is exhausted or all walkers should stop. This
+    is run on rank 0 only, either alone or in a thread next to the walkers of
+    rank 0 which request walkers from it like the other ranks.
+
+    Parameters
+    ----------
+    comm : MPI.Comm
+        The communicator of all ranks.
+    num_walkers : int
+        The total number of walkers to run.
+    stopper : EarlyStop
+        Decides when all walkers should stop.
+    poll_seconds : float
+        Time in seconds between checking for requests.
+    num_workers : {None, int}
+        The number of ranks that request walkers. Default is ``None`` which
+        is all ranks except rank 0.
+    """
+    status = MPI.Status()
+    next_index = 0
+    num_workers = comm.Get_size() - 1 if num_workers is None else num_workers
+    while num_workers:
+
+        # keep sharing best values while waiting for a request
+        stopper.update(numpy.inf)
+        if not comm.Iprobe(source=MPI.ANY_SOURCE, tag=REQUEST_TAG, status=status):
+            time.sleep(poll_seconds)
+            continue
+
+        # hand out the next walker
+        comm.recv(source=status.Get_source(), tag=REQUEST_TAG)
+        if next_index < num_walkers and not stopper.stopped:
+            index = next_index
+            next_index += 1
+        else:
+            index = None
+            num_workers -= 1
+        comm.send(index, dest=status.Get_source(), tag=WALKER_TAG)
+
+def request_walkers(comm):
+    """ Yields walker indices from rank 0 until there are no walkers left. On
+    rank 0 the requests are answered by ``schedule_walkers`` in another thread.
+
+    Parameters
+    ----------
+    comm : MPI.Comm
+        The communicator of all ranks.
+
+    Yields
+    ------
+    int
+        The global index of the next walker to run.
+    """
+    while True:
+        comm.send(comm.Get_rank(), dest=0, tag=REQUEST_TAG)
+        index = comm.recv(source=0, tag=WALKER_TAG)
+        if index is None:
+            return
+        yield index
+
+def get_archive_path(path):
+    """ Returns the absolute path of an archive given in the configuration file.
+    Relative paths are relative to the directory ``spotlight_minimize`` was
+    launched from.
+    """
+    return path if path.startswith("/") else run_dir + "/" + path
+
+def prepare_workspace(opts):
+    """ Initializes the refinement plan once per node in a prepared workspace
+    if ``prepared_workspace`` is set in the configuration file. Every process
+    then clones the workspace into its temporary directory instead of
+    initializing the refinement plan itself.
+
+    Parameters
+    ----------
+    opts : argparse.Namespace
+        The command line arguments.
+
+    Returns
+    -------
+    workspace : {None, str}
+        Path of the prepared workspace, or ``None`` if there is no prepared
+        workspace.
+    """
+
+    # read configuration file without moving to a temporary dir
+    config = configuration_file.ConfigurationFile(opts.config_files, copy=False,
+                                                  config_overrides=opts.config_overrides)
+    if not getattr(config, "prepared_workspace", False):
+        return None
+
+    # the first rank on each node prepares the workspace of the node
+    # the workspace is named by host in case the run dir is on a shared filesystem
+    workspace = os.path.abspath("{}_prepared_{}".format(opts.tmp_dir, hostname))
+    node_comm = comm.Split_type(MPI.COMM_TYPE_SHARED) if comm else None
+    if node_comm is None or node_comm.Get_rank() == 0:
+        print("Process {} of {} is preparing workspace {}".format(rank + 1, size, workspace))
+        config.prepare_workspace(workspace)
+    if node_comm is not None:
+        node_comm.Barrier()
+        node_comm.Free()
+
+    return workspace
+
+def run_pool_worker(opts, worker, nprocs, queue, shared, workspace=None):
+    """ Runs walkers in a process of the local process pool. Each process
+    works in its own temporary directory and takes walker indices from a
+    shared queue until it receives ``None``.
+
+    Parameters
+    ----------
+    opts : argparse.Namespace
+        The command line arguments.
+    worker : int
+        Index of this process in the pool.
+    nprocs : int
+        Number of processes in the pool.
+    queue : multiprocessing.Queue
+        The queue of walker indices.
+    shared : multiprocessing.Array
+        Shared memory for deciding when all walkers should stop.
+    workspace : {None, str}
+        Path of the prepared workspace to clone.
+    """
+
+    # each process in the pool takes the place of a rank
+    global rank, size
+    rank, size = worker, nprocs
+    timing.profiler.enabled = opts.profile
+
+    # move to temporary dir, read configuration file, and get refinement plan
+    tmp_dir = "{}_{}".format(opts.tmp_dir, rank)
+    config = configuration_file.ConfigurationFile(opts.config_files, tmp_dir, change=True,
+                                                  config_overrides=opts.config_overrides,
+                                                  workspace=workspace)
+    cost = config.get_refinement_plan(initialize=workspace is None) if opts.threads == 1 else None
+
+    # set random seed
+    base_seed = config.seed if hasattr(config, "seed") else 0
+    numpy.random.seed(base_seed + rank)
+    tools.random_seed(base_seed + rank)
+    initial_points = get_initial_points(config, config.num_solvers * nprocs, base_seed)
+
+    # open the archive files shared by all processes
+    fp_sol = solution_file.SolutionFile(get_archive_path(config.solution_file), config,
+                                        config.solver_kwargs.get("sampling_method"))
+    fp_sol.manifest.load()
+    fp_state = state_file.StateFile(get_archive_path(config.state_file), load=False)
+    writer = get_checkpoint_writer(config, fp_sol, fp_state)
+    stopper = get_early_stop(config, shared=shared, nprocs=nprocs)
+
+    # run walkers until the queue is exhausted
+    run_walkers(config, cost, writer, stopper, iter(queue.get, None), base_seed,
+                nthreads=opts.threads, workspace=workspace, initial_points=initial_points)
+    stopper.finish()
+    close_checkpoint_writer(writer)
+    report_profile(fp_sol)
+
+def run_pool(opts):
+    """ Runs all walkers on a local process pool instead of MPI ranks.
+
+    Parameters
+    ----------
+    opts : argparse.Namespace
+        The command line arguments.
+    """
+
+    # read configuration file without moving to a temporary dir
+    config = configuration_file.ConfigurationFile(opts.config_files, copy=False,
+                                                  config_overrides=opts.config_overrides)
+
+    # write configuration to archive file for output data
+    output_file = get_archive_path(config.solution_file)
+    print("Writing configuration to {}".format(output_file))
+    solution_file.SolutionFile(output_file, config).save_config()
+
+    # fill the queue with the same walker budget as static scheduling
+    # with one rank per process and add a stop signal for each process
+    queue = multiprocessing.Queue()
+    for index in range(config.num_solvers * opts.nprocs):
+        queue.put(index)
+    for _ in range(opts.nprocs):
+        queue.put(None)
+
+    # run processes
+    workspace = prepare_workspace(opts)
+    shared = early_stop.SharedEarlyStop.create()
+    procs = [multiprocessing.Process(target=run_pool_worker,
+                                     args=(opts, worker, opts.nprocs, queue, shared, workspace))
+             for worker in range(opts.nprocs)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+
+    # check that all processes completed
+    for worker, proc in enumerate(procs):
+        if proc.exitcode != 0:
+            raise RuntimeError("Process {} exited with code {}!".format(worker, proc.exitcode))
+
+    # print a summary of the timing statistics written by each process
+    if opts.profile:
+        gathered = []
+        for proc in procs:
+            profile_file = os.path.join(output_file + ".profile",
+                                        "{}_{}.json".format(hostname, proc.pid))
+            with open(profile_file, "r") as fp:
+                data = json.load(fp)
+            gathered.append((data["stats"], data["wall_time"]))
+        print_profile_summary(gathered)
+    print("Finished!")
+
 def main():
 
     # parse command line
@@ -36,26 +689,65 @@ def main():
     parser.add_argument("--config-files", nargs="+", required=True)
     parser.add_argument("--config-overrides", nargs="+")
     parser.add_argument("--tmp-dir", default="tmp")
+    parser.add_argument("--schedule", default="static", choices=["static", "dynamic"],
+                        help="Either assign a fixed number of walkers to every rank, "
+                             "or have rank 0 hand out walkers to all ranks on demand. "
+                             "Rank 0 only runs walkers itself if MPI supports "
+                             "MPI_THREAD_MULTIPLE, otherwise it only hands out walkers.")
+    parser.add_argument("--nprocs", type=int, default=1,
+                        help="Run walkers on a local pool of processes instead of MPI ranks.")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="Run this many walkers at the same time in each process, "
+                             "each in its own directory. This helps when walkers spend "
+                             "most of their time waiting on external programs.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Record timing statistics of each walker and process, "
+                             "and print a summary at the end.")
     parser.add_argument("--verbose", action="store_true")
     parser.add_argument("--version", action=version.VersionAction)
     opts = parser.parse_args()
+    timing.profiler.enabled = opts.profile
+
+    # walker threads of a rank may communicate at the same time
+    if opts.threads < 1:
+        raise ValueError("The number of threads must be at least 1!")
+    if comm and opts.threads > 1 and MPI.Query_thread() < MPI.THREAD_MULTIPLE:
+        raise ValueError("Cannot use --threads since MPI does not support MPI_THREAD_MULTIPLE!")
+
+    # run on a local process pool
+    if opts.nprocs > 1:
+        if comm:
+            raise ValueError("Cannot use --nprocs when running with more than one MPI rank!")
+        run_pool(opts)
+        return
+
+    # in dynamic scheduling rank 0 hands out walkers from a thread and runs
+    # walkers itself if MPI allows it, otherwise it only hands out walkers
+    dynamic = opts.schedule == "dynamic" and comm is not None
+    master = dynamic and rank == 0
+    schedule_only = master and MPI.Query_thread() < MPI.THREAD_MULTIPLE
     
     # move to temporary dir, read configuration file, and get refinement plan
+    workspace = prepare_workspace(opts)
     tmp_dir = "{}_{}".format(opts.tmp_dir, rank)
     config = configuration_file.ConfigurationFile(opts.config_files, tmp_dir, change=True,
-                                                  config_overrides=opts.config_overrides)
-    cost = config.get_refinement_plan()
+                                                  config_overrides=opts.config_overrides,
+                                                  workspace=workspace)
+    if schedule_only or opts.threads > 1:
+        cost = None
+    else:
+        cost = config.get_refinement_plan(initialize=workspace is None)
     
     # set random seed
-    seed = config.seed if hasattr(config, "seed") else 0
-    seed += rank
+    base_seed = config.seed if hasattr(config, "seed") else 0
+    seed = base_seed + rank
     numpy.random.seed(seed)
     tools.random_seed(seed)
     
     # create an archive file for output data
-    output_file = config.solution_file if config.solution_file.startswith("/") \
-                      else run_dir + "/" + config.solution_file
-    fp_sol = solution_file.SolutionFile(output_file, config)
+    output_file = get_archive_path(config.solution_file)
+    fp_sol = solution_file.SolutionFile(output_file, config,
+                                        config.solver_kwargs.get("sampling_method"))
     if rank == 0:
         print("Rank 0 is writing configuration to {}".format(output_file))
         fp_sol.save_config()
@@ -63,76 +755,38 @@ def main():
         print("Rank {} is waiting".format(rank))
         comm.Barrier()
     
+    # read status of walkers from a previous run
+    fp_sol.manifest.load()
+
     # create an archive file for state data
-    output_file = config.state_file if config.state_file.startswith("/") \
-                      else run_dir + "/" + config.state_file
-    fp_state = state_file.StateFile(output_file)
+    fp_state = state_file.StateFile(get_archive_path(config.state_file), load=False)
     
     # run one of ensemble of solvers
-    for i in range(config.num_solvers):
-        local_tag = "_".join(map(str, [rank, i, config.tag if hasattr(config, "tag") else seed]))
-    
-        # check if there is a previous state for a local solver
-        fp_sol.arch.load(local_tag)
-        fp_state.arch.load(local_tag)
-        if local_tag in fp_sol.arch.keys() and local_tag in fp_state.arch.keys():
-    
-            # if the local solver has not terminated then start from there
-            # we have to explicltly set the termination conditions because Mystic
-            # parses ``__doc__`` for getting the conditions YIKES!
-            if fp_sol.arch[local_tag][4] == 0:
-                print("Loading a previous state for {}".format(local_tag))
-                local_solver = fp_state.arch[local_tag]
-                local_solver.local_solver.SetEvaluationLimits(
-                    local_solver.max_iterations,
-                    local_solver.max_evaluations)
-                local_solver.stop = termination.NormalizedChangeOverGeneration(
-                    local_solver.stop_change, local_solver.stop_generations)
-    
-            # otherwise initialize a local solver from configuration file
-            else:
-                print("Optimization loop already terminated for {}".format(local_tag))
-                continue
-    
-        # if there is not a previous state initialize local solver
+    # the total number of walkers is the same for either schedule
+    stopper = get_early_stop(config)
+    if schedule_only:
+        print("Rank 0 only hands out walkers since MPI does not support MPI_THREAD_MULTIPLE")
+        schedule_walkers(comm, config.num_solvers * size, stopper)
+    else:
+        if master:
+            scheduler = threading.Thread(target=schedule_walkers,
+                                         args=(comm, config.num_solvers * size, stopper),
+                                         kwargs={"num_workers" : size})
+            scheduler.start()
+        if dynamic:
+            indices = request_walkers(comm)
         else:
-            print("Initializing a state for {}".format(local_tag))
-            local_solver = config.get_solver(arch=fp_sol, iteration=i)
-    
-        # print statement
-        print("Process {} of {} running walker {} of {} on {}".format(
-                  rank + 1, size, i + 1, config.num_solvers, hostname))
-    
-        # main optimization loop with checkpointing
-        if hasattr(config, "checkpoint_stride"):
-            stop = False
-            while not stop:
-    
-                # set timer
-                t_start = time.time()
-        
-                # take steps in optimization
-                for _ in range(config.checkpoint_stride):
-                    stop = local_solver.step(cost)
-    
-                # end timer
-                duration = time.time() - t_start
-    
-                # save output
-                fp_sol.save_data(local_tag, local_solver, duration)
-                fp_state.save_state(local_tag, local_solver)
-    
-        # main optimization loop without checkpointing
-        else:
-            t_start = time.time()
-            local_solver.solve(cost)
-            duration = time.time() - t_start
-            fp_sol.save_data(local_tag, local_solver, duration)
-            fp_state.save_state(local_tag, local_solver)
-    
-        # print statement
-        print("Evaluation time for process {} of {} running walker {} of {} on {} is {}s".format(
-                  rank, size, i + 1, config.num_solvers, hostname, fp_sol.arch[local_tag][5]))
+            indices = range(rank * config.num_solvers, (rank + 1) * config.num_solvers)
+        writer = get_checkpoint_writer(config, fp_sol, fp_state)
+        initial_points = get_initial_points(config, config.num_solvers * size, base_seed)
+        run_walkers(config, cost, writer, stopper, indices, base_seed,
+                    nthreads=opts.threads, workspace=workspace,
+                    initial_points=initial_points)
+        close_checkpoint_writer(writer)
+        if master:
+            scheduler.join()
+    stopper.finish()
+    report_profile(fp_sol)
     
     # finish
     if comm:
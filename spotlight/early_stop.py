@@ -0,0 +1,211 @@
+""" This module contains classes for stopping all walkers of an optimization
+once the ensemble of walkers is good enough or no longer improving.
+"""
+
+import numpy
+import threading
+import time
+
+class EarlyStop:
+    """ This class decides when all walkers should checkpoint and stop. The
+    processes running walkers share their best cost function value after every
+    checkpoint. Each time the best values are shared counts as a generation of
+    the ensemble.
+
+    The ensemble stops once the best value is less than or equal to
+    ``target_cost``, or once the best value has not improved for
+    ``stop_generations`` generations. Generations before any walker shared a
+    value do not count towards ``stop_generations``.
+
+    This base class is used when there is a single process. Walkers may run
+    in several threads of a process, so updates are serialized with a lock.
+
+    Attributes
+    ----------
+    target_cost : {None, float}
+        Stop once the best value is less than or equal to this value.
+    stop_generations : {None, int}
+        Stop once the best value has not improved for this many generations.
+    best : float
+        The best value shared by all processes.
+    generations : int
+        The number of times the best values were shared.
+    stagnant : int
+        The number of generations since the best value improved.
+    stopped : bool
+        If all walkers should stop.
+
+    Parameters
+    ----------
+    target_cost : {None, float}
+        Stop once the best value is less than or equal to this value.
+    stop_generations : {None, int}
+        Stop once the best value has not improved for this many generations.
+    """
+
+    def __init__(self, target_cost=None, stop_generations=None):
+        self.target_cost = target_cost
+        self.stop_generations = stop_generations
+        self.local_best = numpy.inf
+        self.best = numpy.inf
+        self.generations = 0
+        self.stagnant = 0
+        self.stopped = False
+        self._lock = threading.RLock()
+
+    def update(self, best):
+        """ Shares the best value of this process after a checkpoint.
+
+        Parameters
+        ----------
+        best : float
+            The best value found by a walker of this process.
+
+        Returns
+        -------
+        stopped : bool
+            If all walkers should stop.
+        """
+        with self._lock:
+            self.local_best = min(self.local_best, best)
+            if not self.stopped:
+                self._share(active=True)
+            return self.stopped
+
+    def finish(self):
+        """ Called when this process has no more walkers to run.
+        """
+        pass
+
+    def _share(self, active):
+        """ Shares the best values between processes.
+        """
+        self._generation(self.local_best)
+
+    def _generation(self, best):
+        """ Updates the best value of the ensemble and checks the stop conditions.
+        """
+        self.generations += 1
+        if best < self.best:
+            self.best = best
+            self.stagnant = 0
+        elif numpy.isfinite(self.best):
+            self.stagnant += 1
+        self._check()
+
+    def _check(self):
+        """ Checks the stop conditions.
+        """
+        if self.target_cost is not None and self.best <= self.target_cost:
+            print("Stopping all walkers since the best value {} reached the target {}".format(
+                      self.best, self.target_cost))
+            self.stopped = True
+        elif self.stop_generations is not None and self.stagnant >= self.stop_generations:
+            print("Stopping all walkers since the best value {} did not improve for {} generations".format(
+                      self.best, self.stagnant))
+            self.stopped = True
+
+class MPIEarlyStop(EarlyStop):
+    """ This class shares the best values between MPI ranks with a non-blocking
+    reduction so that no rank waits on another while its walkers are stepping.
+    Since every rank sees the same result of each reduction, all ranks stop in
+    the same generation.
+
+    Ranks that do not run walkers or have run all of their walkers keep
+    taking part in the reductions from ``finish`` until every rank is done.
+
+    Parameters
+    ----------
+    comm : MPI.Comm
+        The communicator of all ranks.
+    target_cost : {None, float}
+        Stop once the best value is less than or equal to this value.
+    stop_generations : {None, int}
+        Stop once the best value has not improved for this many generations.
+    poll_seconds : float
+        Time in seconds between checking reductions from ``finish``.
+    """
+
+    def __init__(self, comm, target_cost=None, stop_generations=None, poll_seconds=0.01):
+        super().__init__(target_cost=target_cost, stop_generations=stop_generations)
+        from mpi4py import MPI
+        self.op = MPI.MIN
+        self.comm = comm.Dup()
+        self.poll_seconds = poll_seconds
+        self.done = False
+        self._send = numpy.zeros(2)
+        self._recv = numpy.zeros(2)
+        self._request = None
+
+    def finish(self):
+        while not self.stopped and not self.done:
+            with self._lock:
+                self._share(active=False)
+            time.sleep(self.poll_seconds)
+
+    def _share(self, active):
+
+        # complete the previous reduction
+        # the second value is 1 only if every rank is no longer active
+        if self._request is not None:
+            if not self._request.Test():
+                return
+            self._request = None
+            self.done = self._recv[1] == 1.0
+            self._generation(self._recv[0])
+            if self.stopped or self.done:
+                return
+
+        # start the next reduction
+        self._send[:] = [self.local_best, 0.0 if active else 1.0]
+        self._request = self.comm.Iallreduce(self._send, self._recv, op=self.op)
+
+class SharedEarlyStop(EarlyStop):
+    """ This class shares the best values between the processes of a local
+    process pool through shared memory. Every ``nprocs`` updates from any of
+    the processes count as a generation.
+
+    Parameters
+    ----------
+    shared : multiprocessing.Array
+        A shared array of three doubles created with ``SharedEarlyStop.create``.
+    nprocs : int
+        Number of processes in the pool.
+    target_cost : {None, float}
+        Stop once the best value is less than or equal to this value.
+    stop_generations : {None, int}
+        Stop once the best value has not improved for this many generations.
+    """
+
+    def __init__(self, shared, nprocs, target_cost=None, stop_generations=None):
+        super().__init__(target_cost=target_cost, stop_generations=stop_generations)
+        self.shared = shared
+        self.nprocs = nprocs
+
+    @staticmethod
+    def create(context=None):
+        """ Returns the shared memory for the processes in a pool. It holds the
+        best value, the number of updates since the best value improved, and
+        a flag that is set when all walkers should stop.
+        """
+        import multiprocessing
+        context = multiprocessing if context is None else context
+        return context.Array("d", [numpy.inf, 0.0, 0.0])
+
+    def update(self, best):
+        with self._lock, self.shared.get_lock():
+            self.local_best = min(self.local_best, best)
+            if self.shared[2] == 0.0:
+                if self.local_best < self.shared[0]:
+                    self.shared[0] = self.local_best
+                    self.shared[1] = 0.0
+                elif numpy.isfinite(self.shared[0]):
+                    self.shared[1] += 1.0
+                self.best = self.shared[0]
+                self.generations += 1
+                self.stagnant = int(self.shared[1]) // self.nprocs
+                self._check()
+                self.shared[2] = 1.0 if self.stopped else 0.0
+            else:
+                self.stopped = True
+        return self.stopped
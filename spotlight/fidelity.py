@@ -0,0 +1,124 @@
+""" This module contains classes for screening parameter vectors with cheaper
+low-fidelity evaluations of the cost function before evaluating them at full
+fidelity.
+"""
+
+import collections
+import numpy
+
+class FidelityScreen:
+    """ This class decides which parameter vectors that were evaluated at low
+    fidelity are promoted to an evaluation at full fidelity.
+
+    A parameter vector is promoted if its low-fidelity value is not worse than
+    the best low-fidelity value of a promoted parameter vector plus ``margin``
+    times the absolute value of that best value. A parameter vector that is not
+    promoted is given its low-fidelity value plus the median difference of the
+    full-fidelity and low-fidelity values of recent promoted parameter vectors.
+    This value is never better than the best full-fidelity value, so a solver
+    does not accept a parameter vector that was not promoted as its best
+    solution.
+
+    Attributes
+    ----------
+    low_fidelity : float
+        The fidelity of the screening evaluations.
+    margin : float
+        The relative margin above the best low-fidelity value to promote.
+    best_low : {None, float}
+        The best low-fidelity value of a promoted parameter vector since the
+        last call to ``reset``.
+    best_full : {None, float}
+        The best full-fidelity value since the last call to ``reset``.
+
+    Parameters
+    ----------
+    low_fidelity : float
+        The fidelity of the screening evaluations. Must be between 0 and 1.
+        Default is ``0.5``.
+    margin : float
+        The relative margin above the best low-fidelity value to promote.
+        Default is ``0.05``.
+    """
+
+    def __init__(self, low_fidelity=0.5, margin=0.05):
+        if not 0.0 < low_fidelity < 1.0:
+            raise ValueError("The low fidelity must be between 0 and 1!")
+        self.low_fidelity = low_fidelity
+        self.margin = margin
+        self.best_low = None
+        self.best_full = None
+        self._differences = collections.deque(maxlen=20)
+        self._values = {"low_values" : [], "full_values" : []}
+
+    def reset(self):
+        """ Forgets the best values, e.g. before starting a new walker. The
+        differences of the fidelities are kept.
+        """
+        self.best_low = None
+        self.best_full = None
+
+    def promote(self, low_value):
+        """ Returns if a parameter vector should be evaluated at full fidelity.
+
+        Parameters
+        ----------
+        low_value : float
+            The low-fidelity value of the parameter vector.
+
+        Returns
+        -------
+        bool
+            If the parameter vector should be evaluated at full fidelity.
+        """
+        if self.best_low is None or self.best_full is None:
+            return True
+        return low_value <= self.best_low + self.margin * abs(self.best_low)
+
+    def add(self, low_value, full_value):
+        """ Adds the values of a promoted parameter vector.
+
+        Parameters
+        ----------
+        low_value : float
+            The low-fidelity value of the parameter vector.
+        full_value : float
+            The full-fidelity value of the parameter vector.
+        """
+        self._differences.append(full_value - low_value)
+        self._values["low_values"].append(float(low_value))
+        self._values["full_values"].append(float(full_value))
+        if self.best_low is None or low_value < self.best_low:
+            self.best_low = float(low_value)
+        if self.best_full is None or full_value < self.best_full:
+            self.best_full = float(full_value)
+
+    def estimate(self, low_value):
+        """ Returns the value given to a parameter vector that was not
+        promoted.
+
+        Parameters
+        ----------
+        low_value : float
+            The low-fidelity value of the parameter vector.
+
+        Returns
+        -------
+        float
+            The estimated full-fidelity value.
+        """
+        value = low_value + numpy.median(self._differences) if self._differences else low_value
+        return float(max(value, numpy.nextafter(self.best_full, numpy.inf)))
+
+    def pop_values(self):
+        """ Returns the values of the parameter vectors that were promoted
+        since the last call and starts recording again.
+
+        Returns
+        -------
+        values : dict
+            A ``dict`` with keys ``"low_values"`` and ``"full_values"`` and
+            value a ``list`` of the low-fidelity and full-fidelity values.
+        """
+        values, self._values = self._values, {"low_values" : [], "full_values" : []}
+        return values
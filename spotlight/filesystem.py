@@ -3,6 +3,7 @@
 
 import os
 import shutil
+import subprocess
 import sys
 
 def mkdir(run_dir, change=False):
@@ -66,3 +67,52 @@ def cp(paths, dest=None):
         paths_out = paths_out[0]
 
     return paths_out
+
+def clone(src, dest, method="copy"):
+    """ Clones the contents of a directory into another directory. Files that
+    already exist in the destination are replaced.
+
+    Parameters
+    ----------
+    src : str
+        Path of directory to clone.
+    dest : str
+        Path of destination directory.
+    method : str
+        Either ``"copy"`` to copy files, ``"reflink"`` to make copy-on-write
+        copies on filesystems that support it and copy files otherwise, or
+        ``"hardlink"`` to link files and copy them only if linking fails. Files
+        cloned with hardlinks share storage with the source directory, so they
+        must be replaced rather than modified in place.
+    """
+
+    # make copy-on-write copies of the whole directory
+    if method == "reflink":
+        mkdir(dest)
+        try:
+            subprocess.run(["cp", "-R", "-p", "--reflink=auto",
+                            os.path.join(src, "."), dest],
+                           check=True, stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL)
+            return
+        except (OSError, subprocess.CalledProcessError):
+            method = "copy"
+    elif method not in ["copy", "hardlink"]:
+        raise ValueError("Unknown method {} to clone a directory!".format(method))
+
+    # loop over files in source directory
+    for root, _, files in os.walk(src):
+        dest_root = os.path.join(dest, os.path.relpath(root, src))
+        mkdir(dest_root)
+        for fname in files:
+            src_path = os.path.join(root, fname)
+            dest_path = os.path.join(dest_root, fname)
+            if os.path.lexists(dest_path):
+                os.remove(dest_path)
+            if method == "hardlink":
+                try:
+                    os.link(src_path, dest_path)
+                    continue
+                except OSError:
+                    pass
+            shutil.copy2(src_path, dest_path)
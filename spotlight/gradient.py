@@ -0,0 +1,290 @@
+""" This module contains Mystic solvers that use finite-difference derivatives.
+The points of each finite-difference stencil are evaluated in a single batch,
+so with a pool of workers the time of an iteration is about the time of one
+evaluation rather than ``ndim + 1`` evaluations.
+"""
+
+import numpy
+from mystic.abstract_map_solver import AbstractMapSolver
+
+class FiniteDifferenceSolver(AbstractMapSolver):
+    """ This class is the base class for solvers that use forward differences.
+    Subclasses implement ``_Step``.
+
+    The step of each parameter is ``diff_step`` times the range between its
+    bounds, or ``diff_step`` times the larger of one and its absolute value if
+    it is not bounded. The step is taken towards the lower bound if a step
+    towards the upper bound would leave the bounds. Parameters with equal
+    lower and upper bounds are not varied.
+
+    Batches of points are evaluated with ``function_batch`` of the cost function
+    if it has one, e.g. a ``BasePlan``, and otherwise with the map set by
+    ``SetMapper``.
+
+    Parameters
+    ----------
+    dim : int
+        The number of parameters.
+    diff_step : float
+        The relative step of the finite differences. Default is ``1e-6``.
+    imax : int
+        The maximum number of points of a line search. Default is ``20``.
+    """
+
+    def __init__(self, dim, **kwds):
+        super().__init__(dim)
+        self.diff_step = kwds.get("diff_step", 1e-6)
+        self.imax = kwds.get("imax", 20)
+
+    def _SetEvaluationLimits(self, iterscale=1000, evalscale=1000):
+        super()._SetEvaluationLimits(iterscale, evalscale)
+
+    def _bounds(self):
+        """ Returns the lower and upper bounds as arrays.
+        """
+        if self._useStrictRange:
+            return numpy.asarray(self._strictMin, dtype=float), \
+                   numpy.asarray(self._strictMax, dtype=float)
+        return numpy.full(self.nDim, -numpy.inf), numpy.full(self.nDim, numpy.inf)
+
+    def _steps(self, x):
+        """ Returns the signed finite-difference step of each parameter.
+        """
+        lb, ub = self._bounds()
+        width = ub - lb
+        h = numpy.where(numpy.isfinite(width), width,
+                        numpy.maximum(1.0, numpy.abs(x))) * self.diff_step
+        return numpy.where(x + h > ub, -h, h)
+
+    def _evaluate_batch(self, cost, points):
+        """ Evaluates points in a batch and counts the evaluations.
+        """
+        points = numpy.atleast_2d(numpy.asarray(points, dtype=float))
+        raw = self._cost[1]
+        if not hasattr(raw, "function_batch"):
+            return numpy.array(list(self._map(cost, points, **self._mapconfig)),
+                               dtype=float)
+        values = numpy.asarray(raw.function_batch(points), dtype=float)
+        self._fcalls[0] += len(points)
+        for x, y in zip(points, values):
+            self._evalmon(x, y, self.id)
+        return values
+
+    def _forward_points(self, x):
+        """ Returns the steps and the points of a forward-difference stencil
+        around ``x`` for the parameters that are varied.
+        """
+        h = self._steps(x)
+        idxs = numpy.flatnonzero(h)
+        points = numpy.repeat(x[None, :], len(idxs), axis=0)
+        points[numpy.arange(len(idxs)), idxs] += h[idxs]
+        return h, idxs, points
+
+    def _process_inputs(self, kwds):
+        settings = super()._process_inputs(kwds)
+        settings.update({"diff_step" : self.diff_step, "imax" : self.imax})
+        [settings.update({i : j}) for (i, j) in kwds.items() if i in settings]
+        self.diff_step = settings["diff_step"]
+        self.imax = settings["imax"]
+        return settings
+
+class QuasiNewtonSolver(FiniteDifferenceSolver):
+    """ This class is a bounded quasi-Newton solver. Each iteration evaluates
+    the forward-difference gradient in one batch, takes a projected BFGS step
+    with a backtracking line search, and updates the inverse Hessian. Parameters
+    at a bound whose gradient points out of the bounds are held fixed for the
+    iteration.
+
+    Parameters
+    ----------
+    dim : int
+        The number of parameters.
+    diff_step : float
+        The relative step of the finite differences. Default is ``1e-6``.
+    imax : int
+        The maximum number of points of a line search. Default is ``20``.
+    """
+
+    def __init__(self, dim, **kwds):
+        super().__init__(dim, **kwds)
+        self._grad = None
+        self._hess_inv = None
+
+    def _gradient(self, cost, x, fx):
+        """ Returns the forward-difference gradient at ``x``.
+        """
+        h, idxs, points = self._forward_points(x)
+        grad = numpy.zeros(self.nDim)
+        if len(idxs):
+            grad[idxs] = (self._evaluate_batch(cost, points) - fx) / h[idxs]
+        return grad
+
+    def _Step(self, cost=None, ExtraArgs=None, **kwds):
+        settings = self._process_inputs(kwds)
+        callback = settings.get("callback", None)
+        cost = self._bootstrap_objective(cost, ExtraArgs)
+        lb, ub = self._bounds()
+
+        # evaluate the initial point
+        init = not len(self._stepmon)
+        if init:
+            x = numpy.clip(numpy.asarray(self.population[0], dtype=float).flatten(), lb, ub)
+            fx = float(cost(x))
+
+        # take a projected quasi-Newton step
+        else:
+            x = numpy.asarray(self.population[0], dtype=float)
+            fx = float(self.popEnergy[0])
+            if self._grad is None:
+                self._grad = self._gradient(cost, x, fx)
+            grad = self._grad
+
+            # hold parameters at a bound whose gradient points out of the bounds
+            free = ~(((x <= lb) & (grad > 0)) | ((x >= ub) & (grad < 0))) \
+                       & (self._steps(x) != 0)
+
+            # scale the first step to a fraction of the bounds
+            if self._hess_inv is None:
+                gnorm = numpy.linalg.norm(grad[free])
+                width = numpy.where(numpy.isfinite(ub - lb), ub - lb, 1.0)
+                scale = 0.1 * numpy.linalg.norm(width[free]) / gnorm if gnorm > 0 else 1.0
+                self._hess_inv = numpy.eye(self.nDim) * scale
+
+            # use steepest descent if the direction does not descend
+            direction = numpy.where(free, -self._hess_inv.dot(numpy.where(free, grad, 0.0)), 0.0)
+            if direction.dot(grad) >= 0:
+                direction = numpy.where(free, -grad, 0.0) * self._hess_inv.diagonal()
+
+            # backtracking line search along the projected path
+            alpha = 1.0
+            x_new, f_new = x, fx
+            for _ in range(self.imax):
+                trial = numpy.clip(x + alpha * direction, lb, ub)
+                f_trial = float(cost(trial))
+                if numpy.isfinite(f_trial) and f_trial <= fx + 1e-4 * grad.dot(trial - x):
+                    x_new, f_new = trial, f_trial
+                    break
+                alpha *= 0.5
+
+            # update the inverse Hessian with the gradient at the new point
+            if f_new < fx:
+                grad_new = self._gradient(cost, x_new, f_new)
+                s = x_new - x
+                y = grad_new - grad
+                sy = s.dot(y)
+                if sy > 1e-12 * numpy.linalg.norm(s) * numpy.linalg.norm(y):
+                    rho = 1.0 / sy
+                    eye = numpy.eye(self.nDim)
+                    self._hess_inv = (eye - rho * numpy.outer(s, y)).dot(
+                                         self._hess_inv).dot(eye - rho * numpy.outer(y, s)) \
+                                     + rho * numpy.outer(s, s)
+                x, fx, self._grad = x_new, f_new, grad_new
+
+            # start again from steepest descent if the line search failed
+            else:
+                self._hess_inv = None
+
+        self.population[0] = x
+        self.popEnergy[0] = fx
+        self._stepmon(x, fx, self.id)
+        if callback is not None:
+            callback(self.bestSolution)
+        if init:
+            self._termination(self)
+
+class LeastSquaresSolver(FiniteDifferenceSolver):
+    """ This class is a bounded Levenberg-Marquardt least-squares solver. The
+    cost is the sum of squares of residuals. Each iteration evaluates the
+    forward-difference Jacobian of the residuals in one batch and takes a damped
+    Gauss-Newton step that is clipped to the bounds. The damping is decreased
+    after a successful step and increased otherwise.
+
+    Residuals are evaluated with ``residuals_batch`` of the cost function, e.g.
+    a ``BasePlan`` that implements it. A cost function without residuals is
+    not accepted since the square root of the cost as a single residual gives
+    a Jacobian of rank one, so use the ``QuasiNewtonSolver`` instead.
+
+    Parameters
+    ----------
+    dim : int
+        The number of parameters.
+    diff_step : float
+        The relative step of the finite differences. Default is ``1e-6``.
+    imax : int
+        The maximum number of increases of the damping in an iteration.
+        Default is ``20``.
+    """
+
+    def __init__(self, dim, **kwds):
+        super().__init__(dim, **kwds)
+        self._residuals = None
+        self._damping = 1e-3
+
+    def _evaluate_residuals(self, cost, points):
+        """ Evaluates the residuals of points in a batch and counts the
+        evaluations.
+        """
+        points = numpy.atleast_2d(numpy.asarray(points, dtype=float))
+        raw = self._cost[1]
+        if not hasattr(raw, "residuals_batch"):
+            raise ValueError("The cost function must have residuals_batch for "
+                             "least-squares optimization!")
+        residuals = numpy.asarray(raw.residuals_batch(points), dtype=float)
+        residuals = residuals.reshape(len(points), -1)
+        self._fcalls[0] += len(points)
+        for x, r in zip(points, residuals):
+            self._evalmon(x, float(r.dot(r)), self.id)
+        return residuals
+
+    def _Step(self, cost=None, ExtraArgs=None, **kwds):
+        settings = self._process_inputs(kwds)
+        callback = settings.get("callback", None)
+        cost = self._bootstrap_objective(cost, ExtraArgs)
+        lb, ub = self._bounds()
+
+        # evaluate the initial point
+        init = not len(self._stepmon)
+        if init:
+            x = numpy.clip(numpy.asarray(self.population[0], dtype=float).flatten(), lb, ub)
+            self._residuals = self._evaluate_residuals(cost, [x])[0]
+
+        # take a damped Gauss-Newton step
+        else:
+            x = numpy.asarray(self.population[0], dtype=float)
+            if self._residuals is None:
+                self._residuals = self._evaluate_residuals(cost, [x])[0]
+            r = self._residuals
+
+            # forward-difference Jacobian
+            h, idxs, points = self._forward_points(x)
+            jac = numpy.zeros((len(r), self.nDim))
+            if len(idxs):
+                jac[:, idxs] = (self._evaluate_residuals(cost, points) - r).T / h[idxs]
+
+            # increase the damping until a step reduces the cost
+            jtj = jac.T.dot(jac)
+            jtr = jac.T.dot(r)
+            diag = numpy.where(jtj.diagonal() > 0, jtj.diagonal(), 1.0)
+            for _ in range(self.imax):
+                try:
+                    delta = numpy.linalg.solve(jtj + self._damping * numpy.diag(diag), -jtr)
+                except numpy.linalg.LinAlgError:
+                    delta = numpy.zeros(self.nDim)
+                trial = numpy.clip(x + delta, lb, ub)
+                if numpy.array_equal(trial, x):
+                    break
+                r_trial = self._evaluate_residuals(cost, [trial])[0]
+                if numpy.all(numpy.isfinite(r_trial)) and r_trial.dot(r_trial) < r.dot(r):
+                    x, self._residuals = trial, r_trial
+                    self._damping = max(self._damping / 10.0, 1e-12)
+                    break
+                self._damping *= 10.0
+
+        fx = float(self._residuals.dot(self._residuals))
+        self.population[0] = x
+        self.popEnergy[0] = fx
+        self._stepmon(x, fx, self.id)
+        if callback is not None:
+            callback(self.bestSolution)
+        if init:
+            self._termination(self)
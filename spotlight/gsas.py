@@ -3,28 +3,109 @@
 
 import numpy
 import os
+import signal
 import subprocess
-
+import threading
+import time
+from spotlight import timing
+
+# working directory of external calls for each thread
+_local = threading.local()
+
+def set_working_dir(path):
+    """ Sets the directory that external calls from the current thread run in.
+    This lets several threads run GSAS in separate directories at the same
+    time since the current directory is shared by all threads of a process.
+
+    Parameters
+    ----------
+    path : {None, str}
+        Path of the directory. If ``None`` then external calls run in the
+        current directory.
+    """
+    _local.working_dir = path
+
+def get_working_dir():
+    """ Returns the directory that external calls from the current thread run
+    in, or ``None`` for the current directory.
+    """
+    return getattr(_local, "working_dir", None)
+
+def set_deadline(deadline):
+    """ Sets the wall-clock time by which external calls from the current
+    thread must finish. External calls still running at the deadline are
+    killed and raise ``subprocess.TimeoutExpired``.
+
+    Parameters
+    ----------
+    deadline : {None, float}
+        The deadline as seconds since the epoch. If ``None`` then there is no
+        deadline.
+    """
+    _local.deadline = deadline
+
+def _get_timeout(cmd):
+    """ Returns the number of seconds left for an external call from the
+    current thread, or ``None`` if there is no deadline.
+    """
+    deadline = getattr(_local, "deadline", None)
+    if deadline is None:
+        return None
+    timeout = deadline - time.time()
+    if timeout <= 0:
+        raise subprocess.TimeoutExpired(cmd, 0)
+    return timeout
+
+class ExternalCallError(subprocess.CalledProcessError):
+    """ This exception is raised when an external call exits with a non-zero
+    exit status. A refinement plan counts it as a failed evaluation, see
+    ``BasePlan``.
+    """
+
+def _communicate(p, cmd, timeout):
+    """ Returns the output of a process that was started in a new session.
+    Kills the process and the programs it started if it does not finish within
+    ``timeout`` seconds, and raises ``ExternalCallError`` if it exits with a
+    non-zero exit status.
+    """
+    try:
+        output, errors = p.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        os.killpg(p.pid, signal.SIGKILL)
+        p.communicate()
+        raise
+    if p.returncode != 0:
+        raise ExternalCallError(p.returncode, cmd, output, errors)
+    return output
+
+@timing.timer("gsas.external_call")
 def _external_call(cmd, debug=False, system=False):
-    """ This function makes external calls.
+    """ This function makes external calls. Raises ``ExternalCallError`` if
+    the command exits with a non-zero exit status, and
+    ``subprocess.TimeoutExpired`` if the command does not finish before the
+    deadline set with ``set_deadline``.
     """
     cmd = list(map(str, cmd))
     if debug:
         print(" ".join(cmd))
-    if system and debug:
-        os.system(" ".join(cmd))
-    elif system:
-        os.system(" ".join(cmd) + [">", "/dev/null", "2>&1"])
+    timeout = _get_timeout(cmd)
+
+    # each command runs in its own session so the programs it starts are
+    # killed with it at the deadline
+    if system:
+        p = subprocess.Popen(" ".join(cmd if debug else cmd + [">", "/dev/null", "2>&1"]),
+                             shell=True, cwd=get_working_dir(), start_new_session=True)
     else:
         p = subprocess.Popen(cmd, stdin=subprocess.PIPE,
                              stdout=subprocess.PIPE,
-                             stderr=subprocess.PIPE)
-        while True:
-            output = p.stdout.readline().decode("utf-8")
-            if output == "" and p.poll() == 0:
-                break
-            if output and debug:
-                print(output.strip())
+                             stderr=subprocess.PIPE,
+                             cwd=get_working_dir(),
+                             start_new_session=True)
+
+    # read all output so the process cannot block on a full pipe
+    output = _communicate(p, cmd, timeout)
+    if output and debug:
+        print(output.decode("utf-8").strip())
 
 def gsas_add_histogram(obs_file, instrument_file, bank_number,
                        min_d_spacing, max_d_spacing=None, debug=False):
@@ -190,7 +271,10 @@ def gsas_get_chisq(name, debug=False):
     cmd = " ".join(map(str, cmd))
     if debug:
         print(cmd)
-    chisq = subprocess.check_output(cmd, shell=True)
+    timeout = _get_timeout(cmd)
+    p = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, cwd=get_working_dir(),
+                         start_new_session=True)
+    chisq = _communicate(p, cmd, timeout)
     return float(chisq)
 
 def gsas_initialize(name, label, debug=False):
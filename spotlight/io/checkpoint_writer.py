@@ -0,0 +1,218 @@
+""" This module contains classes for writing checkpoints of local solvers to
+the solution and state archive files.
+"""
+
+import atexit
+import signal
+import sys
+import threading
+import time
+from spotlight import timing
+from spotlight.io import solution_file
+
+class CheckpointWriter:
+    """ This class writes checkpoints of local solvers to a ``SolutionFile``
+    and a ``StateFile``.
+
+    Checkpoints may be saved from several threads at once and are written one
+    at a time.
+
+    A checkpoint is a snapshot of the local solver from ``snapshot`` of the
+    archives, which copies the output data and pickles the local solver once,
+    so the local solver may continue to step while the checkpoint is written.
+
+    If ``background`` is ``True``, the checkpoints are written by a separate
+    thread so that the optimization loop does not wait on filesystem I/O.
+    Checkpoints that are still pending when a new checkpoint for the same key
+    arrives are coalesced and only the latest state of the local solver is
+    written.
+
+    Attributes
+    ----------
+    fp_sol : SolutionFile
+        The solution archive.
+    fp_state : StateFile
+        The state archive.
+    background : bool
+        Write checkpoints in a background thread.
+    io_time : float
+        The time in seconds spent writing checkpoints to the archives.
+    snapshot_time : float
+        The time in seconds the caller spent taking snapshots in ``save``.
+    wait_time : float
+        The time in seconds the caller spent queueing checkpoints in ``save``
+        and waiting in ``flush``.
+    num_saved : int
+        The number of checkpoints given to ``save``.
+    num_written : int
+        The number of checkpoints written to the archives.
+
+    Parameters
+    ----------
+    fp_sol : SolutionFile
+        The solution archive.
+    fp_state : StateFile
+        The state archive.
+    background : bool
+        Write checkpoints in a background thread. Default is ``False``.
+    """
+
+    def __init__(self, fp_sol, fp_state, background=False):
+        self.fp_sol = fp_sol
+        self.fp_state = fp_state
+        self.background = background
+        self.io_time = 0.0
+        self.snapshot_time = 0.0
+        self.wait_time = 0.0
+        self.num_saved = 0
+        self.num_written = 0
+
+        # pending checkpoints with key archive key and value a tuple of the
+        # snapshots of the local solver, and the duration and information to
+        # add to the archive
+        self._pending = {}
+        self._writing = False
+        self._error = None
+        self._closed = False
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+
+        # start writer thread
+        if self.background:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        else:
+            self._thread = None
+
+    @property
+    def hidden_time(self):
+        """ Returns the time in seconds of archive I/O that was not spent in the
+        optimization loop.
+        """
+        return max(0.0, self.io_time - self.wait_time)
+
+    def save(self, key, local_solver, duration=None, info=None):
+        """ Writes a checkpoint of a local solver, or queues it to be written
+        if writing in the background.
+
+        Parameters
+        ----------
+        key : str
+            The ``dict`` key to use for this solution in the archive files.
+        local_solver : Solver
+            A ``Solver`` instance.
+        duration : {None, float}
+            The time in seconds since the previous checkpoint.
+        info : {None, dict}
+            Extra information about the local solver since the previous
+            checkpoint.
+        """
+        self.num_saved += 1
+        t_start = time.time()
+        snapshot = self._snapshot(local_solver)
+        self.snapshot_time += time.time() - t_start
+
+        # write immediately if not in the background
+        if not self.background:
+            self._write(key, snapshot, duration, info)
+            return
+
+        # queue the snapshot since the local solver continues to step
+        t_start = time.time()
+        with self._condition:
+            self._raise()
+            if key in self._pending:
+                _, pending_duration, pending_info = self._pending[key]
+                if pending_duration is not None and duration is not None:
+                    duration += pending_duration
+                if pending_info:
+                    info = solution_file.merge_info(pending_info, info or {})
+            self._pending[key] = (snapshot, duration, info)
+            self._condition.notify_all()
+        self.wait_time += time.time() - t_start
+
+    def flush(self):
+        """ Blocks until all pending checkpoints have been written.
+        """
+        if not self.background:
+            return
+        t_start = time.time()
+        with self._condition:
+            while (self._pending or self._writing) and self._error is None:
+                self._condition.wait()
+            self._raise()
+        self.wait_time += time.time() - t_start
+
+    def close(self):
+        """ Writes all pending checkpoints and stops the writer thread.
+        """
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        if self._thread is not None:
+            with self._condition:
+                self._condition.notify_all()
+            self._thread.join()
+
+    def close_on_exit(self):
+        """ Closes the writer when the process exits or is terminated with
+        ``SIGTERM`` so that pending checkpoints are written. Must be called
+        from the main thread.
+        """
+        def terminate(signum, frame):
+            self.close()
+            sys.exit(128 + signum)
+        atexit.register(self.close)
+        signal.signal(signal.SIGTERM, terminate)
+
+    def _raise(self):
+        """ Raises an exception from the writer thread in the calling thread.
+        """
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError("Failed to write checkpoint!") from error
+
+    @timing.timer("checkpoint_writer.snapshot")
+    def _snapshot(self, local_solver):
+        """ Returns the snapshots of a local solver for the solution and state
+        archives.
+        """
+        return self.fp_sol.snapshot(local_solver), self.fp_state.snapshot(local_solver)
+
+    def _write(self, key, snapshot, duration, info=None):
+        """ Writes a checkpoint to the solution and state archives.
+        """
+        sol_snapshot, state_snapshot = snapshot
+        with self._write_lock:
+            t_start = time.time()
+            self.fp_sol.save_snapshot(key, sol_snapshot, duration, info)
+            self.fp_state.save_snapshot(key, state_snapshot)
+            self.io_time += time.time() - t_start
+            self.num_written += 1
+
+    def _run(self):
+        """ Loop of the writer thread.
+        """
+        while True:
+
+            # wait for a pending checkpoint
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                key = next(iter(self._pending))
+                snapshot, duration, info = self._pending.pop(key)
+                self._writing = True
+
+            # write checkpoint without holding the lock
+            try:
+                self._write(key, snapshot, duration, info)
+            except Exception as error:
+                with self._condition:
+                    self._error = error
+            finally:
+                with self._condition:
+                    self._writing = False
+                    self._condition.notify_all()
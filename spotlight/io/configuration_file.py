@@ -6,8 +6,14 @@ import numpy
 import os
 import pickle
 import sys
+from spotlight import cache
+from spotlight import checkpoint
+from spotlight import fidelity
 from spotlight import filesystem
 from spotlight import solver
+from spotlight import surrogate
+from spotlight import timing
+from spotlight import workers
 
 class ConfigurationFile:
     """ This class manages a refinement plan. This is the top-level interface
@@ -32,7 +38,8 @@ class ConfigurationFile:
         The loaded refinement plan module.
     bounds : dict
         A ``dict`` with key parameter name and value a tuple of lower and upper
-        bounds.
+        bounds. A parameter that is given a single value in the configuration
+        file is pinned to that value with equal lower and upper bounds.
     names : list
         A list of names. This list is ordered how packages will return a list.
     idxs : dict
@@ -57,10 +64,18 @@ class ConfigurationFile:
     config_overrides : {None, list}
         A list of `str` delimited by colons to add options to the configuration
         file. The format is "section:option:value".
+    workspace : {None, str}
+        Path of a workspace from ``prepare_workspace`` to clone into the
+        temporary directory. The ``workspace_clone`` option sets how files
+        are cloned. Default is ``None`` which does not clone a workspace.
     """
 
+    @timing.timer("configuration.setup")
     def __init__(self, config_files, tmp_dir=None, names=None, change=True,
-                 copy=True, config_overrides=None):
+                 copy=True, config_overrides=None, workspace=None):
+
+        # relative paths of output files are relative to this directory
+        self.run_dir = os.getcwd()
 
         # configuration file is a single Python file
         if len(config_files) == 1:
@@ -77,18 +92,32 @@ class ConfigurationFile:
 
         # refinement plan is not loaded until get_refinement_plan is called
         self.refinement_plan = None
+        self._evaluation_cache = None
 
         # set attributes for names and indices of parameters
         self.names = list(names if names is not None else self.bounds.keys())
         self.idxs = {name : i for i, name in enumerate(self.names)}
 
+        # clone prepared workspace to temporary dir
         # copy files to temporary dir
         # move to temporary dir
         if copy:
+            if workspace:
+                filesystem.clone(workspace, tmp_dir if tmp_dir else ".",
+                                 method=getattr(self, "workspace_clone", "reflink"))
             self.setup_dir(tmp_dir, change=change)
         else:
             self.config_file = config_files
 
+    def __getstate__(self):
+        """ Returns the state to pickle without the cache of evaluations and the
+        refinement plan module, which is imported again when it is needed.
+        """
+        state = self.__dict__.copy()
+        state["_evaluation_cache"] = None
+        state["refinement_plan"] = None
+        return state
+
     @property
     def lower_bounds(self):
         return [self.bounds[name][0] for name in self.names]
@@ -133,7 +162,12 @@ class ConfigurationFile:
         # write configuration file to temporary dir
         self.config_file = os.path.join(tmp_dir, "config.ini") \
                                if tmp_dir else "config.ini"
+
+        # replace rather than overwrite the file since it may be a hardlink
+        # to the file in a prepared workspace
         if hasattr(self, "cp"):
+            if os.path.exists(self.config_file):
+                os.remove(self.config_file)
             with open(self.config_file, "w") as fp:
                 self.cp.write(fp)
         self.config_file = os.path.basename(self.config_file) if change else self.config_file
@@ -142,8 +176,36 @@ class ConfigurationFile:
         if tmp_dir is not None:
             filesystem.mkdir(tmp_dir, change=change)
 
-    def get_refinement_plan(self, initialize=True, reimport=True):
-        """ Returns instance of requested refinement plan.
+    @timing.timer("configuration.workspace")
+    def prepare_workspace(self, workspace_dir):
+        """ Copies files to a workspace directory and initializes the
+        refinement plan there, then changes back to the current directory.
+        Other processes can then clone the workspace instead of initializing
+        the refinement plan themselves.
+
+        This requires that ``Plan.initialize`` only writes files to the
+        current directory, e.g. setting up a GSAS experiment, since the
+        refinement plan of the other processes is not initialized.
+
+        Parameters
+        ----------
+        workspace_dir : str
+            Path of workspace directory to create.
+        """
+        cwd = os.getcwd()
+        try:
+            self.setup_dir(workspace_dir, change=True)
+            self.get_refinement_plan(initialize=True)
+        finally:
+            os.chdir(cwd)
+
+    @timing.timer("configuration.plan")
+    def get_refinement_plan(self, initialize=True, reimport=True, pool=True):
+        """ Returns instance of requested refinement plan. If the
+        ``evaluation_workers`` option is greater than one and ``pool`` is
+        ``True`` then the refinement plan evaluates batches of parameter
+        vectors in a pool of that many workers. The ``evaluation_mapper``
+        option sets the kind of workers, see ``workers.WorkerPool``.
 
         Returns
         -------
@@ -167,10 +229,121 @@ class ConfigurationFile:
         cost = self.refinement_plan.Plan(self.names,
                                          initialize=initialize)
 
+        # set options for failed evaluations
+        for option in ["evaluation_timeout", "evaluation_retries", "evaluation_penalty"]:
+            if hasattr(self, option):
+                setattr(cost, option, getattr(self, option))
+
+        # all refinement plans share the cache
+        cost.cache = self.get_evaluation_cache()
+
+        # each refinement plan has its own surrogate model
+        cost.surrogate = self.get_surrogate()
+
+        # each refinement plan has its own fidelity screen
+        cost.fidelity_screen = self.get_fidelity_screen()
+
+        # each refinement plan has its own pool of workers
+        nworkers = getattr(self, "evaluation_workers", 1)
+        if pool and nworkers > 1:
+            cost.workers = workers.WorkerPool(self, nworkers,
+                                              method=getattr(self, "workspace_clone", "reflink"),
+                                              mapper=getattr(self, "evaluation_mapper", "thread"))
+
         return cost
 
+    def get_evaluation_cache(self):
+        """ Returns the cache of evaluations if the ``evaluation_cache`` option
+        is ``True``. The ``evaluation_cache_tolerance``,
+        ``evaluation_cache_size``, and ``evaluation_cache_file`` options set the
+        relative tolerance, maximum number of values, and directory to persist
+        values of the cache. The same cache is returned on every call.
+
+        Returns
+        -------
+        evaluation_cache : {None, EvaluationCache}
+            An ``EvaluationCache`` instance, or ``None`` if there is no cache.
+        """
+        if self._evaluation_cache is not None:
+            return self._evaluation_cache
+        if not getattr(self, "evaluation_cache", False):
+            return None
+        path = getattr(self, "evaluation_cache_file", None)
+        if path is not None:
+            path = os.path.join(self.run_dir, path)
+        self._evaluation_cache = cache.EvaluationCache(
+                relative_tolerance=getattr(self, "evaluation_cache_tolerance", 1e-10),
+                max_size=getattr(self, "evaluation_cache_size", None),
+                path=path)
+        return self._evaluation_cache
+
+    def get_surrogate(self):
+        """ Returns a surrogate model to screen parameter vectors if the
+        ``surrogate_model`` option is set. The ``surrogate_min_points``,
+        ``surrogate_refit_interval``, ``surrogate_margin``,
+        ``surrogate_quantile``, ``surrogate_max_points``, and
+        ``surrogate_kwargs`` options are passed to the ``SurrogateScreen``.
+
+        Returns
+        -------
+        screen : {None, SurrogateScreen}
+            A ``SurrogateScreen`` instance, or ``None`` if there is no
+            surrogate model.
+        """
+        model = getattr(self, "surrogate_model", None)
+        if model is None:
+            return None
+        options = {"min_points" : "surrogate_min_points",
+                   "refit_interval" : "surrogate_refit_interval",
+                   "margin" : "surrogate_margin",
+                   "quantile" : "surrogate_quantile",
+                   "max_points" : "surrogate_max_points"}
+        kwargs = {key : getattr(self, option) for key, option in options.items()
+                  if hasattr(self, option)}
+        kwargs.update(getattr(self, "surrogate_kwargs", {}))
+        return surrogate.SurrogateScreen(model=model, **kwargs)
+
+    def get_fidelity_screen(self):
+        """ Returns a screen of parameter vectors at low fidelity if the
+        ``low_fidelity`` option is set. The ``fidelity_margin`` option is passed
+        to the ``FidelityScreen``.
+
+        Returns
+        -------
+        screen : {None, FidelityScreen}
+            A ``FidelityScreen`` instance, or ``None`` if there is no low
+            fidelity.
+        """
+        low_fidelity = getattr(self, "low_fidelity", None)
+        if low_fidelity is None:
+            return None
+        kwargs = {"margin" : self.fidelity_margin} if hasattr(self, "fidelity_margin") else {}
+        return fidelity.FidelityScreen(low_fidelity=low_fidelity, **kwargs)
+
+    def get_checkpoint_policy(self):
+        """ Returns instance of checkpoint policy from the ``checkpoint_stride``,
+        ``checkpoint_seconds``, and ``checkpoint_max_overhead_fraction``
+        options.
+
+        Returns
+        -------
+        policy : {None, CheckpointPolicy}
+            A ``CheckpointPolicy`` instance, or ``None`` if there are no
+            checkpointing options.
+        """
+        options = {"stride" : "checkpoint_stride",
+                   "seconds" : "checkpoint_seconds",
+                   "max_overhead_fraction" : "checkpoint_max_overhead_fraction"}
+        kwargs = {key : getattr(self, option) for key, option in options.items()
+                  if hasattr(self, option)}
+        if not kwargs:
+            return None
+        return checkpoint.CheckpointPolicy(**kwargs)
+
     def get_solver(self, **kwargs):
-        """ Returns instance of requested solver.
+        """ Returns instance of requested solver. Parameters with equal lower and
+        upper bounds are removed from the parameters that the optimizer sees
+        unless the ``eliminate_fixed`` option of the solver is ``False``.
 
         Returns
         -------
@@ -179,7 +352,8 @@ class ConfigurationFile:
         """
 
         # include [solver] configuration file
-        tmp = self.solver_kwargs
+        tmp = {"eliminate_fixed" : True}
+        tmp.update(self.solver_kwargs)
         tmp.update(kwargs)
 
         # initialize solver
@@ -209,7 +383,9 @@ class ConfigurationFile:
         self.refinement_plan_file = config_file
 
         # set parameter bounds
-        self.bounds = config.parameters
+        # a single value pins the parameter
+        self.bounds = {name : [val, val] if numpy.isscalar(val) else val
+                       for name, val in config.parameters.items()}
 
         # handle configuration dict
         for option, val in config.configuration.items():
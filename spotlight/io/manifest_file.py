@@ -0,0 +1,134 @@
+""" This module contains classes for reading and writing a small status file
+of the walkers in a solution archive.
+"""
+
+import os
+import socket
+import threading
+
+class ManifestFile:
+    """ This class handles reading and writing the status of each walker in a
+    solution archive. The status is the walker tag, if the walker terminated,
+    the best cost function value, and the number of function evaluations.
+
+    The manifest is a directory of plain text files. Each process appends to
+    its own file so that processes do not need to coordinate writes. Reading
+    the manifest merges the lines from all files, so a walker is terminated
+    if any line says so. A line is appended when a walker terminates, and the
+    status of walkers that did not terminate is appended by ``flush``, so the
+    manifest has about one line for each walker.
+
+    Attributes
+    ----------
+    path : str
+        Path to manifest directory.
+    entries : dict
+        A ``dict`` with key walker tag and value a tuple of terminated flag,
+        best cost function value, and number of function evaluations.
+
+    Parameters
+    ----------
+    path : str
+        Path to manifest directory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._file_path = None
+        self._unsaved = set()
+        self._lock = threading.Lock()
+
+    def load(self):
+        """ Reads the status of all walkers from the manifest.
+
+        Returns
+        -------
+        entries : dict
+            A ``dict`` with key walker tag and value a tuple of terminated flag,
+            best cost function value, and number of function evaluations.
+        """
+        self.entries = {}
+        if not os.path.isdir(self.path):
+            return self.entries
+        for fname in sorted(os.listdir(self.path)):
+            with open(os.path.join(self.path, fname), "r") as fp:
+                for line in fp:
+                    fields = line.split()
+                    if len(fields) != 4:
+                        continue
+                    self._merge(fields[0], bool(int(fields[1])), float(fields[2]), int(fields[3]))
+        return self.entries
+
+    def is_terminated(self, key):
+        """ Returns if the walker has terminated according to the last call
+        to ``load`` or ``update``.
+
+        Parameters
+        ----------
+        key : str
+            The walker tag.
+
+        Returns
+        -------
+        bool
+            If the walker terminated.
+        """
+        return key in self.entries and self.entries[key][0]
+
+    def update(self, key, terminated, best_y, evaluations):
+        """ Updates the status of a walker. The status is appended to the file
+        of this process if the walker terminated, otherwise by ``flush``.
+
+        Parameters
+        ----------
+        key : str
+            The walker tag.
+        terminated : bool
+            If the walker terminated.
+        best_y : float
+            The best cost function value of the walker.
+        evaluations : int
+            The number of function evaluations of the walker.
+        """
+        with self._lock:
+            was_terminated = self.is_terminated(key)
+            self._merge(key, bool(terminated), float(best_y), int(evaluations))
+            if not terminated:
+                self._unsaved.add(key)
+            elif not was_terminated:
+                self._unsaved.discard(key)
+                self._write([key])
+
+    def flush(self):
+        """ Appends the status of the walkers that were updated without
+        terminating since the last call to the file of this process.
+        """
+        with self._lock:
+            keys, self._unsaved = sorted(self._unsaved), set()
+            self._write(keys)
+
+    def _write(self, keys):
+        """ Appends the status of walkers to the file of this process.
+        """
+        if not keys:
+            return
+        if self._file_path is None:
+            if not os.path.exists(self.path):
+                os.makedirs(self.path, exist_ok=True)
+            self._file_path = os.path.join(
+                self.path, "{}_{}.txt".format(socket.gethostname(), os.getpid()))
+        with open(self._file_path, "a") as fp:
+            for key in keys:
+                terminated, best_y, evaluations = self.entries[key]
+                fp.write("{} {} {!r} {}\n".format(key, int(terminated), best_y, evaluations))
+
+    def _merge(self, key, terminated, best_y, evaluations):
+        """ Merges a status with the existing status of a walker.
+        """
+        if key in self.entries:
+            old_terminated, old_best_y, old_evaluations = self.entries[key]
+            terminated = terminated or old_terminated
+            best_y = min(best_y, old_best_y)
+            evaluations = max(evaluations, old_evaluations)
+        self.entries[key] = (terminated, best_y, evaluations)
@@ -2,9 +2,39 @@
 using the klepto archive file.
 """
 
+import copy
 import numpy
 import os
 from klepto import archives
+from spotlight import spatial
+from spotlight import timing
+from spotlight.io import manifest_file
+
+def merge_info(info, other):
+    """ Merges extra information about a local solver into ``info``. Numbers
+    and arrays are added, lists are extended, and ``dict`` are merged
+    recursively.
+
+    Parameters
+    ----------
+    info : dict
+        The ``dict`` to merge into, which is modified.
+    other : dict
+        The ``dict`` to merge from.
+
+    Returns
+    -------
+    info : dict
+        The merged ``dict``.
+    """
+    for key, value in other.items():
+        if key not in info:
+            info[key] = merge_info({}, value) if isinstance(value, dict) else value
+        elif isinstance(value, dict):
+            merge_info(info[key], value)
+        else:
+            info[key] = info[key] + value
+    return info
 
 class SolutionFile:
     """ This class handles reading and writing output data from the
@@ -20,6 +50,17 @@ class SolutionFile:
         A list of specially named keys.
     path : str
         Path to archive file.
+    manifest : ManifestFile
+        The status of each walker, stored next to the archive file.
+    points : {None, PointIndex}
+        The parameter vectors in the histories of the walkers, stored next to
+        the archive file and updated with each call to ``save_data``. Only
+        kept for sampling methods that read it, otherwise ``None``.
+    basins : {None, PointIndex}
+        The parameter vectors in the histories and the best parameter vectors
+        of the terminated walkers in one group for each walker, stored next to
+        the archive file. Only kept for sampling methods that read it,
+        otherwise ``None``.
 
     Parameters
     ----------
@@ -27,17 +68,26 @@ class SolutionFile:
         Path to archive file.
     names : list
         A list of names. This list is ordered how packages will return a list.
+    sampling_method : {None, str}
+        The sampling method of the walkers, which selects the indices of
+        parameter vectors that are kept next to the archive file. Default is
+        ``None`` which keeps no index.
     """
 
     # special keys
     restricted_keys = ["config"]
 
-    def __init__(self, path, config):
+    def __init__(self, path, config, sampling_method=None):
 
         # store information
         self.path = path
         self.arch = archives.dir_archive(self.path)
         self.config = config
+        self.manifest = manifest_file.ManifestFile(self.path + ".manifest")
+        self.points = spatial.PointIndex(self.path + ".points") \
+                          if sampling_method == "tolerance" else None
+        self.basins = spatial.PointIndex(self.path + ".basins") \
+                          if sampling_method == "rejection" else None
 
     def save_config(self, key="config", config=None):
         """ Writes names of parameters.
@@ -61,7 +111,7 @@ class SolutionFile:
         else:
             assert(getattr(self, key).names == self.arch[key].names)
 
-    def save_data(self, key, local_solver, time=None):
+    def save_data(self, key, local_solver, time=None, info=None):
         """ Writes output data from a local solver. Adds the given solution to
         an archive file.
  
@@ -73,16 +123,70 @@ class SolutionFile:
             A ``Solver`` instance.
         time : float
             An optional argument to store time to completion.
+        info : {None, dict}
+            An optional argument with extra information about the local
+            solver since the previous call, e.g. timing statistics. It is
+            merged with the information already in the archive file.
         """
+        self.save_snapshot(key, self.snapshot(local_solver), time, info)
+
+    @staticmethod
+    def snapshot(local_solver):
+        """ Returns the output data of a local solver that ``save_snapshot``
+        writes, so the local solver may continue to step while it is written.
+
+        Parameters
+        ----------
+        local_solver : Solver
+            A ``Solver`` instance.
+
+        Returns
+        -------
+        snapshot : tuple
+            A tuple of the solution and the diagnostics of the local solver,
+            if the local solver terminated, and the generation numbers of its
+            history.
+        """
+        x, y, best_x, best_y = local_solver.solution
+        steps = getattr(local_solver.stepmon, "steps", None)
+        return ((x, y, copy.copy(best_x), best_y), local_solver.diagnostics,
+                bool(local_solver.local_solver.Terminated(disp=1, info=True)),
+                None if steps is None else steps.copy())
+
+    @timing.timer("solution_file.save_data")
+    def save_snapshot(self, key, snapshot, time=None, info=None):
+        """ Writes output data from a snapshot of a local solver. Adds the
+        given solution to an archive file.
+
+        Parameters
+        ----------
+        key : iterable
+            The ``dict`` key to use for this solution in archive file.
+        snapshot : tuple
+            The output data of a local solver from ``snapshot``.
+        time : float
+            An optional argument to store time to completion.
+        info : {None, dict}
+            An optional argument with extra information about the local
+            solver since the previous call, e.g. timing statistics. It is
+            merged with the information already in the archive file.
+        """
+        solution, diagnostics, terminated, steps = snapshot
 
         # load new data in archive file
         self.arch.load(key)
 
         # add this solution
-        sol = list(local_solver.solution) + [None, time] + list(local_solver.diagnostics)
+        # the monitor of the local solver holds its full history so the
+        # history in the archive is replaced rather than appended to
+        sol = list(solution) + [None, time] + list(diagnostics)
+        sol += [merge_info({}, info) if info else {}]
         if key in self.arch.keys():
-            self.arch[key][0] += sol[0]
-            self.arch[key][1] += sol[1]
+            if len(self.arch[key]) < len(sol):
+                self.arch[key].append({})
+            merge_info(self.arch[key][8], sol[8])
+            self.arch[key][0] = sol[0]
+            self.arch[key][1] = sol[1]
             self.arch[key][6] = sol[6]
             self.arch[key][7] = sol[7]
             if sol[3] < self.arch[key][3]:
@@ -93,15 +197,92 @@ class SolutionFile:
         else:
             self.arch[key] = sol
 
+        # add the generations since the previous call to the index of points
+        # the last indexed generation is stored with the walker so a resumed
+        # walker does not add its history again, and a walker that was saved
+        # with a Mystic monitor kept every generation
+        x = numpy.asarray(sol[0])
+        steps = numpy.arange(len(x)) if steps is None else steps
+        if self.points is not None and len(x) and len(steps) == len(x):
+            new = steps > self.arch[key][8].get("indexed_step", -1)
+            self.points.add(x[new])
+            self.points.save()
+            self.arch[key][8]["indexed_step"] = int(steps[-1])
+
         # check if termination condition met and store result
-        if local_solver.local_solver.Terminated(disp=1, info=True):
+        if terminated:
             self.arch[key][4] = 1
+
+            # a walker that is resumed after it terminated adds its basin once
+            if self.basins is not None and not self.arch[key][8].get("basin_indexed"):
+                self.basins.add(self._walker_points(self.arch[key]))
+                self.basins.save()
+                self.arch[key][8]["basin_indexed"] = True
         else:
             self.arch[key][4] = 0
 
         # save new data to archive file
         self.arch.dump(key)
 
+        # record status of the local solver
+        self.manifest.update(key, self.arch[key][4], self.arch[key][3], self.arch[key][7])
+
+    def get_points(self):
+        """ Returns the index of the parameter vectors in the histories of the
+        walkers with the parameter vectors that other processes added since the
+        last call. If the archive file was written without an index then the
+        index is filled from the histories in the archive file.
+
+        Returns
+        -------
+        points : PointIndex
+            The index of parameter vectors.
+        """
+        if self.points is None:
+            self.points = spatial.PointIndex(self.path + ".points")
+        if not os.path.isdir(self.points.path) and not len(self.points) \
+                and os.path.exists(self.path):
+            for x in self.read_data([self.path])[1]:
+                if x.size:
+                    self.points.add(x)
+            self.points.save()
+        self.points.load()
+        return self.points
+
+    def get_basins(self):
+        """ Returns the index of the parameter vectors in the histories and the
+        best parameter vectors of the terminated walkers with the parameter
+        vectors that other processes added since the last call. If the archive
+        file was written without an index then the index is filled from the
+        terminated walkers in the archive file.
+
+        Returns
+        -------
+        basins : PointIndex
+            The index of parameter vectors.
+        """
+        if self.basins is None:
+            self.basins = spatial.PointIndex(self.path + ".basins")
+        if not os.path.isdir(self.basins.path) and not len(self.basins) \
+                and os.path.exists(self.path):
+            arch = archives.dir_archive(self.path)
+            arch.load()
+            for key in arch.keys():
+                if key not in self.restricted_keys and arch[key][4]:
+                    self.basins.add(self._walker_points(arch[key]))
+            self.basins.save()
+        self.basins.load()
+        return self.basins
+
+    @staticmethod
+    def _walker_points(sol):
+        """ Returns the parameter vectors in the history and the best parameter
+        vector of a walker in the archive file.
+        """
+        best = numpy.atleast_2d(numpy.asarray(sol[2], dtype=float))
+        x = numpy.asarray(sol[0], dtype=float)
+        return numpy.vstack([x, best]) if x.size else best
+
     @classmethod
     def read_data(cls, input_files, keys=None, verbose=False):
         """ Reads output data.
@@ -5,6 +5,23 @@ state data using the klepto archive file.
 import dill
 import numpy
 from klepto import archives
+from spotlight import timing
+
+class Pickled:
+    """ This class holds an object that is already pickled. Pickling an
+    instance only copies the bytes, and unpickling it returns the object.
+
+    Attributes
+    ----------
+    data : bytes
+        The pickled object.
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+    def __reduce__(self):
+        return dill.loads, (self.data,)
 
 class StateFile:
     """ This class handles reading and writing local optimization state data
@@ -21,19 +38,22 @@ class StateFile:
     ----------
     path : str
         Path to archive file.
+    load : bool
+        Load all states in the archive file. Default is ``True``.
     """
 
     # special keys
     restricted_keys = ["names"]
 
-    def __init__(self, path):
+    def __init__(self, path, load=True):
 
         # store information
         self.path = path
         self.arch = archives.dir_archive(self.path)
 
         # load new data in archive file
-        self.arch.load()
+        if load:
+            self.arch.load()
 
     def save_state(self, key, local_solver):
         """ Writes state data from a local solver.
@@ -45,18 +65,50 @@ class StateFile:
         local_solver : Solver
             A ``Solver`` instance.
         """
+        self.save_snapshot(key, self.snapshot(local_solver))
 
-        # load new data in archive file
-        self.arch.load(key)
+    @staticmethod
+    def snapshot(local_solver):
+        """ Returns the state data of a local solver that ``save_snapshot``
+        writes, so the local solver may continue to step while it is written.
+        The local solver is pickled here and the archive file stores the
+        pickled bytes without pickling them again.
+
+        Parameters
+        ----------
+        local_solver : Solver
+            A ``Solver`` instance.
+
+        Returns
+        -------
+        snapshot : {None, Pickled}
+            The pickled local solver, or ``None`` if the local solver
+            terminated.
+        """
 
         # check if termination condition met
         # if not then add the local_solver instance
         # clear cost function from local solver due to pickling issues
         if local_solver.local_solver.Terminated(disp=1, info=True):
-            self.arch[key] = None
-        else:
-            local_solver._cost = None
-            self.arch[key] = local_solver
+            return None
+        local_solver._cost = None
+        return Pickled(dill.dumps(local_solver))
+
+    @timing.timer("state_file.save_state")
+    def save_snapshot(self, key, snapshot):
+        """ Writes state data from a snapshot of a local solver.
+
+        Parameters
+        ----------
+        key : iterable
+            The ``dict`` key to use for this solution in archive file.
+        snapshot : {None, Pickled}
+            The state data of a local solver from ``snapshot``.
+        """
+
+        # load new data in archive file
+        self.arch.load(key)
+        self.arch[key] = snapshot
 
         # save new data to archive file
         self.arch.dump(key)
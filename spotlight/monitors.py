@@ -0,0 +1,245 @@
+""" This module contains Mystic monitors that store the history of a solver in
+``numpy`` arrays.
+"""
+
+import numpy
+from mystic.monitors import Monitor
+
+class _Rows:
+    """ This class stores rows of floats in a preallocated ``numpy`` array that
+    doubles in size when it is full. If ``limit`` is not ``None`` only the last
+    ``limit`` rows are kept and the array does not grow past twice that size.
+    """
+
+    def __init__(self, width, limit=None, capacity=16):
+        self.limit = limit
+        self._data = numpy.empty((capacity, width), dtype=numpy.float64)
+        self._start = 0
+        self._stop = 0
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getstate__(self):
+        """ Returns the state to pickle with only the rows that are kept.
+        """
+        return {"limit" : self.limit, "data" : self.view().copy()}
+
+    def __setstate__(self, state):
+        self.limit = state["limit"]
+        self._data = state["data"]
+        self._start = 0
+        self._stop = len(self._data)
+
+    def append(self, row):
+        """ Adds a row after the last row.
+        """
+        if self._stop == len(self._data):
+            n = len(self)
+
+            # move the rows that are kept to the front or grow the array
+            if 2 * n <= len(self._data):
+                self._data[:n] = self._data[self._start:self._stop]
+            else:
+                data = numpy.empty((max(2 * len(self._data), 1), self._data.shape[1]),
+                                   dtype=numpy.float64)
+                data[:n] = self._data[self._start:self._stop]
+                self._data = data
+            self._start = 0
+            self._stop = n
+        self._data[self._stop] = row
+        self._stop += 1
+        if self.limit is not None and len(self) > self.limit:
+            self._start = self._stop - self.limit
+
+    def replace(self, row):
+        """ Replaces the last row.
+        """
+        self._data[self._stop - 1] = row
+
+    def view(self):
+        """ Returns a view of the rows that are kept.
+        """
+        return self._data[self._start:self._stop]
+
+class ArrayMonitor(Monitor):
+    """ This class is a Mystic monitor that stores the generations of a solver
+    in ``numpy`` arrays instead of ``list`` instances, so the memory and size of
+    a pickled monitor are proportional to the number of generations it keeps.
+    Each generation is stored as a row of its generation number, identifier,
+    cost, and parameters.
+
+    The history can keep every ``every``-th generation and the last generation,
+    or only the last ``last`` generations that it would keep otherwise. The
+    length of the monitor is the number of generations that it has seen, which
+    Mystic uses for the number of generations of a solver. The termination
+    conditions of Mystic read the history of the cost from the attribute
+    ``_y``, so the attributes ``_x`` and ``_y`` are ``list`` instances of the
+    last ``window`` generations, which are kept for every generation.
+
+    Attributes
+    ----------
+    every : int
+        Keep every ``every``-th generation in the history.
+    last : {None, int}
+        The number of generations to keep in the history.
+    window : int
+        The number of recent generations to keep for the termination
+        conditions.
+    verbose : bool
+        Print the cost of each generation to ``stdout``.
+
+    Parameters
+    ----------
+    every : int
+        Keep every ``every``-th generation in the history. Default is ``1``.
+    last : {None, int}
+        The number of generations to keep in the history. Default is ``None``
+        which keeps all generations.
+    window : int
+        The number of recent generations to keep for the termination
+        conditions. Default is ``1``.
+    verbose : bool
+        Print the cost of each generation to ``stdout``. Default is ``False``.
+    """
+
+    def __init__(self, every=1, last=None, window=1, verbose=False, label="ChiSquare"):
+        if every < 1:
+            raise ValueError("Must keep at least every generation in the history!")
+        if last is not None and last < 1:
+            raise ValueError("Must keep at least one generation in the history!")
+        if window < 1:
+            raise ValueError("Must keep at least one generation for termination!")
+        self.every = every
+        self.last = last
+        self.window = window
+        self.verbose = verbose
+        self.label = label
+        self.k = None
+        self._npts = None
+        self._info = []
+        self._count = 0
+        self._history = None
+        self._recent = None
+        self._pending = False
+
+    def __len__(self):
+        return self._count
+
+    def __call__(self, x, y, id=None, **kwds):
+        x = numpy.asarray(x, dtype=numpy.float64)
+        if x.ndim != 1:
+            raise ValueError("The monitor only stores one parameter vector for each generation!")
+        row = numpy.concatenate([[self._count, numpy.nan if id is None else id, y], x])
+
+        # allocate the arrays when the number of parameters is known
+        if self._history is None:
+            self._history = _Rows(len(row), limit=self.last)
+            self._recent = _Rows(len(row), limit=self.window)
+
+        # the last generation is kept until the next generation replaces it
+        # unless it is also a generation to keep
+        if self._pending:
+            self._history.replace(row)
+        else:
+            self._history.append(row)
+        self._pending = self._count % self.every != 0
+        self._recent.append(row)
+        self._count += 1
+
+        if self.verbose:
+            msg = "Generation {} has {}: {}".format(self._count - 1, self.label, y)
+            if id is not None:
+                msg = "[id: {}] ".format(id) + msg
+            print(msg)
+
+    def __getitem__(self, key):
+        """ Returns the parameters and cost of a generation in the history for
+        an integer key. Otherwise returns a Mystic ``Monitor`` with the
+        generations in the history selected by the key, e.g. Mystic ensemble
+        solvers make the monitors of their solvers with ``monitor[:0]``.
+        """
+        if isinstance(key, (int, numpy.integer)):
+            return self.x[key], self.y[key]
+        monitor = Monitor()
+        monitor.label = self.label
+        monitor._x = self.x[key].tolist()
+        monitor._y = self.y[key].tolist()
+        monitor._id = self._ids(self._rows()[key])
+        return monitor
+
+    def info(self, message):
+        super().info(message)
+        if self.verbose:
+            print(message)
+
+    def extend(self, monitor):
+        """ Adds the generations of a monitor after the generations of this
+        monitor.
+        """
+        for x, y, id in zip(monitor.x, monitor.y, monitor.id):
+            self(x, y, id)
+        self._info.extend(monitor._info)
+
+    def prepend(self, monitor):
+        """ Adds the generations of a monitor before the generations of this
+        monitor, which must be empty. Mystic prepends the monitor that a
+        solver had when a new monitor is set.
+        """
+        if len(monitor) and len(self):
+            raise ValueError("Cannot prepend generations to a monitor with generations!")
+        self.extend(monitor)
+
+    def _rows(self, recent=False):
+        """ Returns the rows of the history or of the recent generations.
+        """
+        rows = self._recent if recent else self._history
+        return numpy.empty((0, 3)) if rows is None else rows.view()
+
+    @staticmethod
+    def _ids(rows):
+        """ Returns the identifiers of rows.
+        """
+        return [None if numpy.isnan(i) else int(i) for i in rows[:, 1]]
+
+    def get_steps(self):
+        return self._rows()[:, 0].astype(int)
+
+    def get_x(self):
+        return self._rows()[:, 3:]
+
+    def get_y(self):
+        return self._rows()[:, 2]
+
+    def get_id(self):
+        return self._ids(self._rows())
+
+    def get_recent_x(self):
+        return self._rows(recent=True)[:, 3:].tolist()
+
+    def get_recent_y(self):
+        return self._rows(recent=True)[:, 2].tolist()
+
+    def get_ix(self):
+        return iter(self.x.tolist())
+
+    def get_ax(self):
+        return self.x.copy()
+
+    def get_iy(self):
+        return iter(self.y.tolist())
+
+    def get_ay(self):
+        return self.y.copy()
+
+    steps = property(get_steps, doc="Generation numbers")
+    x = property(get_x, doc="Params")
+    y = property(get_y, doc="Costs")
+    id = property(get_id, doc="Id")
+    ix = property(get_ix, doc="Params")
+    ax = property(get_ax, doc="Params")
+    iy = property(get_iy, doc="Costs")
+    ay = property(get_ay, doc="Costs")
+    _x = property(get_recent_x, doc="Recent params")
+    _y = property(get_recent_y, doc="Recent costs")
+    _id = property(get_id, doc="Id")
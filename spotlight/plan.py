@@ -1,7 +1,12 @@
 """ This module contains classes for creating refinement plans that can be optimized.
 """
 
+import numpy
+import subprocess
+import time
 from mystic import models
+from spotlight import gsas
+from spotlight import timing
 
 class BasePlan(models.AbstractFunction):
     """ This class describes a refinement plan to optimize. Users should implement
@@ -16,14 +21,91 @@ class BasePlan(models.AbstractFunction):
     The ``BasePlan.compute`` should implement the cost function to be minimized. It
     should return a single ``float`` that is used by the solver to find the mimima.
 
+    The ``BasePlan.compute_batch`` evaluates many parameter vectors at once. If
+    ``compute`` only uses ``numpy`` operations on the values from ``get`` then set
+    ``vectorized`` to ``True`` and ``compute`` is called once with arrays of values.
+    Otherwise subclasses may implement their own ``compute_batch``, or the points are
+    evaluated one at a time. If ``workers`` is set then points of a batch are instead
+    evaluated at the same time in a pool of workers that each have their own refinement
+    plan.
+
+    An evaluation of ``BasePlan.compute`` fails if it raises an exception, returns
+    a value that is not finite, runs longer than ``evaluation_timeout``, or makes an
+    external call through ``spotlight.gsas`` that exits with a non-zero exit status.
+    Failed evaluations are tried again up to ``evaluation_retries`` times. If every
+    try fails then ``evaluation_penalty`` is returned instead, or the last exception
+    is raised if there is no penalty. The wall-clock limit is enforced on external
+    calls made through ``spotlight.gsas``.
+
+    If ``cache`` is set then values of successful evaluations are stored in the cache
+    and reused for parameter vectors that are within the tolerance of the cache.
+
+    If ``surrogate`` is set then values of successful evaluations are used to fit a
+    surrogate model, and parameter vectors that the surrogate model predicts are not
+    promising get the predicted value instead of being evaluated.
+
+    The ``fidelity`` is a number between 0 and 1 that ``compute`` may use to make a
+    cheaper evaluation, e.g. a restricted TOF range or fewer refinement cycles. If
+    ``fidelity_screen`` is set then ``function`` evaluates each parameter vector at
+    the low fidelity of the screen first, and only parameter vectors with improving
+    values are evaluated again at full fidelity. Only full-fidelity values are stored
+    in the cache and the surrogate model. Batches evaluated with ``compute_batch`` or
+    in ``workers`` are evaluated at full fidelity.
+
+    If ``scaling`` is set then the optimizer runs in the unit hypercube or without
+    fixed parameters, and parameter vectors given to ``function``, ``function_batch``,
+    ``residuals_batch``, and ``prefetch`` are mapped to all parameters in the units of
+    the parameters with ``physical``. The cache, the surrogate model, the workers,
+    ``compute``, and ``get`` only see these parameter vectors.
+
     Attributes
     ----------
     idxs : dict
         A ``dict`` with key parameter and value index of parameter. E.g. ``{"x" : 1, "y" : 2}``.
         This corresponds to the index of the parameter given in ``names``.
     _p : list
-        A list of the latest parameters sent to the optimized function. The list should
-        be indexed by ``idxs``.
+        A list of the latest parameters sent to the optimized function in the units of
+        the parameters. The list should be indexed by ``idxs``.
+    vectorized : bool
+        If ``compute`` works on arrays of values from ``get``.
+    evaluation_timeout : {None, float}
+        Wall-clock limit in seconds of an evaluation.
+    evaluation_retries : int
+        Number of times to try a failed evaluation again.
+    evaluation_penalty : {None, float}
+        Value returned if every try of an evaluation fails.
+    cache : {None, EvaluationCache}
+        A cache of values of parameter vectors that were already evaluated.
+    cache_counts : dict
+        A ``dict`` with keys ``"hits"`` and ``"misses"`` and value number of
+        cache lookups since the last call to ``pop_cache_counts``.
+    workers : {None, WorkerPool}
+        A pool of workers to evaluate batches of parameter vectors.
+    surrogate : {None, SurrogateScreen}
+        A surrogate model to screen parameter vectors before evaluating them.
+    surrogate_counts : dict
+        A ``dict`` with keys ``"screened"`` and ``"evaluated"`` and value number
+        of parameter vectors since the last call to ``pop_surrogate_counts``.
+    scaling : {None, tuple}
+        A tuple of arrays of the offsets and scales of the parameters and a
+        mask of the parameters that the optimizer sees.
+    fidelity : float
+        The fidelity of the current evaluation, where ``1.0`` is full fidelity.
+    fidelity_screen : {None, FidelityScreen}
+        Decides which parameter vectors evaluated at low fidelity are evaluated
+        at full fidelity.
+    fidelity_counts : dict
+        A ``dict`` with keys ``"low"``, ``"full"``, and ``"screened"`` and
+        value number of evaluations at low fidelity, evaluations at full
+        fidelity, and parameter vectors that were not promoted since the last
+        call to ``pop_fidelity_counts``.
+    failures : dict
+        A ``dict`` with key kind of failure and value number of failures since
+        the last call to ``pop_failures``. The kinds are ``"timeout"``,
+        ``"exit"`` for external calls with a non-zero exit status, and
+        ``"error"`` for failed tries, ``"penalty"`` for evaluations that
+        returned ``evaluation_penalty``, and ``"batch"`` for calls to
+        ``compute_batch`` that raised an exception.
 
     Parameters
     ----------
@@ -31,22 +113,57 @@ class BasePlan(models.AbstractFunction):
         A ``list`` of parameter names. E.g. ``["x", "y"]``.
     """
 
+    # compute works on arrays of values
+    vectorized = False
+
+    # fidelity of the current evaluation
+    fidelity = 1.0
+
+    # options for failed evaluations
+    evaluation_timeout = None
+    evaluation_retries = 0
+    evaluation_penalty = None
+
     def __init__(self, names, initialize=True):
         super().__init__(ndim=len(names))
  
         # store map to parameters
         self.idxs = {name : i for i, name in enumerate(names)}
         self._p = None
+        self.failures = {}
+        self._batch_failed = False
+        self.cache = None
+        self.cache_counts = {}
+        self.workers = None
+        self.surrogate = None
+        self.surrogate_counts = {}
+        self.scaling = None
+        self.fidelity_screen = None
+        self.fidelity_counts = {}
+        self._prefetched = {}
 
         # setup initial porition of refinement plan
         if initialize:
             self.initialize()
 
+    @property
+    def scaling(self):
+        return self._scaling
+
+    @scaling.setter
+    def scaling(self, scaling):
+        """ Sets the scaling and the number of parameters that Mystic checks
+        the parameter vectors from the optimizer against.
+        """
+        self._scaling = scaling
+        self.ndim = len(self.idxs) if scaling is None else int(numpy.count_nonzero(scaling[2]))
+
     def initialize(self):
         """ Function called once before optimization.
         """
         pass
 
+    @timing.timer("plan.function")
     def function(self, p):
         """ Function used by Mystic for optimization.
 
@@ -60,8 +177,342 @@ class BasePlan(models.AbstractFunction):
         float
            The value of the evaluated cost function.
         """
-        self._p = p
+        self._p = self.physical(p)
+
+        # use a value from a batch evaluated by prefetch
+        if self._prefetched:
+            value = self._prefetched.pop(tuple(p), None)
+            if value is not None:
+                return value
+        p = self._p
+
+        # use a value of a nearby parameter vector from the cache
+        value = self._lookup(p)
+        if value is not None:
+            return value
+
+        # use the predicted value if the surrogate model rejects the point
+        value = self._screen(p)
+        if value is not None:
+            return value
+
+        # evaluate at low fidelity and only promote improving values
+        low_value = self._evaluate_low_fidelity()
+        if low_value is not None and not self.fidelity_screen.promote(low_value):
+            self._count_fidelity("screened")
+            return self.fidelity_screen.estimate(low_value)
+
+        # evaluate and store successful evaluations
+        value, success = self._evaluate()
+        if self.fidelity_screen is not None:
+            self._count_fidelity("full")
+        if success:
+            self._store(p, value)
+            if low_value is not None:
+                self.fidelity_screen.add(low_value, value)
+        return value
+
+    def _evaluate_low_fidelity(self):
+        """ Returns the value of the latest parameters at the low fidelity of
+        the fidelity screen, or ``None`` if there is no fidelity screen or the
+        evaluation failed.
+        """
+        if self.fidelity_screen is None:
+            return None
+        fidelity, self.fidelity = self.fidelity, self.fidelity_screen.low_fidelity
+        try:
+            value, success = self._evaluate()
+        finally:
+            self.fidelity = fidelity
+        self._count_fidelity("low")
+        return value if success else None
+
+    def _count_fidelity(self, key):
+        """ Counts an evaluation or a parameter vector that was not promoted.
+        """
+        self.fidelity_counts[key] = self.fidelity_counts.get(key, 0) + 1
+
+    def _screen(self, p):
+        """ Returns the predicted value of a parameter vector if the surrogate
+        model rejects it, or ``None`` if there is no surrogate model or the
+        parameter vector should be evaluated.
+        """
+        if self.surrogate is None:
+            return None
+        value = self.surrogate.screen(p)
+        key = "evaluated" if value is None else "screened"
+        self.surrogate_counts[key] = self.surrogate_counts.get(key, 0) + 1
+        return value
+
+    def _store(self, p, value):
+        """ Adds the value of a successful evaluation to the cache and the
+        surrogate model.
+        """
+        if self.cache is not None:
+            self.cache.put(p, value)
+        if self.surrogate is not None:
+            self.surrogate.add(p, value)
+
+    def _lookup(self, p):
+        """ Returns the value of a parameter vector from the cache, or ``None``
+        if there is no cache or the value is not in the cache.
+        """
+        if self.cache is None:
+            return None
+        value = self.cache.get(p)
+        key = "misses" if value is None else "hits"
+        self.cache_counts[key] = self.cache_counts.get(key, 0) + 1
+        return value
+
+    def _evaluate(self):
+        """ Evaluates ``compute`` for the latest parameters and handles failed
+        evaluations.
+
+        Returns
+        -------
+        value : float
+            The value of the cost function.
+        success : bool
+            If the value is from a successful evaluation rather than the
+            penalty.
+        """
+
+        # evaluate without checking for failures
+        if self.evaluation_timeout is None and not self.evaluation_retries \
+                and self.evaluation_penalty is None:
+            value = self.compute()
+            return value, bool(numpy.isfinite(value))
+
+        # try evaluation until it succeeds or there are no more retries
+        for _ in range(int(self.evaluation_retries) + 1):
+            if self.evaluation_timeout is not None:
+                gsas.set_deadline(time.time() + self.evaluation_timeout)
+            try:
+                value = self.compute()
+                if not numpy.isfinite(value):
+                    raise ValueError("Evaluation returned {}!".format(value))
+                return value, True
+            except subprocess.TimeoutExpired as err:
+                error = err
+                kind = "timeout"
+            except gsas.ExternalCallError as err:
+                error = err
+                kind = "exit"
+            except Exception as err:
+                error = err
+                kind = "error"
+            finally:
+                gsas.set_deadline(None)
+            self.failures[kind] = self.failures.get(kind, 0) + 1
+
+        # all tries failed
+        if self.evaluation_penalty is None:
+            raise error
+        self.failures["penalty"] = self.failures.get("penalty", 0) + 1
+        return self.evaluation_penalty, False
+
+    @timing.timer("plan.function_batch")
+    def function_batch(self, P):
+        """ Evaluates many parameter vectors. Points that fail in a batch or
+        return a value that is not finite are evaluated again one at a time
+        with ``function``, which handles failed evaluations. If there is a pool
+        of ``workers`` then points are evaluated in the workers instead.
+
+        Parameters
+        ----------
+        P : numpy.array
+            An array with shape ``(n, ndim)`` of parameter vectors.
+
+        Returns
+        -------
+        numpy.array
+            An array with shape ``(n,)`` of the values of the cost function.
+        """
+        P = numpy.atleast_2d(numpy.asarray(P, dtype=float))
+
+        # evaluate one point at a time if there is no batch computation
+        if self.workers is None and not self.vectorized \
+                and type(self).compute_batch is BasePlan.compute_batch:
+            return numpy.array([self.function(p) for p in P], dtype=float)
+        P = self.physical(P)
+
+        # use values from the cache
+        values = numpy.full(len(P), numpy.nan)
+        if self.cache is not None:
+            for i, p in enumerate(P):
+                value = self._lookup(p)
+                values[i] = numpy.nan if value is None else value
+        idxs = numpy.flatnonzero(numpy.isnan(values))
+
+        # evaluate points that are not in the cache in the pool of workers
+        if self.workers is not None and len(idxs):
+            for i, (value, success, failures) in zip(idxs, self.workers.evaluate(P[idxs])):
+                values[i] = value
+                for kind, n in failures.items():
+                    self.failures[kind] = self.failures.get(kind, 0) + n
+                if success:
+                    self._store(P[i], value)
+            return values
+
+        # evaluate batch of points that are not in the cache
+        if len(idxs):
+            try:
+                values[idxs] = numpy.array(self.compute_batch(P[idxs]),
+                                           dtype=float).reshape(len(idxs))
+            except Exception as error:
+                self.failures["batch"] = self.failures.get("batch", 0) + 1
+                if not self._batch_failed:
+                    print("Evaluating points one at a time since compute_batch failed: {!r}".format(
+                              error))
+                self._batch_failed = True
+
+        # evaluate points that failed in the batch one at a time
+        for i in idxs:
+            success = bool(numpy.isfinite(values[i]))
+            if not success:
+                self._p = P[i]
+                values[i], success = self._evaluate()
+            if success:
+                self._store(P[i], values[i])
+        return values
+
+    def compute_batch(self, P):
+        """ Function to be optimized for many parameter vectors. This sets the
+        latest parameters to the transposed array, so ``get`` returns an array
+        of values for each parameter, and calls ``compute``. It requires that
+        ``vectorized`` is ``True``.
+
+        Parameters
+        ----------
+        P : numpy.array
+            An array with shape ``(n, ndim)`` of parameter vectors.
+
+        Returns
+        -------
+        numpy.array
+            An array with shape ``(n,)`` of the values of the cost function.
+        """
+        self._p = P.T
         return self.compute()
+
+    def residuals_batch(self, P):
+        """ Evaluates the residuals of many parameter vectors for least-squares
+        solvers, whose cost is the sum of squares of the residuals. Subclasses
+        that compute the individual residuals, e.g. the weighted differences of
+        the observed and calculated profiles, implement ``residuals_batch`` and
+        map the parameter vectors to the units of the parameters with
+        ``physical``. A single residual, e.g. the square root of chi-squared,
+        gives a Gauss-Newton step of rank one, so there is no default.
+
+        Parameters
+        ----------
+        P : numpy.array
+            An array with shape ``(n, ndim)`` of parameter vectors.
+
+        Returns
+        -------
+        numpy.array
+            An array with shape ``(n, nresiduals)`` of the residuals.
+        """
+        raise NotImplementedError("Plan does not have a residuals_batch function!")
+
+    def physical(self, P):
+        """ Maps parameter vectors from the optimizer to all parameters in the
+        units of the parameters if ``scaling`` is set. A parameter is its offset
+        plus its scale times the value from the optimizer, or its offset if the
+        optimizer does not see it.
+
+        Parameters
+        ----------
+        P : numpy.array
+            An array with shape ``(m,)`` or ``(n, m)`` of parameter vectors,
+            where ``m`` is the number of parameters the optimizer sees.
+
+        Returns
+        -------
+        numpy.array
+            An array with shape ``(ndim,)`` or ``(n, ndim)`` of the parameter
+            vectors.
+        """
+        if self.scaling is None:
+            return P
+        offset, scale, free = self.scaling
+        P = numpy.asarray(P, dtype=float)
+        X = numpy.broadcast_to(offset, P.shape[:-1] + offset.shape).copy()
+        X[..., free] += scale[free] * P
+        return X
+
+    def prefetch(self, P):
+        """ Evaluates many parameter vectors in a batch and keeps the values
+        so that the next calls to ``function`` with these parameter vectors
+        return them without evaluating again.
+
+        Parameters
+        ----------
+        P : numpy.array
+            An array with shape ``(n, ndim)`` of parameter vectors.
+
+        Returns
+        -------
+        numpy.array
+            An array with shape ``(n,)`` of the values of the cost function.
+        """
+        P = numpy.atleast_2d(numpy.asarray(P, dtype=float))
+        values = self.function_batch(P)
+        self._prefetched.update(zip(map(tuple, P), values))
+        return values
+
+    def pop_cache_counts(self):
+        """ Returns the number of cache hits and misses since the last call and
+        starts counting again.
+
+        Returns
+        -------
+        counts : dict
+            A ``dict`` with keys ``"hits"`` and ``"misses"`` and value number
+            of lookups.
+        """
+        counts, self.cache_counts = self.cache_counts, {}
+        return counts
+
+    def pop_surrogate_counts(self):
+        """ Returns the number of screened and evaluated parameter vectors
+        since the last call and starts counting again.
+
+        Returns
+        -------
+        counts : dict
+            A ``dict`` with keys ``"screened"`` and ``"evaluated"`` and value
+            number of parameter vectors.
+        """
+        counts, self.surrogate_counts = self.surrogate_counts, {}
+        return counts
+
+    def pop_fidelity_counts(self):
+        """ Returns the number of evaluations at each fidelity and of parameter
+        vectors that were not promoted since the last call and starts counting
+        again.
+
+        Returns
+        -------
+        counts : dict
+            A ``dict`` with keys ``"low"``, ``"full"``, and ``"screened"`` and
+            value number of evaluations or parameter vectors.
+        """
+        counts, self.fidelity_counts = self.fidelity_counts, {}
+        return counts
+
+    def pop_failures(self):
+        """ Returns the number of failed evaluations since the last call and
+        starts counting again.
+
+        Returns
+        -------
+        failures : dict
+            A ``dict`` with key kind of failure and value number of failures.
+        """
+        failures, self.failures = self.failures, {}
+        return failures
         
     def compute(self):
         """ Function to be optimized.
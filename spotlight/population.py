@@ -0,0 +1,212 @@
+""" This module contains Mystic solvers that evaluate a population of parameter
+vectors in each generation.
+"""
+
+import numpy
+from mystic.abstract_map_solver import AbstractMapSolver
+from mystic.monitors import Null
+from mystic.tools import wrap_bounds
+from mystic.tools import wrap_function
+from mystic.tools import wrap_penalty
+
+class PlanMapper:
+    """ This class is a map for Mystic map solvers that evaluates a generation
+    of parameter vectors with ``function_batch`` of a refinement plan, so the
+    generation is evaluated in the pool of workers of the refinement plan if it
+    has one. The function given to the map is not called. Parameter vectors
+    outside the bounds are not evaluated and their value is ``numpy.inf`` as
+    with the bounds of the cost function of a Mystic solver.
+
+    Attributes
+    ----------
+    cost : Plan
+        The refinement plan.
+    lower_bounds : numpy.array
+        The lower bounds indexed by parameter.
+    upper_bounds : numpy.array
+        The upper bounds indexed by parameter.
+
+    Parameters
+    ----------
+    cost : Plan
+        The refinement plan.
+    lower_bounds : list
+        A ``list`` of lower bounds indexed by parameter.
+    upper_bounds : list
+        A ``list`` of upper bounds indexed by parameter.
+    """
+
+    def __init__(self, cost, lower_bounds, upper_bounds):
+        self.cost = cost
+        self.lower_bounds = numpy.asarray(lower_bounds, dtype=float)
+        self.upper_bounds = numpy.asarray(upper_bounds, dtype=float)
+
+    def __call__(self, func, points, **kwargs):
+        points = numpy.atleast_2d(numpy.asarray(points, dtype=float))
+        inside = numpy.all((points >= self.lower_bounds) & (points <= self.upper_bounds), axis=1)
+        values = numpy.full(len(points), numpy.inf)
+        if inside.any():
+            values[inside] = self.cost.function_batch(points[inside])
+        return list(values)
+
+class CMAESSolver(AbstractMapSolver):
+    """ This class is a covariance matrix adaptation evolution strategy
+    (CMA-ES) solver. Each generation samples a population from a multivariate
+    normal distribution, evaluates it with the map set by ``SetMapper``, and
+    updates the mean, step size, and covariance matrix of the distribution from
+    the best half of the population.
+
+    The search is done in coordinates where each bounded parameter is scaled to
+    the unit interval. Samples are clipped to the bounds. Parameters with equal
+    lower and upper bounds are not varied.
+
+    Parameters
+    ----------
+    dim : int
+        The number of parameters.
+    npop : {None, int}
+        The size of the population. Default is ``None`` which uses
+        ``4 + 3 * ln(dim)``.
+    sigma : float
+        The initial step size in scaled coordinates. Default is ``0.3``.
+    """
+
+    def __init__(self, dim, npop=None, **kwds):
+        if npop is None:
+            npop = 4 + int(3 * numpy.log(dim))
+        super().__init__(dim, npop=max(npop, 2))
+        self.sigma = kwds.get("sigma", 0.3)
+        self._mean = None
+        self._step = None
+        self._cov = None
+        self._path_c = None
+        self._path_s = None
+
+    def _SetEvaluationLimits(self, iterscale=1000, evalscale=1000):
+        super()._SetEvaluationLimits(iterscale, evalscale)
+
+    def _decorate_objective(self, cost, ExtraArgs=None):
+        """ Decorates the cost function with bounds and penalties. Evaluations
+        are counted in ``_Step`` since the map may evaluate in other processes.
+        """
+        raw = cost
+        if ExtraArgs is None:
+            ExtraArgs = ()
+        _, cost = wrap_function(cost, ExtraArgs, Null())
+        if self._useStrictRange:
+            cost = wrap_bounds(cost, self._strictMin, self._strictMax)
+        cost = wrap_penalty(cost, self._penalty)
+        self._cost = (cost, raw, ExtraArgs)
+        self._live = True
+        return cost
+
+    def _scaling(self):
+        """ Returns the offset and scale of each parameter and which parameters
+        are varied.
+        """
+        if self._useStrictRange:
+            lb = numpy.asarray(self._strictMin, dtype=float)
+            ub = numpy.asarray(self._strictMax, dtype=float)
+        else:
+            lb = numpy.full(self.nDim, -numpy.inf)
+            ub = numpy.full(self.nDim, numpy.inf)
+        bounded = numpy.isfinite(lb) & numpy.isfinite(ub)
+        offset = numpy.where(bounded, lb, 0.0)
+        scale = numpy.where(bounded, ub - lb, 1.0)
+        free = scale > 0
+        return offset, numpy.where(free, scale, 1.0), free, lb, ub
+
+    def _evaluate(self, cost, points):
+        """ Evaluates a generation and counts the evaluations.
+        """
+        values = numpy.array(list(self._map(cost, points.tolist(), **self._mapconfig)),
+                             dtype=float).reshape(len(points))
+        self._fcalls[0] += len(points)
+        for x, y in zip(points, values):
+            self._evalmon(x, y, self.id)
+        return values
+
+    def _Step(self, cost=None, ExtraArgs=None, **kwds):
+        settings = self._process_inputs(kwds)
+        callback = settings.get("callback", None)
+        cost = self._bootstrap_objective(cost, ExtraArgs)
+        offset, scale, free, lb, ub = self._scaling()
+        n = max(int(free.sum()), 1)
+
+        # strategy parameters
+        npop = self.nPop
+        mu = npop // 2
+        weights = numpy.log(mu + 0.5) - numpy.log(numpy.arange(1, mu + 1))
+        weights /= weights.sum()
+        mueff = 1.0 / (weights ** 2).sum()
+        cc = (4.0 + mueff / n) / (n + 4.0 + 2.0 * mueff / n)
+        cs = (mueff + 2.0) / (n + mueff + 5.0)
+        c1 = 2.0 / ((n + 1.3) ** 2 + mueff)
+        cmu = min(1.0 - c1, 2.0 * (mueff - 2.0 + 1.0 / mueff) / ((n + 2.0) ** 2 + mueff))
+        damps = 1.0 + 2.0 * max(0.0, numpy.sqrt((mueff - 1.0) / (n + 1.0)) - 1.0) + cs
+        chin = numpy.sqrt(n) * (1.0 - 1.0 / (4.0 * n) + 1.0 / (21.0 * n ** 2))
+
+        # evaluate the initial population and start from its best point
+        init = not len(self._stepmon)
+        if init:
+            points = numpy.clip(numpy.asarray(self.population, dtype=float), lb, ub)
+            values = self._evaluate(cost, points)
+            order = numpy.argsort(values)
+            self._mean = (points[order[0]] - offset) / scale
+            self._step = self.sigma
+            self._cov = numpy.diag(free.astype(float))
+            self._path_c = numpy.zeros(self.nDim)
+            self._path_s = numpy.zeros(self.nDim)
+
+        # sample and evaluate a new generation
+        else:
+            eigvals, eigvecs = numpy.linalg.eigh(self._cov)
+            eigvals = numpy.sqrt(numpy.maximum(eigvals, 0.0))
+            z = numpy.random.standard_normal((npop, self.nDim))
+            y = z.dot(numpy.diag(eigvals)).dot(eigvecs.T) * free
+            x = numpy.clip(self._mean + self._step * y, (lb - offset) / scale,
+                           (ub - offset) / scale)
+            points = numpy.where(free, x * scale + offset, lb)
+            values = self._evaluate(cost, points)
+            order = numpy.argsort(values)
+
+            # move the mean towards the best half of the generation
+            y = (x[order[:mu]] - self._mean) / self._step
+            y_mean = weights.dot(y)
+            self._mean = self._mean + self._step * y_mean
+
+            # update the evolution paths
+            inv_sqrt = eigvecs.dot(numpy.diag(numpy.where(eigvals > 0, 1.0 / numpy.where(eigvals > 0, eigvals, 1.0), 0.0))).dot(eigvecs.T)
+            self._path_s = (1.0 - cs) * self._path_s \
+                           + numpy.sqrt(cs * (2.0 - cs) * mueff) * inv_sqrt.dot(y_mean)
+            norm_s = numpy.linalg.norm(self._path_s)
+            hsig = norm_s / numpy.sqrt(1.0 - (1.0 - cs) ** (2 * (self.generations + 1))) / chin \
+                       < 1.4 + 2.0 / (n + 1.0)
+            self._path_c = (1.0 - cc) * self._path_c \
+                           + hsig * numpy.sqrt(cc * (2.0 - cc) * mueff) * y_mean
+
+            # update the covariance matrix and step size
+            self._cov = (1.0 - c1 - cmu) * self._cov \
+                        + c1 * (numpy.outer(self._path_c, self._path_c)
+                                + (1.0 - hsig) * cc * (2.0 - cc) * self._cov) \
+                        + cmu * (y.T * weights).dot(y)
+            self._step *= numpy.exp((cs / damps) * (norm_s / chin - 1.0))
+
+        # keep the generation and the best point so far
+        self.population = [p for p in points]
+        self.popEnergy = list(values)
+        if init or values[order[0]] < self.bestEnergy:
+            self.bestSolution = points[order[0]].copy()
+            self.bestEnergy = values[order[0]]
+        self._stepmon(self.bestSolution, self.bestEnergy, self.id)
+        if callback is not None:
+            callback(self.bestSolution)
+        if init:
+            self._termination(self)
+
+    def _process_inputs(self, kwds):
+        settings = super()._process_inputs(kwds)
+        settings.update({"sigma" : self.sigma})
+        [settings.update({i : j}) for (i, j) in kwds.items() if i in settings]
+        self.sigma = settings["sigma"]
+        return settings
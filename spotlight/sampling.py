@@ -1,136 +1,373 @@
-""" This module contains functions that return a new, single point in a given
-parameter space. In general, these functions are not used to return
-multi-dimensional arrays. These functions are intended to be called only a
-few times.
+""" This module contains classes that return new points in a given parameter
+space. Calling ``sample`` without arguments returns a single point, and
+``sample(n)`` returns an array with shape ``(n, ndim)`` of ``n`` points that
+are generated at once, e.g. the starting points of all walkers.
 """
 
 import numpy
-from mystic import math
+import warnings
+from mystic.solvers import diffev
 from spotlight import container
+from spotlight import spatial
 
 class SamplingBase(container.Container):
+    """ This class is the base class of sampling methods.
 
-    def __init__(self, lower_bounds, upper_bounds):
-        super().__init__(lower_bounds=lower_bounds, upper_bounds=upper_bounds)
+    Attributes
+    ----------
+    predraw : bool
+        If the points of all walkers can be drawn before the walkers start,
+        i.e. a point does not depend on the results of other walkers.
+    random_state : {None, numpy.random.RandomState}
+        The random number generator. If ``None`` the global random number
+        generator of ``numpy.random`` is used.
+    """
 
-    def sample(self, *args, **kwargs):
+    predraw = True
+
+    def __init__(self, lower_bounds, upper_bounds, random_state=None, **kwargs):
+        super().__init__(lower_bounds=lower_bounds, upper_bounds=upper_bounds,
+                         random_state=random_state, **kwargs)
+
+    def sample(self, n=None):
         raise NotImplementedError
 
+    @property
+    def random(self):
+        """ Returns the random number generator.
+        """
+        return numpy.random if self.random_state is None else self.random_state
+
+    def _bounds(self):
+        """ Returns the lower and upper bounds as arrays.
+        """
+        return (numpy.asarray(self.lower_bounds, dtype=float),
+                numpy.asarray(self.upper_bounds, dtype=float))
+
+    @staticmethod
+    def _return(pts, n):
+        """ Returns the single point if ``n`` is ``None``, otherwise all points.
+        """
+        return pts[0] if n is None else pts
+
 class UniformSampling(SamplingBase):
 
-    def sample(self):
-        """ Returns a new, single point via uniform distribution.
-    
+    def sample(self, n=None):
+        """ Returns new points via uniform distribution.
+
         Parameters
         ----------
-        lower_bounds : list
-            List of ``float`` that are lower bounds. List is indexed by parameter.
-        upper_bounds : list
-            List of ``float`` that are upper bounds. List is indexed by parameter.
-    
+        n : {None, int}
+            The number of points. Default is ``None`` which returns a single
+            point.
+
         Returns
         -------
         pts : numpy.array
-            An array with new point.
+            An array with a new point, or an array with shape ``(n, ndim)`` of
+            new points.
         """
-        ndim = len(self.lower_bounds)
-        pts = numpy.zeros(ndim)
-        for j in range(ndim):
-            lb = self.lower_bounds[j]
-            ub = self.upper_bounds[j]
-            pts[j] = numpy.random.uniform(lb, ub)
-        return pts
+        lb, ub = self._bounds()
+        pts = self.random.uniform(lb, ub, size=(1 if n is None else n, len(lb)))
+        return self._return(pts, n)
 
 class ToleranceSampling(SamplingBase):
+    """ This class places new points furthest from existing points. The
+    existing points are given as a ``spatial.PointIndex`` or as a ``list`` of
+    points, and each new point maximizes the distance to the nearest existing
+    point with the differential evolution solver of Mystic as
+    ``mystic.math.fillpts`` does. The index finds the nearest point in time that
+    grows logarithmically with the number of existing points.
+    """
+
+    predraw = False
 
-    def __init__(self, lower_bounds, upper_bounds, data=None):
-        super().__init__(lower_bounds=lower_bounds, upper_bounds=upper_bounds, data=data)
+    def __init__(self, lower_bounds, upper_bounds, data=None, random_state=None):
+        super().__init__(lower_bounds, upper_bounds, random_state=random_state, data=data)
+
+    def sample(self, n=None):
+        """ Returns new points some tolerence away from existing points.
 
-    def sample(self):
-        """ Returns a new, single point some tolerence away from existing points.
-    
         Parameters
         ----------
-        lower_bounds : list
-            List of ``float`` that are lower bounds. List is indexed by parameter.
-        upper_bounds : list
-            List of ``float`` that are upper bounds. List is indexed by parameter.
-        data : {None, list}
-            List of tuples. Each tuple is a list of ``float`` that are previous
-            data points.
-    
+        n : {None, int}
+            The number of points. Default is ``None`` which returns a single
+            point.
+
         Returns
         -------
         pts : numpy.array
-            An array with new point.
+            An array with a new point, or an array with shape ``(n, ndim)`` of
+            new points.
         """
-        rtol = None
-        dist = None
-        n_new_pts = 1
-        data = [] if self.data == None else self.data
-        if len(data) == 0:
-            return uniform(self.lower_bounds, self.upper_bounds)
-        pts = math.fillpts(self.lower_bounds, self.upper_bounds, n_new_pts, data, rtol, dist)
-        return pts[0]
+        index = self.data
+        if not isinstance(index, spatial.PointIndex):
+            index = spatial.PointIndex()
+            if self.data is not None and len(self.data):
+                index.add(numpy.vstack(self.data))
+        if len(index) == 0:
+            return UniformSampling(self.lower_bounds, self.upper_bounds,
+                                   random_state=self.random_state).sample(n)
+
+        # each new point is also away from the previous new points
+        bounds = list(zip(self.lower_bounds, self.upper_bounds))
+        pts = []
+        def holes(x):
+            dist = index.distance(x)[0]
+            if pts:
+                dist = min(dist, numpy.sqrt(((numpy.array(pts) - x) ** 2).sum(axis=1)).min())
+            return -dist
+        for _ in range(1 if n is None else n):
+            res = diffev(holes, x0=bounds, bounds=bounds, npop=20, ftol=1e-4, gtol=None,
+                         disp=0, full_output=0)
+            pts.append(numpy.ravel(res))
+        return self._return(numpy.array(pts), n)
 
 class LinearSampling(SamplingBase):
 
-    def __init__(self, lower_bounds, upper_bounds, step=0, nsteps=1):
-        super().__init__(lower_bounds=lower_bounds, upper_bounds=upper_bounds,
+    predraw = False
+
+    def __init__(self, lower_bounds, upper_bounds, step=0, nsteps=1, random_state=None):
+        super().__init__(lower_bounds, upper_bounds, random_state=random_state,
                          step=step, nsteps=nsteps)
 
-    def sample(self, step=None):
-        """ Returns a new, single point linearlly-spaced ``i`` from the lower
+    def sample(self, n=None, step=None):
+        """ Returns new points linearlly-spaced ``step`` from the lower
         boundary.
-    
+
         Parameters
         ----------
+        n : {None, int}
+            The number of points at consecutive steps, which wrap around after
+            ``nsteps`` steps. Default is ``None`` which returns a single point.
         step : int
             Index to select.
-    
+
         Returns
         -------
         pts : numpy.array
-            An array with new point.
+            An array with a new point, or an array with shape ``(n, ndim)`` of
+            new points.
         """
         step = self.step if step is None else step
-        ndim = len(self.lower_bounds)
-        pts = numpy.zeros(ndim)
-        for j in range(ndim):
-            step_size = (self.upper_bounds[j] - self.lower_bounds[j]) / (self.nsteps)
-            pts[j] = step * step_size + self.lower_bounds[j] + 0.5 * step_size
-        return pts
+        lb, ub = self._bounds()
+        step_size = (ub - lb) / self.nsteps
+        steps = (step + numpy.arange(1 if n is None else n)) % self.nsteps
+        pts = steps[:, None] * step_size + lb + 0.5 * step_size
+        return self._return(pts, n)
 
 class MidpointSampling(SamplingBase):
 
-    def sample(self):
-        """ Returns a new, single point at the center.
-    
+    def sample(self, n=None):
+        """ Returns new points at the center.
+
         Parameters
         ----------
-        lower_bounds : list
-            List of ``float`` that are lower bounds. List is indexed by parameter.
-        upper_bounds : list
-            List of ``float`` that are upper bounds. List is indexed by parameter.
-    
+        n : {None, int}
+            The number of points. Default is ``None`` which returns a single
+            point.
+
         Returns
         -------
         pts : numpy.array
-            An array with new point.
+            An array with a new point, or an array with shape ``(n, ndim)`` of
+            new points.
+        """
+        lb, ub = self._bounds()
+        pts = numpy.tile((ub - lb) / 2.0 + lb, (1 if n is None else n, 1))
+        return self._return(pts, n)
+
+class QuasiRandomSampling(SamplingBase):
+    """ This class is the base class of scrambled quasi-random sampling methods
+    from ``scipy.stats.qmc``. The point of a walker is the point at position
+    ``index`` of the sequence, so processes draw disjoint points of the same
+    sequence by the global index of the walker. The scrambling is drawn from
+    ``random_state``, so processes with the same random state use the same
+    sequence.
+
+    Attributes
+    ----------
+    index : int
+        The position of the first point in the sequence.
+    """
+
+    def __init__(self, lower_bounds, upper_bounds, index=0, random_state=None):
+        super().__init__(lower_bounds, upper_bounds, random_state=random_state, index=index)
+
+    def _engine(self, ndim, seed):
+        raise NotImplementedError
+
+    def _points(self, engine, n):
+        """ Returns ``n`` points in the unit hypercube starting at ``index``.
         """
-        ndim = len(self.lower_bounds)
-        pts = numpy.zeros(ndim)
-        for j in range(ndim):
-            lb = self.lower_bounds[j]
-            ub = self.upper_bounds[j]
-            pts[j] = (ub - lb) / 2.0 + lb
-        return pts
+        # Sobol sequences warn if the number of points is not a power of 2
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            if self.index:
+                engine.fast_forward(self.index)
+            return engine.random(n)
+
+    def sample(self, n=None):
+        """ Returns new points of the sequence starting at ``index``.
+
+        Parameters
+        ----------
+        n : {None, int}
+            The number of points. Default is ``None`` which returns a single
+            point.
+
+        Returns
+        -------
+        pts : numpy.array
+            An array with a new point, or an array with shape ``(n, ndim)`` of
+            new points.
+        """
+        lb, ub = self._bounds()
+        engine = self._engine(len(lb), self.random.randint(2 ** 31 - 1))
+        pts = lb + self._points(engine, 1 if n is None else n) * (ub - lb)
+        return self._return(pts, n)
+
+class SobolSampling(QuasiRandomSampling):
+    """ This class draws points of a scrambled Sobol sequence.
+    """
+
+    def _engine(self, ndim, seed):
+        from scipy.stats import qmc
+        return qmc.Sobol(ndim, scramble=True, seed=seed)
+
+class HaltonSampling(QuasiRandomSampling):
+    """ This class draws points of a scrambled Halton sequence.
+    """
+
+    def _engine(self, ndim, seed):
+        from scipy.stats import qmc
+        return qmc.Halton(ndim, scramble=True, seed=seed)
+
+class LatinHypercubeSampling(QuasiRandomSampling):
+    """ This class draws points of a Latin hypercube design. The design
+    stratifies each parameter over ``nsamples`` points, so ``nsamples`` should
+    be the total number of walkers.
+
+    Attributes
+    ----------
+    nsamples : {None, int}
+        The number of points in the design. If ``None`` the design has the
+        points up to the last point that is drawn.
+    """
+
+    def __init__(self, lower_bounds, upper_bounds, index=0, nsamples=None, random_state=None):
+        super().__init__(lower_bounds, upper_bounds, index=index, random_state=random_state)
+        self.nsamples = nsamples
+
+    def _engine(self, ndim, seed):
+        from scipy.stats import qmc
+        return qmc.LatinHypercube(ndim, seed=seed)
+
+    def _points(self, engine, n):
+        nsamples = max(self.nsamples or 0, self.index + n)
+        return engine.random(nsamples)[self.index:self.index + n]
+
+class RejectionSampling(SamplingBase):
+    """ This class places new points outside the regions that terminated
+    walkers already searched. Uniformly drawn candidates within the critical
+    distance of a point in the history or the best point of a terminated
+    walker are rejected, and the first candidate that is not rejected is
+    returned. If all candidates are rejected then the candidate furthest from
+    the known points is returned. The critical distance is the distance of
+    multi-level single-linkage (MLSL) clustering
+
+        r = (Gamma(1 + n / 2) * V * sigma * log(N) / N) ** (1 / n) / sqrt(pi)
+
+    where ``n`` is the number of parameters that are not fixed, ``V`` is the
+    volume of the bounds, and ``N`` is the number of sample points, i.e. the
+    number of terminated walkers since each walker starts from one sample
+    point. Unlike MLSL the cost function values of the sample points are not
+    used, since a candidate is placed before it is evaluated.
+
+    Attributes
+    ----------
+    data : {None, PointIndex}
+        The index of the known points, with one group for each terminated
+        walker.
+    sigma : float
+        The scale of the critical distance.
+    ncandidates : int
+        The number of candidates for each new point.
+    """
+
+    predraw = False
+
+    def __init__(self, lower_bounds, upper_bounds, data=None, sigma=4.0, ncandidates=1000,
+                 random_state=None):
+        super().__init__(lower_bounds, upper_bounds, random_state=random_state, data=data,
+                         sigma=sigma, ncandidates=ncandidates)
+
+    def critical_distance(self, nsamples):
+        """ Returns the critical distance to reject candidates.
+
+        Parameters
+        ----------
+        nsamples : int
+            The number of sample points.
+
+        Returns
+        -------
+        float
+            The critical distance.
+        """
+        from scipy.special import gamma
+        lb, ub = self._bounds()
+        width = (ub - lb)[ub > lb]
+        if nsamples < 2 or not len(width):
+            return 0.0
+        n = len(width)
+        volume = numpy.prod(width)
+        return (gamma(1.0 + n / 2.0) * volume * self.sigma
+                * numpy.log(nsamples) / nsamples) ** (1.0 / n) / numpy.sqrt(numpy.pi)
+
+    def sample(self, n=None):
+        """ Returns new points outside the critical distance of the known
+        points.
+
+        Parameters
+        ----------
+        n : {None, int}
+            The number of points. Default is ``None`` which returns a single
+            point.
+
+        Returns
+        -------
+        pts : numpy.array
+            An array with a new point, or an array with shape ``(n, ndim)`` of
+            new points.
+        """
+        uniform = UniformSampling(self.lower_bounds, self.upper_bounds,
+                                  random_state=self.random_state)
+        if self.data is None or len(self.data) == 0:
+            return uniform.sample(n)
+
+        # each new point is a sample point of a walker that has not terminated
+        # and also claims the region within the critical distance
+        pts = []
+        for _ in range(1 if n is None else n):
+            radius = self.critical_distance(self.data.groups + len(pts))
+            candidates = uniform.sample(self.ncandidates)
+            dist = self.data.distance(candidates)
+            if pts:
+                diff = candidates[:, None, :] - numpy.array(pts)[None, :, :]
+                dist = numpy.minimum(dist, numpy.sqrt((diff ** 2).sum(axis=-1)).min(axis=1))
+            outside = numpy.flatnonzero(dist > radius)
+            pts.append(candidates[outside[0] if len(outside) else dist.argmax()])
+        return self._return(numpy.array(pts), n)
 
 # dict of sampling methods
 sampling_methods = {
+    "halton" : HaltonSampling,
+    "latin_hypercube" : LatinHypercubeSampling,
     "linspace" : LinearSampling,
     "midpoint" : MidpointSampling,
+    "rejection" : RejectionSampling,
+    "sobol" : SobolSampling,
     "tolerance" : ToleranceSampling,
     "uniform" : UniformSampling,
 }
-
@@ -2,13 +2,17 @@
 """
 
 import configparser
+import contextlib
 import numpy
-from mystic import monitors as mystic_monitors
 from mystic import solvers as mystic_solvers
 from mystic import termination as mystic_termination
 from spotlight import container
+from spotlight import gradient
+from spotlight import monitors
+from spotlight import population
 from spotlight import sampling
-from spotlight.io import solution_file
+from spotlight import timing
+from spotlight import workers
 
 class Solver(container.Container):
     """ This manages an optimizer. This is the top-level interface for
@@ -26,12 +30,21 @@ class Solver(container.Container):
         A Mystic solver instance.
     stop : termination
         A Mystic termination instance.
-    stepmon : monitor
-        A Mystic monitor instance.
+    stepmon : ArrayMonitor
+        A monitor of the generations of the optimizer.
     sampling_method : str
         Name of sampling method that was used.
+    scaling : {None, tuple}
+        A tuple of the offsets and scales of the parameters and a mask of the
+        parameters that the optimizer sees if the optimizer does not run in the
+        units of all parameters, otherwise ``None``. See ``BasePlan.physical``.
     verbose : bool
         Print updates to ``stdout``.
+    random_state : {None, WalkerRandomState}
+        The random number generators of the walker.
+    ensemble_map : {None, PrefetchMapper}
+        The map of an ensemble solver, which evaluates the starting points of
+        its solvers in one batch, otherwise ``None``.
 
     Parameters
     ----------
@@ -53,6 +66,43 @@ class Solver(container.Container):
         Wrap the local solver in an ensemble solver that launches many solvers.
     nsolvers : int
         The number of solvers for an ensemble solver ot use.
+    npop : {None, int}
+        The size of the population of a population solver. Default is ``None``
+        which uses the default of the population solver.
+    ensemble_mapper : {None, str}
+        Run the solvers of an ensemble solver at the same time in a pool of
+        workers, either ``"process"`` or ``"mpi"``, and each in its own
+        directory, see ``workers.EnsembleMapper``. Default is ``None`` which
+        runs the solvers one after another.
+    ensemble_workers : {None, int}
+        The number of workers of ``ensemble_mapper``. Default is ``None`` which
+        uses one worker for each solver.
+    ensemble_clone : str
+        How to clone the directory of each solver of ``ensemble_mapper``, see
+        ``filesystem.clone``. Default is ``"reflink"``.
+    normalize : bool
+        Run the optimizer with each parameter scaled to the interval from 0 to 1
+        between its bounds. The refinement plan maps values back to the units
+        of the parameters, and ``solution`` returns values in these units.
+        Default is ``False``.
+    eliminate_fixed : bool
+        Remove parameters with equal lower and upper bounds from the parameters
+        that the optimizer sees. The refinement plan sets them to their fixed
+        value, and ``solution`` returns all parameters. Default is ``False``.
+    monitor_every : int
+        Keep every ``monitor_every``-th generation and the last generation in
+        the history of the optimizer. Default is ``1``.
+    monitor_last : {None, int}
+        Keep only the last ``monitor_last`` generations that would be kept in
+        the history of the optimizer. Default is ``None`` which keeps all
+        generations.
+    initial_point : {None, list}
+        The starting point in the units of the parameters. Default is ``None``
+        which draws the starting point with ``sampling_method``.
+    random_state : {None, WalkerRandomState}
+        The random number generators of the walker, which draw the starting
+        point and the random numbers of the optimizer. Default is ``None``
+        which uses the global random number generators.
     """
 
     def __init__(self, lower_bounds, upper_bounds,
@@ -61,7 +111,11 @@ class Solver(container.Container):
                  arch=None, iteration=None, sampling_data=None, step=None, nsteps=None,
                  max_iterations=None, max_evaluations=None, stop_change=None,
                  stop_generations=None, termination=None, verbose=False,
-                 ensemble_solver=None, nsolvers=None, **kwargs):
+                 ensemble_solver=None, nsolvers=None, npop=None,
+                 ensemble_mapper=None, ensemble_workers=None, ensemble_clone="reflink",
+                 normalize=False, eliminate_fixed=False,
+                 monitor_every=1, monitor_last=None, initial_point=None,
+                 random_state=None, **kwargs):
 
         # set options as attributes
         super().__init__(lower_bounds=lower_bounds, upper_bounds=upper_bounds,
@@ -70,12 +124,38 @@ class Solver(container.Container):
                          max_iterations=max_iterations, max_evaluations=max_evaluations,
                          stop_change=stop_change,
                          stop_generations=stop_generations, extra_options=kwargs)
+        self.random_state = random_state
+
+        # scale parameters to the unit hypercube and remove fixed parameters
+        lower = numpy.asarray(lower_bounds, dtype=float)
+        width = numpy.asarray(upper_bounds, dtype=float) - lower
+        free = width != 0 if eliminate_fixed else numpy.ones(len(lower), dtype=bool)
+        if not free.any():
+            raise ValueError("There are no parameters to optimize!")
+        if normalize and not numpy.all(numpy.isfinite(width)):
+            raise ValueError("Parameters must have finite bounds to normalize!")
+        if normalize or not free.all():
+            offset = numpy.where(free, lower if normalize else 0.0, lower)
+            scale = numpy.where(free, width if normalize else 1.0, 0.0)
+            self.scaling = (offset, scale, free)
+        else:
+            self.scaling = None
 
         # initialize local solver
-        ndim = len(lower_bounds)
+        ndim = int(free.sum())
+        self.ensemble_map = None
         if ensemble_solver is not None:
             self.local_solver = ensemble_solvers[ensemble_solver](dim=ndim, npts=nsolvers)
             self.local_solver.SetNestedSolver(local_solvers[local_solver](ndim))
+            if ensemble_mapper is not None:
+                self.ensemble_map = workers.PrefetchMapper(workers.EnsembleMapper(
+                    ensemble_workers, method=ensemble_clone, mapper=ensemble_mapper))
+            else:
+                self.ensemble_map = workers.PrefetchMapper()
+            self.local_solver.SetMapper(self.ensemble_map)
+        elif local_solver in population_solvers:
+            self.local_solver = population_solvers[local_solver](
+                                    *([ndim, npop] if npop else [ndim]))
         else:
             self.local_solver = local_solvers[local_solver](ndim)
 
@@ -90,10 +170,10 @@ class Solver(container.Container):
             self.stop = None
 
         # add monitors
-        if verbose:
-            self.stepmon = mystic_monitors.VerboseMonitor(1)
-        else:
-            self.stepmon = mystic_monitors.Monitor()
+        # the termination conditions read the last generations of the monitor
+        self.stepmon = monitors.ArrayMonitor(every=monitor_every, last=monitor_last,
+                                             window=(stop_generations or 0) + 1,
+                                             verbose=verbose)
         self.local_solver.SetGenerationMonitor(self.stepmon)
 
         # set bounds
@@ -101,20 +181,42 @@ class Solver(container.Container):
         if self.sampling_method == "tolerance":
             if iteration > self.sampling_iteration_switch:
                 if sampling_data is None:
-                    sampling_data = solution_file.SolutionFile.read_data([arch.path])[1]
-                if len(sampling_data):
-                    sampling_data = tuple(map(tuple, numpy.vstack(sampling_data)))
-                    args += [sampling_data]
+                    sampling_data = arch.get_points()
+                args += [sampling_data]
             elif self.sampling_method == "tolerance" and iteration != None:
                 args += [[]]
             elif self.sampling_method == "tolerance":
                 raise ValueError("Must give iteration with tolerance sampling.")
+        if self.sampling_method == "rejection":
+            if sampling_data is None and arch is not None:
+                sampling_data = arch.get_basins()
+            args += [sampling_data]
         if self.sampling_method == "linspace":
             args += [step, nsteps]
+        lower_bounds, upper_bounds = self._solver_bounds()
         if not nsolvers:
-            p0 = sampling.sampling_methods[self.sampling_method](*args).sample()
-            self.local_solver.SetInitialPoints(p0)
-        self.local_solver.SetStrictRanges(self.lower_bounds, self.upper_bounds)
+            with self._random():
+                if initial_point is None:
+                    initial_point = sampling.sampling_methods[self.sampling_method](
+                                        *args, random_state=self._numpy_random()).sample()
+                p0 = self._to_solver(initial_point)
+
+                # a population solver starts from a random population that includes p0
+                if self._is_population_solver():
+                    self.local_solver.SetRandomInitialPoints(lower_bounds, upper_bounds)
+                    self.local_solver.population[0] = list(p0)
+                else:
+                    self.local_solver.SetInitialPoints(p0)
+        self.local_solver.SetStrictRanges(lower_bounds, upper_bounds)
+
+    def __setstate__(self, state):
+        """ Sets the attributes of an unpickled solver. A solver that was saved
+        before an attribute was added to ``Solver`` gets its default value.
+        """
+        state.setdefault("scaling", None)
+        state.setdefault("random_state", None)
+        state.setdefault("ensemble_map", None)
+        self.__dict__.update(state)
 
     @property
     def solution(self):
@@ -122,10 +224,13 @@ class Solver(container.Container):
         parameters that produced the lowest energy along with the lowest energy
         found.
         """
-        x = self.stepmon.x
-        y = self.stepmon.y
+        x = self.stepmon.x.copy()
+        y = self.stepmon.y.copy()
         best_x = self.local_solver.bestSolution
         best_y = self.local_solver.bestEnergy
+        if self.scaling is not None:
+            x = self._to_physical(x) if len(x) else x
+            best_x = self._to_physical(best_x)
         return x, y, best_x, best_y
 
     @property
@@ -143,10 +248,14 @@ class Solver(container.Container):
         cost : Plan
             A refinement plan class.
         """
-        self.local_solver.Solve(cost, termination=self.stop, disp=verbose,
-                                ExtraArgs=(), callback=None,
-                                **self.extra_options)
+        self._set_scaling(cost)
+        self._set_mapper(cost)
+        with self._random():
+            self.local_solver.Solve(cost, termination=self.stop, disp=verbose,
+                                    ExtraArgs=(), callback=None,
+                                    **self.extra_options)
 
+    @timing.timer("solver.step")
     def step(self, cost, verbose=1):
         """ Take a single optimization step using the given cost function.
 
@@ -160,15 +269,99 @@ class Solver(container.Container):
         stop : bool
             A ``bool`` that indicates if termination condition has been met.
         """
-        stop = self.local_solver.Step(cost, termination=self.stop, disp=verbose,
-                                      ExtraArgs=(), callback=None,
-                                      **self.extra_options)
+        self._set_scaling(cost)
+        self._set_mapper(cost)
+        with self._random():
+            stop = self.local_solver.Step(cost, termination=self.stop, disp=verbose,
+                                          ExtraArgs=(), callback=None,
+                                          **self.extra_options)
         return stop
 
+    def _random(self):
+        """ Returns a context in which the global random number generators are
+        the random number generators of the walker if it has them.
+        """
+        return contextlib.nullcontext() if self.random_state is None else self.random_state
+
+    def _numpy_random(self):
+        """ Returns the ``numpy`` random number generator of the walker if it
+        has one, otherwise ``None`` which uses the global generator.
+        """
+        return None if self.random_state is None else self.random_state.numpy_random
+
+    def _solver_bounds(self):
+        """ Returns the lower and upper bounds of the parameters that the
+        optimizer sees in the units of the optimizer.
+        """
+        if self.scaling is None:
+            return self.lower_bounds, self.upper_bounds
+        return self._to_solver(self.lower_bounds), self._to_solver(self.upper_bounds)
+
+    def _to_solver(self, p):
+        """ Returns the parameters of a parameter vector that the optimizer
+        sees in the units of the optimizer.
+        """
+        if self.scaling is None:
+            return p
+        offset, scale, free = self.scaling
+        p = numpy.asarray(p, dtype=float)[free]
+        scale = scale[free]
+        return list(numpy.where(scale != 0, (p - offset[free]) / numpy.where(scale != 0, scale, 1.0),
+                                0.0))
+
+    def _to_physical(self, p):
+        """ Returns a parameter vector, or an array of parameter vectors, with
+        all parameters in the units of the parameters.
+        """
+        offset, scale, free = self.scaling
+        p = numpy.asarray(p, dtype=float)
+        x = numpy.tile(offset, p.shape[:-1] + (1,))
+        x[..., free] += scale[free] * p
+        return x
+
+    def _set_scaling(self, cost):
+        """ Sets the refinement plan to map parameter vectors from the optimizer
+        to the units of the parameters.
+
+        Parameters
+        ----------
+        cost : Plan
+            A refinement plan class.
+        """
+        if hasattr(cost, "scaling"):
+            cost.scaling = self.scaling
+        elif self.scaling is not None:
+            raise ValueError("The cost function must be a refinement plan with "
+                             "normalize or eliminate_fixed!")
+
+    def _is_population_solver(self):
+        """ Returns if the local solver is a population solver.
+        """
+        return isinstance(self.local_solver, tuple(population_solvers.values()))
+
+    def _set_mapper(self, cost):
+        """ Sets a population solver to evaluate each generation in one batch
+        with ``function_batch`` of the refinement plan, which evaluates the
+        generation in the pool of workers of the refinement plan if it has one.
+        Sets the map of an ensemble solver to prefetch the starting points of
+        its solvers with the refinement plan.
+
+        Parameters
+        ----------
+        cost : Plan
+            A refinement plan class.
+        """
+        if self._is_population_solver() and hasattr(cost, "function_batch"):
+            self.local_solver.SetMapper(population.PlanMapper(cost, *self._solver_bounds()))
+        if self.ensemble_map is not None:
+            self.ensemble_map.cost = cost
+
 # dict of local solvers
 local_solvers = {
     "nelder_mead" : mystic_solvers.NelderMeadSimplexSolver,
     "powell" : mystic_solvers.PowellDirectionalSolver,
+    "quasi_newton" : gradient.QuasiNewtonSolver,
+    "least_squares" : gradient.LeastSquaresSolver,
 }
 
 # dict of ensemble solvers
@@ -176,3 +369,9 @@ ensemble_solvers = {
     "buckshot" : mystic_solvers.BuckshotSolver,
     "lattice" : mystic_solvers.LatticeSolver,
 }
+
+# dict of population solvers
+population_solvers = {
+    "differential_evolution" : mystic_solvers.DifferentialEvolutionSolver2,
+    "cmaes" : population.CMAESSolver,
+}
@@ -0,0 +1,162 @@
+""" This module contains classes for finding the distance to the nearest of many
+parameter vectors that were already visited.
+"""
+
+import numpy
+import os
+import pickle
+import socket
+import threading
+
+class PointIndex:
+    """ This class stores visited parameter vectors in a spatial index to find
+    the distance from a parameter vector to the nearest visited parameter
+    vector in time that grows logarithmically with the number of visited
+    parameter vectors.
+
+    The index is a list of k-d trees whose sizes are ``leaf_size`` times a
+    power of two. New parameter vectors are kept in a buffer that is searched
+    directly until it has ``leaf_size`` parameter vectors, and then the buffer
+    is merged with the trees like a binary counter, so a tree is only rebuilt
+    when the number of parameter vectors doubles.
+
+    If ``path`` is given then new parameter vectors are appended to a file of
+    this process in the directory ``path`` when ``save`` is called, and
+    ``load`` adds the parameter vectors that other processes appended to their
+    files since the last call. Each call to ``add`` is appended separately, so
+    all processes count the same number of groups.
+
+    Attributes
+    ----------
+    path : {None, str}
+        Path of the directory to persist parameter vectors.
+    leaf_size : int
+        The number of parameter vectors in the smallest tree.
+    groups : int
+        The number of calls to ``add`` in all processes, e.g. the number of
+        walkers if each call adds the parameter vectors of a walker.
+
+    Parameters
+    ----------
+    path : {None, str}
+        Path of the directory to persist parameter vectors. Default is ``None``
+        which does not persist parameter vectors.
+    leaf_size : int
+        The number of parameter vectors in the smallest tree. Default is
+        ``64``.
+    """
+
+    def __init__(self, path=None, leaf_size=64):
+        self.path = path
+        self.leaf_size = leaf_size
+        self.groups = 0
+        self._trees = []
+        self._buffer = []
+        self._unsaved = []
+        self._offsets = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def _file_name(self):
+        """ Returns the name of the file of this process.
+        """
+        return "{}_{}.pkl".format(socket.gethostname(), os.getpid())
+
+    def add(self, points):
+        """ Adds parameter vectors to the index.
+
+        Parameters
+        ----------
+        points : numpy.array
+            An array with shape ``(n, ndim)`` of parameter vectors.
+        """
+        points = numpy.atleast_2d(numpy.asarray(points, dtype=float))
+        if not points.size:
+            return
+        with self._lock:
+            self._insert(points)
+            if self.path is not None:
+                self._unsaved.append(points)
+
+    def distance(self, points):
+        """ Returns the distance from each parameter vector to the nearest
+        parameter vector in the index.
+
+        Parameters
+        ----------
+        points : numpy.array
+            An array with shape ``(n, ndim)`` of parameter vectors.
+
+        Returns
+        -------
+        numpy.array
+            An array with shape ``(n,)`` of distances, which are ``numpy.inf``
+            if the index is empty.
+        """
+        points = numpy.atleast_2d(numpy.asarray(points, dtype=float))
+        with self._lock:
+            trees = list(self._trees)
+            buffer = numpy.vstack(self._buffer) if self._buffer else None
+        dist = numpy.full(len(points), numpy.inf)
+        for tree in trees:
+            dist = numpy.minimum(dist, tree.query(points)[0])
+        if buffer is not None:
+            diff = points[:, None, :] - buffer[None, :, :]
+            dist = numpy.minimum(dist, numpy.sqrt((diff ** 2).sum(axis=-1)).min(axis=1))
+        return dist
+
+    def load(self):
+        """ Adds the parameter vectors that were appended to the files of other
+        processes in the directory ``path`` since the last call.
+        """
+        if self.path is None or not os.path.isdir(self.path):
+            return
+        for fname in sorted(os.listdir(self.path)):
+            if fname == self._file_name:
+                continue
+            with open(os.path.join(self.path, fname), "rb") as fp:
+                fp.seek(self._offsets.get(fname, 0))
+                while True:
+                    try:
+                        points = pickle.load(fp)
+                    except (EOFError, pickle.UnpicklingError):
+                        break
+                    self._offsets[fname] = fp.tell()
+                    with self._lock:
+                        self._insert(points)
+
+    def save(self):
+        """ Appends the parameter vectors added since the last call to the file
+        of this process in the directory ``path``.
+        """
+        if self.path is None:
+            return
+        with self._lock:
+            points, self._unsaved = self._unsaved, []
+        if not points:
+            return
+        if not os.path.exists(self.path):
+            os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, self._file_name), "ab") as fp:
+            for group in points:
+                pickle.dump(group, fp)
+
+    def _insert(self, points):
+        """ Adds parameter vectors to the buffer and merges a full buffer with
+        the trees.
+        """
+        from scipy.spatial import cKDTree
+        self._buffer.append(points)
+        self._size += len(points)
+        self.groups += 1
+        if sum(map(len, self._buffer)) < self.leaf_size:
+            return
+        data = numpy.vstack(self._buffer)
+        self._buffer = []
+        while self._trees and self._trees[-1].n <= len(data):
+            data = numpy.vstack([self._trees.pop().data, data])
+        self._trees.append(cKDTree(data))
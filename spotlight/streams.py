@@ -0,0 +1,108 @@
+""" This module contains classes for giving each walker its own stream of random
+numbers.
+"""
+
+import numpy
+import random
+
+class WalkerRandomState:
+    """ This class holds the random number generators of a walker. The streams
+    are derived from the base random seed and the global index of the walker
+    with ``numpy.random.SeedSequence``, i.e. they are the streams of the
+    ``index``-th sequence spawned from the base random seed. So walkers with
+    different indices, or with neighbouring base random seeds, have
+    independent streams, and a walker draws the same random numbers in any
+    process.
+
+    The sampling methods of Spotlight draw the starting point of the walker
+    from ``numpy_random``. Mystic and the solvers of Spotlight draw from the
+    global random number generators of ``random`` and ``numpy.random``, so the
+    streams of the walker are set as the global generators inside a ``with``
+    block and the global generators are restored at the end of the block. The
+    streams are pickled with the walker, so a walker that is loaded from a
+    checkpoint continues its streams.
+
+    Walkers that run at the same time in threads of a process cannot set the
+    global generators without taking the streams of each other, so for these
+    walkers ``global_streams`` is ``False`` and the ``with`` block does not
+    change the global generators. Then the starting point is still drawn from
+    the streams of the walker, but the optimizer draws from the global
+    generators and is not reproducible.
+
+    Attributes
+    ----------
+    seed : int
+        The base random seed.
+    index : {None, int}
+        The global index of the walker.
+    global_streams : bool
+        If the streams of the walker are set as the global generators inside a
+        ``with`` block. This is not pickled.
+
+    Parameters
+    ----------
+    seed : int
+        The base random seed.
+    index : {None, int}
+        The global index of the walker. Default is ``None`` which uses the
+        base random seed without spawning a sequence.
+    global_streams : bool
+        If the streams of the walker are set as the global generators inside a
+        ``with`` block. Default is ``True``.
+    """
+
+    def __init__(self, seed, index=None, global_streams=True):
+        self.seed = seed
+        self.index = index
+        self.global_streams = global_streams
+        sequence = numpy.random.SeedSequence(seed, spawn_key=() if index is None else (index,))
+        numpy_sequence, python_sequence = sequence.spawn(2)
+        self._numpy = numpy.random.RandomState(numpy.random.MT19937(numpy_sequence))
+        self._python = random.Random(
+                           int.from_bytes(python_sequence.generate_state(4).tobytes(), "little"))
+        self._saved = None
+        self._depth = 0
+
+    def __getstate__(self):
+        """ Returns the state to pickle, which is only the streams of the
+        walker.
+        """
+        return {"seed" : self.seed, "index" : self.index,
+                "numpy_state" : self._numpy.get_state(),
+                "python_state" : self._python.getstate()}
+
+    def __setstate__(self, state):
+        self.seed = state["seed"]
+        self.index = state["index"]
+        self.global_streams = True
+        self._numpy = numpy.random.RandomState()
+        self._numpy.set_state(state["numpy_state"])
+        self._python = random.Random()
+        self._python.setstate(state["python_state"])
+        self._saved = None
+        self._depth = 0
+
+    @property
+    def numpy_random(self):
+        """ Returns the ``numpy`` generator of the walker, which is
+        ``numpy.random`` inside a ``with`` block that set the streams of the
+        walker as the global generators.
+        """
+        return numpy.random if self._saved is not None else self._numpy
+
+    def __enter__(self):
+        if self._depth == 0 and self.global_streams:
+            self._saved = (numpy.random.get_state(), random.getstate())
+            numpy.random.set_state(self._numpy.get_state())
+            random.setstate(self._python.getstate())
+        self._depth += 1
+        return self
+
+    def __exit__(self, *args):
+        self._depth -= 1
+        if self._depth == 0 and self._saved is not None:
+            self._numpy.set_state(numpy.random.get_state())
+            self._python.setstate(random.getstate())
+            numpy.random.set_state(self._saved[0])
+            random.setstate(self._saved[1])
+            self._saved = None
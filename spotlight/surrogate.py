@@ -0,0 +1,192 @@
+""" This module contains classes for screening parameter vectors with a
+surrogate model of the cost function before evaluating them.
+"""
+
+import collections
+import numpy
+from mystic.math.legacydata import dataset
+from spotlight.bridge import ouq_models
+
+class SurrogateScreen:
+    """ This class fits a surrogate model from ``spotlight.bridge`` to the
+    values of the cost function that were evaluated so far and uses it to
+    reject parameter vectors that are not promising.
+
+    A parameter vector is rejected if the predicted value minus the largest
+    recent prediction error is greater than both the ``quantile`` of the
+    evaluated values and the best evaluated value plus ``margin`` times the
+    absolute value of the best value. The prediction error is measured on the
+    parameter vectors that were not rejected, so there is no screening until
+    the accuracy of the model is known. Rejected parameter vectors are given
+    the predicted value, which is never better than the best evaluated value,
+    so a solver does not accept a rejected parameter vector as its best
+    solution.
+
+    There is no screening until ``min_points`` values were added, and the
+    surrogate model is fitted again after every ``refit_interval`` values that
+    are added. Only the last ``max_points`` values are used to fit the model.
+
+    Attributes
+    ----------
+    model : str
+        The kind of surrogate model.
+    min_points : int
+        The number of values needed before screening.
+    refit_interval : int
+        The number of values added before fitting the model again.
+    margin : float
+        The relative margin above the best value before rejecting.
+    quantile : float
+        The quantile of the evaluated values above which to reject.
+    max_points : {None, int}
+        The maximum number of values used to fit the model.
+    best : {None, float}
+        The best value added since the last call to ``reset``.
+
+    Parameters
+    ----------
+    model : str
+        The kind of surrogate model. Options are ``"interp"`` for an
+        ``InterpModel`` and ``"learned"`` for a ``LearnedModel``. Default is
+        ``"interp"``.
+    min_points : int
+        The number of values needed before screening. Default is ``20``.
+    refit_interval : int
+        The number of values added before fitting the model again. Default is
+        ``10``.
+    margin : float
+        The relative margin above the best value before rejecting. Default is
+        ``0.1``.
+    quantile : float
+        The quantile of the evaluated values above which to reject. Default is
+        ``0.9``.
+    max_points : {None, int}
+        The maximum number of values used to fit the model. Default is ``500``.
+    kwargs : dict
+        Keyword arguments passed to the surrogate model.
+    """
+
+    def __init__(self, model="interp", min_points=20, refit_interval=10,
+                 margin=0.1, quantile=0.9, max_points=500, **kwargs):
+        if model not in ["interp", "learned"]:
+            raise ValueError("Surrogate model {} is not recognized!".format(model))
+        if refit_interval < 1:
+            raise ValueError("The refit interval of the surrogate must be at least 1!")
+        self.model = model
+        self.min_points = min_points
+        self.refit_interval = refit_interval
+        self.margin = margin
+        self.quantile = quantile
+        self.max_points = max_points
+        self.best = None
+        self.kwargs = kwargs
+        self._x = []
+        self._y = []
+        self._nnew = 0
+        self._model = None
+        self._errors = collections.deque(maxlen=20)
+        self._prediction = None
+
+    def __len__(self):
+        return len(self._y)
+
+    def reset(self):
+        """ Forgets the best value, e.g. before starting a new walker. The
+        values used to fit the model are kept.
+        """
+        self.best = None
+
+    def add(self, p, value):
+        """ Adds an evaluated value of a parameter vector.
+
+        Parameters
+        ----------
+        p : list
+            A `list` of the floating-point values.
+        value : float
+            The value of the cost function.
+        """
+        # errors are only known for parameter vectors that were not rejected
+        if self._prediction is not None and self._prediction[0] == tuple(p):
+            self._errors.append(abs(self._prediction[1] - value))
+        self._prediction = None
+        self._x.append([float(x) for x in p])
+        self._y.append(float(value))
+        if self.max_points is not None and len(self._y) > self.max_points:
+            del self._x[0], self._y[0]
+        self._nnew += 1
+        if self.best is None or value < self.best:
+            self.best = float(value)
+
+    def fit(self):
+        """ Fits the surrogate model to the values that were added.
+        """
+        data = dataset().load(self._x, self._y)
+        if self.model == "interp":
+            kwargs = dict(method="thin_plate")
+            kwargs.update(self.kwargs)
+            self._model = ouq_models.InterpModel("surrogate", data=data,
+                                                 nx=len(self._x[0]), rnd=False, **kwargs)
+        else:
+            self._model = ouq_models.LearnedModel("surrogate", data=data,
+                                                  nx=len(self._x[0]), rnd=False, **self.kwargs)
+        self._model.fit()
+        self._nnew = 0
+
+    def predict(self, p):
+        """ Returns the predicted value of a parameter vector, or ``None`` if
+        there are not enough values to fit the model. The model is fitted
+        again if ``refit_interval`` values were added since the last fit.
+
+        Parameters
+        ----------
+        p : list
+            A `list` of the floating-point values.
+
+        Returns
+        -------
+        {None, float}
+            The predicted value of the cost function.
+        """
+        if len(self) < self.min_points:
+            return None
+        if self._model is None or self._nnew >= self.refit_interval:
+            self.fit()
+        return float(self._model(list(p)))
+
+    def screen(self, p):
+        """ Returns the predicted value of a parameter vector if it is
+        rejected, or ``None`` if it should be evaluated.
+
+        Parameters
+        ----------
+        p : list
+            A `list` of the floating-point values.
+
+        Returns
+        -------
+        {None, float}
+            The predicted value of the cost function of a rejected parameter
+            vector.
+        """
+        if self.best is None:
+            return None
+
+        # evaluate if the surrogate model cannot be fitted
+        try:
+            value = self.predict(p)
+        except Exception:
+            return None
+        if value is None or not numpy.isfinite(value):
+            return None
+
+        # reject if the value is worse than the threshold by more than the error
+        threshold = max(self.best + self.margin * abs(self.best),
+                        numpy.quantile(self._y, self.quantile))
+        error = max(self._errors) if self._errors else numpy.inf
+        if value - error > threshold:
+            return value
+
+        # measure the error of the prediction when the value is added
+        self._prediction = (tuple(p), value)
+        return None
@@ -0,0 +1,41 @@
+""" Test for the ``EvaluationCache`` class.
+"""
+
+import os
+import tempfile
+import unittest
+from spotlight import cache
+
+class TestEvaluationCache(unittest.TestCase):
+
+    def test_tolerance(self):
+        evaluation_cache = cache.EvaluationCache(relative_tolerance=1e-6)
+        evaluation_cache.put([1.0, 1000.0], 3.0)
+        self.assertEqual(evaluation_cache.get([1.0 + 1e-9, 1000.0 - 1e-6]), 3.0)
+        self.assertIsNone(evaluation_cache.get([1.001, 1000.0]))
+        self.assertEqual((evaluation_cache.hits, evaluation_cache.misses), (1, 1))
+
+    def test_lru(self):
+        evaluation_cache = cache.EvaluationCache(max_size=2)
+        evaluation_cache.put([1.0], 1.0)
+        evaluation_cache.put([2.0], 2.0)
+        evaluation_cache.get([1.0])
+        evaluation_cache.put([3.0], 3.0)
+        self.assertEqual(len(evaluation_cache), 2)
+        self.assertIsNone(evaluation_cache.get([2.0]))
+        self.assertEqual(evaluation_cache.get([1.0]), 1.0)
+
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "cache.db")
+            evaluation_cache = cache.EvaluationCache(path=path)
+            evaluation_cache.put([1.0, 2.0], 3.0)
+            evaluation_cache.save()
+            evaluation_cache.put([4.0, 5.0], 6.0)
+            evaluation_cache.save()
+            evaluation_cache = cache.EvaluationCache(path=path)
+            self.assertEqual(len(evaluation_cache), 2)
+            self.assertEqual(evaluation_cache.get([4.0, 5.0]), 6.0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+""" Test for the ``CheckpointPolicy`` class.
+"""
+
+import unittest
+from spotlight import checkpoint
+
+class TestCheckpointPolicy(unittest.TestCase):
+
+    def test_fixed_stride(self):
+        policy = checkpoint.CheckpointPolicy(stride=3)
+        policy.update_step(3.0, 3)
+        policy.update_write(10.0)
+        self.assertEqual(policy.next_stride, 3)
+
+    def test_max_overhead_fraction(self):
+        policy = checkpoint.CheckpointPolicy(max_overhead_fraction=0.1)
+        self.assertEqual(policy.next_stride, 1)
+        policy.update_step(0.01, 1)
+        policy.update_write(0.1)
+        stride = policy.next_stride
+        overhead = policy.write_time / (stride * policy.step_time + policy.write_time)
+        self.assertLessEqual(overhead, 0.1)
+
+    def test_seconds(self):
+        policy = checkpoint.CheckpointPolicy(seconds=60.0)
+        policy.update_step(20.0, 2)
+        policy.update_write(0.1)
+        self.assertEqual(policy.next_stride, 6)
+        policy = checkpoint.CheckpointPolicy(seconds=60.0)
+        policy.update_step(3600.0, 1)
+        policy.update_write(0.1)
+        self.assertEqual(policy.next_stride, 1)
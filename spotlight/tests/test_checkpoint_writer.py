@@ -0,0 +1,161 @@
+""" Test for the ``CheckpointWriter`` class.
+"""
+
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from mystic.models import rosen
+from spotlight import solver
+from spotlight.io import checkpoint_writer
+from spotlight.io import solution_file
+from spotlight.io import state_file
+
+# a script that saves checkpoints in the background and exits without closing
+# the writer, either normally or by a signal
+EXIT_SCRIPT = """
+import os
+import signal
+import sys
+import time
+from spotlight.io import checkpoint_writer
+
+class Archive:
+    def snapshot(self, local_solver):
+        return local_solver
+    def save_snapshot(self, key, snapshot, duration=None, info=None):
+        time.sleep(0.2)
+        with open(sys.argv[1], "a") as fp:
+            fp.write(key + "\\n")
+
+class State:
+    def snapshot(self, local_solver):
+        return local_solver
+    def save_snapshot(self, key, snapshot):
+        pass
+
+writer = checkpoint_writer.CheckpointWriter(Archive(), State(), background=True)
+writer.close_on_exit()
+writer.save("0_0_0", {})
+writer.save("0_1_0", {})
+if sys.argv[2] == "signal":
+    os.kill(os.getpid(), signal.SIGTERM)
+"""
+
+class Archive:
+    """ Records the checkpoints that are written. The first write waits until
+    ``release`` is set so that later checkpoints are pending. A snapshot is a
+    copy of the ``dict`` that stands in for the local solver.
+    """
+
+    def __init__(self, error=None):
+        self.error = error
+        self.written = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def snapshot(self, local_solver):
+        return dict(local_solver)
+
+    def save_snapshot(self, key, snapshot, duration=None, info=None):
+        self.started.set()
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        self.written.append((key, snapshot, duration, info))
+
+class TestCheckpointWriter(unittest.TestCase):
+
+    def test_merge(self):
+        fp_sol = Archive()
+        writer = checkpoint_writer.CheckpointWriter(fp_sol, Archive(), background=True)
+        writer.fp_state.release.set()
+
+        # checkpoints of a key that are pending while the first is written are merged
+        writer.save("0_0_0", {"step" : 1}, 1.0, {"count" : 1})
+        fp_sol.started.wait(5)
+        writer.save("0_0_0", {"step" : 2}, 2.0, {"count" : 1})
+        writer.save("0_0_0", {"step" : 3}, 3.0, {"count" : 1})
+        fp_sol.release.set()
+        writer.close()
+        self.assertEqual(fp_sol.written, [("0_0_0", {"step" : 1}, 1.0, {"count" : 1}),
+                                          ("0_0_0", {"step" : 3}, 5.0, {"count" : 2})])
+        self.assertEqual(writer.num_saved, 3)
+        self.assertEqual(writer.num_written, 2)
+
+    def test_snapshot(self):
+        fp_sol = Archive()
+        writer = checkpoint_writer.CheckpointWriter(fp_sol, Archive(), background=True)
+        writer.fp_state.release.set()
+
+        # the local solver continues to change after it is saved
+        local_solver = {"step" : 1}
+        writer.save("0_0_0", local_solver)
+        local_solver["step"] = 2
+        fp_sol.release.set()
+        writer.close()
+        self.assertEqual(fp_sol.written, [("0_0_0", {"step" : 1}, None, None)])
+
+    def test_archives(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            fp_sol = solution_file.SolutionFile(os.path.join(tmp_dir, "solution.db"), None)
+            fp_state = state_file.StateFile(os.path.join(tmp_dir, "state.db"))
+            writer = checkpoint_writer.CheckpointWriter(fp_sol, fp_state, background=True)
+            s = solver.Solver([-2.0] * 3, [2.0] * 3, stop_change=0.1, stop_generations=5)
+            for _ in range(2):
+                s.step(rosen, verbose=0)
+            writer.save("0_0_0", s)
+            s.step(rosen, verbose=0)
+            writer.close()
+
+            # the archives hold the local solver when it was saved
+            fp_state = state_file.StateFile(os.path.join(tmp_dir, "state.db"))
+            state = fp_state.arch["0_0_0"]
+            self.assertIsInstance(state, solver.Solver)
+            self.assertEqual(len(state.stepmon), 1)
+            self.assertEqual(len(fp_sol.arch["0_0_0"][0]), 1)
+            self.assertGreater(writer.snapshot_time, 0.0)
+            state.step(rosen, verbose=0)
+
+    def test_close(self):
+        fp_sol = Archive()
+        writer = checkpoint_writer.CheckpointWriter(fp_sol, Archive(), background=True)
+        writer.fp_state.release.set()
+        writer.save("0_0_0", {"step" : 1})
+        fp_sol.started.wait(5)
+        writer.save("0_1_0", {"step" : 1})
+        writer.save("0_2_0", {"step" : 1})
+        fp_sol.release.set()
+        writer.close()
+        self.assertEqual([key for key, _, _, _ in fp_sol.written], ["0_0_0", "0_1_0", "0_2_0"])
+        self.assertFalse(writer._thread.is_alive())
+
+    def test_error(self):
+        fp_sol = Archive(error=IOError("disk full"))
+        fp_sol.release.set()
+        writer = checkpoint_writer.CheckpointWriter(fp_sol, Archive(), background=True)
+        writer.save("0_0_0", {"step" : 1})
+        with self.assertRaises(RuntimeError) as context:
+            writer.flush()
+        self.assertIsInstance(context.exception.__cause__, IOError)
+        writer.close()
+
+    def test_exit(self):
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(
+                                [os.path.dirname(os.path.dirname(os.path.dirname(__file__)))]
+                                + env.get("PYTHONPATH", "").split(os.pathsep))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for mode, returncode in [("exit", 0), ("signal", 128 + signal.SIGTERM)]:
+                path = os.path.join(tmp_dir, "{}.txt".format(mode))
+                proc = subprocess.run([sys.executable, "-c", EXIT_SCRIPT, path, mode], env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                self.assertEqual(proc.returncode, returncode)
+                with open(path) as fp:
+                    self.assertEqual(fp.read().split(), ["0_0_0", "0_1_0"])
+
+if __name__ == "__main__":
+    unittest.main()
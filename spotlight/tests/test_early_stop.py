@@ -0,0 +1,108 @@
+""" Test for stopping all walkers early.
+"""
+
+import multiprocessing
+import time
+import unittest
+from spotlight import early_stop
+
+def update_shared(shared, best):
+    """ Updates the shared memory from another process.
+    """
+    early_stop.SharedEarlyStop(shared, 2, target_cost=1.0).update(best)
+
+class TestEarlyStop(unittest.TestCase):
+
+    def test_target(self):
+        stopper = early_stop.EarlyStop(target_cost=1.0)
+        self.assertFalse(stopper.update(2.0))
+        self.assertFalse(stopper.update(1.5))
+        self.assertTrue(stopper.update(1.0))
+        self.assertTrue(stopper.stopped)
+
+    def test_stall(self):
+
+        # generations before the first value do not count
+        stopper = early_stop.EarlyStop(stop_generations=2)
+        for _ in range(3):
+            self.assertFalse(stopper.update(float("inf")))
+        stopper = early_stop.EarlyStop(stop_generations=2)
+        self.assertFalse(stopper.update(5.0))
+        self.assertFalse(stopper.update(6.0))
+        self.assertFalse(stopper.update(4.0))
+        self.assertEqual(stopper.stagnant, 0)
+        self.assertFalse(stopper.update(7.0))
+        self.assertTrue(stopper.update(4.0))
+        self.assertEqual(stopper.best, 4.0)
+        self.assertEqual(stopper.generations, 5)
+
+    def test_shared(self):
+        shared = early_stop.SharedEarlyStop.create()
+
+        # the updates of both processes count towards the generations
+        stopper = early_stop.SharedEarlyStop(shared, 2, target_cost=1.0, stop_generations=2)
+        self.assertFalse(stopper.update(3.0))
+        for _ in range(3):
+            self.assertFalse(stopper.update(3.0))
+        self.assertEqual(stopper.stagnant, 1)
+
+        # another process reaches the target
+        proc = multiprocessing.Process(target=update_shared, args=(shared, 0.5))
+        proc.start()
+        proc.join()
+        self.assertEqual(proc.exitcode, 0)
+        self.assertEqual(shared[2], 1.0)
+        self.assertTrue(stopper.update(3.0))
+
+    def test_finish(self):
+
+        # a process without updates does not stop
+        shared = early_stop.SharedEarlyStop.create()
+        for stopper in [early_stop.EarlyStop(target_cost=1.0, stop_generations=1),
+                        early_stop.SharedEarlyStop(shared, 2, target_cost=1.0,
+                                                   stop_generations=1)]:
+            stopper.finish()
+            self.assertFalse(stopper.stopped)
+            self.assertEqual(stopper.generations, 0)
+
+class TestMPIEarlyStop(unittest.TestCase):
+
+    def setUp(self):
+        try:
+            from mpi4py import MPI
+        except ImportError:
+            self.skipTest("Requires mpi4py")
+        self.comm = MPI.COMM_SELF
+
+    def test_target(self):
+        stopper = early_stop.MPIEarlyStop(self.comm, target_cost=1.0)
+        for _ in range(100):
+            if stopper.update(0.5):
+                break
+            time.sleep(0.01)
+        self.assertTrue(stopper.stopped)
+        self.assertEqual(stopper.best, 0.5)
+
+    def test_inactive(self):
+
+        # a rank with walkers is active
+        stopper = early_stop.MPIEarlyStop(self.comm, stop_generations=100)
+        while stopper.generations < 2:
+            stopper.update(3.0)
+            time.sleep(0.01)
+        self.assertFalse(stopper.done)
+
+        # a rank without walkers is inactive and finishes when all ranks are
+        stopper.finish()
+        self.assertTrue(stopper.done)
+        self.assertFalse(stopper.stopped)
+        self.assertEqual(stopper.best, 3.0)
+
+    def test_finish(self):
+        stopper = early_stop.MPIEarlyStop(self.comm, target_cost=1.0, stop_generations=1)
+        stopper.finish()
+        self.assertTrue(stopper.done)
+        self.assertFalse(stopper.stopped)
+
+if __name__ == "__main__":
+    unittest.main()
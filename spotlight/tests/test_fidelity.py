@@ -0,0 +1,42 @@
+""" Test for the ``FidelityScreen`` class.
+"""
+
+import unittest
+from spotlight import fidelity
+from spotlight import plan
+
+class FidelityPlan(plan.BasePlan):
+
+    def compute(self):
+        value = self.get("x") ** 2
+        return value + 1.0 if self.fidelity < 1.0 else value
+
+class TestFidelityScreen(unittest.TestCase):
+
+    def test_screen(self):
+        screen = fidelity.FidelityScreen(0.5, margin=0.0)
+        self.assertTrue(screen.promote(10.0))
+        screen.add(2.0, 1.0)
+        self.assertTrue(screen.promote(2.0))
+        self.assertFalse(screen.promote(3.0))
+
+        # the estimate is never better than the best full-fidelity value
+        self.assertEqual(screen.estimate(3.0), 2.0)
+        self.assertGreater(screen.estimate(0.0), 1.0)
+
+        screen.reset()
+        self.assertTrue(screen.promote(3.0))
+        self.assertEqual(screen.pop_values(), {"low_values" : [2.0], "full_values" : [1.0]})
+        self.assertEqual(screen.pop_values(), {"low_values" : [], "full_values" : []})
+
+    def test_plan(self):
+        cost = FidelityPlan(["x"])
+        cost.fidelity_screen = fidelity.FidelityScreen(0.5, margin=0.0)
+        self.assertEqual(cost.function([1.0]), 1.0)
+        self.assertEqual(cost.function([0.5]), 0.25)
+        self.assertEqual(cost.function([2.0]), 4.0)
+        self.assertEqual(cost.fidelity, 1.0)
+        self.assertEqual(cost.pop_fidelity_counts(), {"low" : 3, "full" : 2, "screened" : 1})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,29 @@
+""" Test for the ``filesystem`` module.
+"""
+
+import os
+import tempfile
+import unittest
+from spotlight import filesystem
+
+class TestFilesystem(unittest.TestCase):
+
+    def test_clone(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            src = os.path.join(tmp_dir, "src")
+            filesystem.mkdir(os.path.join(src, "sub"))
+            for path in ["a.txt", "sub/b.txt"]:
+                with open(os.path.join(src, path), "w") as fp:
+                    fp.write(path)
+            for method in ["copy", "reflink", "hardlink"]:
+                dest = os.path.join(tmp_dir, method)
+                filesystem.clone(src, dest, method=method)
+                filesystem.clone(src, dest, method=method)
+                with open(os.path.join(dest, "sub/b.txt"), "r") as fp:
+                    self.assertEqual(fp.read(), "sub/b.txt")
+            self.assertTrue(os.path.samefile(os.path.join(src, "a.txt"),
+                                             os.path.join(tmp_dir, "hardlink", "a.txt")))
+            self.assertRaises(ValueError, filesystem.clone, src, dest, method="rsync")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+""" Test for the finite-difference solvers.
+"""
+
+import numpy
+import unittest
+from spotlight import plan
+from spotlight import solver
+
+class QuadraticPlan(plan.BasePlan):
+    vectorized = True
+
+    def compute(self):
+        return (self.get("x") - 1.0) ** 2 + 10.0 * (self.get("y") + 3.0) ** 2
+
+    def residuals_batch(self, P):
+        P = numpy.atleast_2d(P)
+        return numpy.stack([P[:, 0] - 1.0, numpy.sqrt(10.0) * (P[:, 1] + 3.0)], axis=-1)
+
+class TestGradientSolvers(unittest.TestCase):
+
+    def test_solvers(self):
+        for name in ["quasi_newton", "least_squares"]:
+            numpy.random.seed(0)
+            cost = QuadraticPlan(["x", "y"])
+            local_solver = solver.Solver([-5.0, -2.0], [5.0, 5.0],
+                                         local_solver=name,
+                                         stop_change=1e-8, stop_generations=5)
+            local_solver.solve(cost, verbose=0)
+
+            # the minimum in y is outside the bounds
+            numpy.testing.assert_allclose(local_solver.local_solver.bestSolution,
+                                          [1.0, -2.0], atol=1e-4)
+
+    def test_residuals(self):
+
+        # a least-squares solver needs the residuals of the cost function
+        for cost, error in [(plan.BasePlan(["x", "y"]), NotImplementedError),
+                            (lambda p: p[0] ** 2 + p[1] ** 2, ValueError)]:
+            local_solver = solver.Solver([-5.0, -2.0], [5.0, 5.0],
+                                         local_solver="least_squares")
+            with self.assertRaises(error):
+                local_solver.step(cost, verbose=0)
+
+    def test_fixed_parameter(self):
+        numpy.random.seed(0)
+        cost = QuadraticPlan(["x", "y"])
+        local_solver = solver.Solver([-5.0, 2.0], [5.0, 2.0], local_solver="quasi_newton",
+                                     stop_change=1e-8, stop_generations=5)
+        local_solver.solve(cost, verbose=0)
+        self.assertEqual(local_solver.solution[2][1], 2.0)
+
+        # the fixed parameter can also be kept in the optimizer
+        local_solver = solver.Solver([-5.0, 2.0], [5.0, 2.0], local_solver="quasi_newton",
+                                     stop_change=1e-8, stop_generations=5,
+                                     eliminate_fixed=False)
+        local_solver.solve(cost, verbose=0)
+        self.assertEqual(local_solver.local_solver.bestSolution[1], 2.0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,11 +2,71 @@
 will raise an error without GSAS installed.
 """
 
+import os
+import subprocess
+import tempfile
+import threading
+import time
 import unittest
 from spotlight import gsas
 
+def is_running(pid):
+    """ Returns if a process is running and not a zombie.
+    """
+    try:
+        with open("/proc/{}/stat".format(pid)) as fp:
+            return fp.read().split()[2] != "Z"
+    except FileNotFoundError:
+        return False
+
 class TestGSAS(unittest.TestCase):
 
+    def test_set_working_dir(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            def touch(path):
+                gsas.set_working_dir(path)
+                gsas._external_call(["touch", "marker"])
+            thread = threading.Thread(target=touch, args=(tmp_dir,))
+            thread.start()
+            thread.join()
+            self.assertTrue(os.path.exists(os.path.join(tmp_dir, "marker")))
+            self.assertIsNone(gsas.get_working_dir())
+
+    def test_exit_status(self):
+
+        # a non-zero exit status raises after the command finished
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            gsas.set_working_dir(tmp_dir)
+            try:
+                with self.assertRaises(gsas.ExternalCallError) as context:
+                    gsas._external_call(["sh", "-c", "touch marker; exit 3"])
+            finally:
+                gsas.set_working_dir(None)
+            self.assertEqual(context.exception.returncode, 3)
+            self.assertTrue(os.path.exists(os.path.join(tmp_dir, "marker")))
+
+    def test_deadline(self):
+
+        # a shell command is killed with the programs it started
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            gsas.set_working_dir(tmp_dir)
+            gsas.set_deadline(time.time() + 0.5)
+            try:
+                with self.assertRaises(subprocess.TimeoutExpired):
+                    gsas._external_call(["sleep", "10", "&", "echo", "$!", ">", "pid;", "wait"],
+                                        system=True)
+            finally:
+                gsas.set_working_dir(None)
+                gsas.set_deadline(None)
+            with open(os.path.join(tmp_dir, "pid")) as fp:
+                pid = int(fp.read())
+            for _ in range(100):
+                if not is_running(pid):
+                    break
+                time.sleep(0.01)
+            else:
+                self.fail("The program started by the command is still running")
+
     def test_gsas_add_histogram(self):
         with self.assertRaises(FileNotFoundError) as cm:
             gsas.gsas_add_histogram("testfile.txt", "testfile.txt", 2,
@@ -0,0 +1,50 @@
+""" Test for the ``ManifestFile`` class.
+"""
+
+import os
+import tempfile
+import unittest
+from spotlight.io import manifest_file
+
+class TestManifestFile(unittest.TestCase):
+
+    def test_merge(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "solution.db.manifest")
+            manifest = manifest_file.ManifestFile(path)
+            manifest.update("0_0_1", False, 3.0, 10)
+            manifest.update("0_0_1", True, 2.0, 20)
+            manifest.update("0_1_1", False, 1.0, 5)
+
+            # read the manifest from a new instance
+            manifest = manifest_file.ManifestFile(path)
+            entries = manifest.load()
+            self.assertEqual(entries["0_0_1"], (True, 2.0, 20))
+            self.assertTrue(manifest.is_terminated("0_0_1"))
+            self.assertFalse(manifest.is_terminated("0_1_1"))
+            self.assertFalse(manifest.is_terminated("0_2_1"))
+
+    def test_flush(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "solution.db.manifest")
+            manifest = manifest_file.ManifestFile(path)
+            for i in range(10):
+                manifest.update("0_0_1", False, 10.0 - i, i)
+                manifest.update("0_1_1", False, 5.0, i)
+            manifest.update("0_0_1", True, 0.5, 10)
+            manifest.update("0_0_1", True, 0.5, 10)
+
+            # only the termination is written before the walkers that did
+            # not terminate are flushed
+            self.assertEqual(manifest_file.ManifestFile(path).load(),
+                             {"0_0_1" : (True, 0.5, 10)})
+            manifest.flush()
+            manifest.flush()
+            for fname in os.listdir(path):
+                with open(os.path.join(path, fname)) as fp:
+                    self.assertEqual(len(fp.readlines()), 2)
+            self.assertEqual(manifest_file.ManifestFile(path).load(),
+                             {"0_0_1" : (True, 0.5, 10), "0_1_1" : (False, 5.0, 9)})
+
+if __name__ == "__main__":
+    unittest.main()
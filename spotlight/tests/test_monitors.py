@@ -0,0 +1,50 @@
+""" Test for the array monitors.
+"""
+
+import dill
+import numpy
+import unittest
+from mystic.models import rosen
+from spotlight import monitors
+from spotlight import solver
+
+class TestArrayMonitor(unittest.TestCase):
+
+    def test_history(self):
+        x = numpy.arange(50.0).reshape(25, 2)
+        m_all = monitors.ArrayMonitor(window=3)
+        m_every = monitors.ArrayMonitor(every=10)
+        m_last = monitors.ArrayMonitor(every=2, last=4)
+        for m in [m_all, m_every, m_last]:
+            for i, xi in enumerate(x):
+                m(xi, float(i))
+            self.assertEqual(len(m), 25)
+
+        numpy.testing.assert_array_equal(m_all.x, x)
+        self.assertEqual(m_all._y, [22.0, 23.0, 24.0])
+
+        # the last generation is always kept
+        self.assertEqual(list(m_every.steps), [0, 10, 20, 24])
+        self.assertEqual(list(m_last.steps), [18, 20, 22, 24])
+        numpy.testing.assert_array_equal(m_last.x, x[[18, 20, 22, 24]])
+
+        # only the kept generations are pickled
+        m_load = dill.loads(dill.dumps(m_last))
+        numpy.testing.assert_array_equal(m_load.y, m_last.y)
+        m_load(x[0], 25.0)
+        self.assertEqual(list(m_load.steps), [20, 22, 24, 25])
+
+    def test_solver(self):
+        solutions = []
+        for kwargs in [{}, {"monitor_every" : 5, "monitor_last" : 3}]:
+            numpy.random.seed(0)
+            s = solver.Solver([-2.0] * 3, [2.0] * 3, local_solver="nelder_mead",
+                              stop_change=1e-6, stop_generations=10, **kwargs)
+            s.solve(rosen, verbose=0)
+            solutions.append(s.solution)
+        self.assertEqual(len(solutions[1][0]), 3)
+        numpy.testing.assert_array_equal(solutions[0][0][-1], solutions[1][0][-1])
+        self.assertEqual(solutions[0][3], solutions[1][3])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+""" Test for the ``BasePlan`` class.
+"""
+
+import numpy
+import os
+import subprocess
+import tempfile
+import unittest
+from spotlight import gsas
+from spotlight import plan
+from spotlight import workers
+
+class FailingPlan(plan.BasePlan):
+
+    def compute(self):
+        if self.get("x") > 5:
+            gsas._external_call(["sh", "-c", "exit 3"])
+        elif self.get("x") > 0:
+            subprocess.check_call(["sh", "-c", "exit 3"])
+        elif self.get("x") < -1:
+            gsas._external_call(["sleep", "10"])
+        return self.get("x") ** 2
+
+class VectorizedPlan(plan.BasePlan):
+    vectorized = True
+
+    def compute(self):
+        return self.get("x") ** 2 + self.get("y")
+
+class BrokenBatchPlan(plan.BasePlan):
+
+    def compute(self):
+        return self.get("x") ** 2
+
+    def compute_batch(self, P):
+        raise KeyError("x")
+
+class PenalizedConfig:
+
+    def get_refinement_plan(self, initialize=True, reimport=True, pool=True):
+        cost = FailingPlan(["x"])
+        cost.evaluation_penalty = 100.0
+        return cost
+
+class TestBasePlan(unittest.TestCase):
+
+    def test_function_batch(self):
+        points = numpy.array([[1.0, 2.0], [3.0, 4.0], [-1.0, 0.5]])
+        cost = VectorizedPlan(["x", "y"])
+        expected = [cost.function(p) for p in points]
+        numpy.testing.assert_allclose(cost.function_batch(points), expected)
+
+        # without a vectorized compute points are evaluated one at a time
+        cost.vectorized = False
+        numpy.testing.assert_allclose(cost.function_batch(points), expected)
+
+        # prefetched values are used once
+        cost.prefetch(points)
+        self.assertEqual(cost.function(points[1]), expected[1])
+        self.assertEqual(len(cost._prefetched), 2)
+
+    def test_batch_failure(self):
+
+        # a failed batch is counted and evaluated one point at a time
+        cost = BrokenBatchPlan(["x"])
+        numpy.testing.assert_allclose(cost.function_batch([[1.0], [2.0]]), [1.0, 4.0])
+        cost.function_batch([[3.0]])
+        self.assertEqual(cost.pop_failures(), {"batch" : 2})
+
+    def test_failures(self):
+        cost = FailingPlan(["x"])
+
+        # failures raise an exception without a penalty
+        self.assertEqual(cost.function([-0.5]), 0.25)
+        self.assertRaises(subprocess.CalledProcessError, cost.function, [1.0])
+
+        # otherwise failures are tried again and then penalized
+        cost.evaluation_timeout = 0.1
+        cost.evaluation_retries = 1
+        cost.evaluation_penalty = 100.0
+        self.assertEqual(cost.function([1.0]), 100.0)
+        self.assertEqual(cost.function([-2.0]), 100.0)
+        self.assertEqual(cost.function([6.0]), 100.0)
+        self.assertEqual(cost.function([-0.5]), 0.25)
+        self.assertEqual(cost.pop_failures(), {"error" : 2, "timeout" : 2, "exit" : 2,
+                                               "penalty" : 3})
+        self.assertEqual(cost.pop_failures(), {})
+
+    def test_workers(self):
+        for mapper in ["thread", "process"]:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                run_dir = os.path.join(tmp_dir, "run")
+                os.mkdir(run_dir)
+                gsas.set_working_dir(run_dir)
+                try:
+                    cost = FailingPlan(["x"])
+                    cost.workers = workers.WorkerPool(PenalizedConfig(), 2, method="copy",
+                                                      mapper=mapper)
+                    values = cost.function_batch([[-0.5], [1.0], [0.5]])
+                    cost.workers.shutdown()
+                finally:
+                    gsas.set_working_dir(None)
+                numpy.testing.assert_allclose(values, [0.25, 100.0, 100.0])
+                self.assertEqual(cost.pop_failures(), {"error" : 2, "penalty" : 2})
+                self.assertTrue(os.path.isdir(run_dir + "_worker_1"))
+
+if __name__ == "__main__":
+    unittest.main()
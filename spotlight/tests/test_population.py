@@ -0,0 +1,47 @@
+""" Test for the population solvers.
+"""
+
+import numpy
+import random
+import unittest
+from spotlight import plan
+from spotlight import solver
+
+class QuadraticPlan(plan.BasePlan):
+    vectorized = True
+
+    def compute(self):
+        return (self.get("x") - 1.0) ** 2 + 10.0 * (self.get("y") + 3.0) ** 2
+
+class TestPopulationSolvers(unittest.TestCase):
+
+    def test_solvers(self):
+        for name in ["differential_evolution", "cmaes"]:
+            numpy.random.seed(0)
+            random.seed(0)
+            cost = QuadraticPlan(["x", "y"])
+            local_solver = solver.Solver([-5.0, -2.0], [5.0, 5.0],
+                                         local_solver=name, npop=12,
+                                         stop_change=1e-10, stop_generations=20)
+            local_solver.solve(cost, verbose=0)
+
+            # the minimum in y is outside the bounds
+            numpy.testing.assert_allclose(local_solver.local_solver.bestSolution,
+                                          [1.0, -2.0], atol=1e-3)
+
+            # points outside the bounds are not evaluated
+            self.assertLessEqual(local_solver.local_solver.evaluations,
+                                 12 * local_solver.local_solver.generations + 12)
+
+    def test_max_evaluations(self):
+        for name in ["differential_evolution", "cmaes"]:
+            numpy.random.seed(0)
+            random.seed(0)
+            cost = QuadraticPlan(["x", "y"])
+            local_solver = solver.Solver([-5.0, -2.0], [5.0, 5.0],
+                                         local_solver=name, npop=8, max_evaluations=40)
+            local_solver.solve(cost, verbose=0)
+            self.assertLessEqual(local_solver.local_solver.evaluations, 48)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+""" Test for the sampling methods.
+"""
+
+import numpy
+import unittest
+from spotlight import sampling
+
+class TestSampling(unittest.TestCase):
+
+    def test_sample(self):
+        lower_bounds = [0.0, -1.0, 2.0]
+        upper_bounds = [1.0, 1.0, 2.0]
+        for name, method in sampling.sampling_methods.items():
+            pts = method(lower_bounds, upper_bounds).sample(5)
+            self.assertEqual(pts.shape, (5, 3))
+            self.assertTrue(numpy.all(pts >= lower_bounds) and numpy.all(pts <= upper_bounds))
+            self.assertEqual(method(lower_bounds, upper_bounds).sample().shape, (3,))
+
+    def test_random_state(self):
+
+        # points drawn at once are the same as points drawn one at a time
+        rng = numpy.random.RandomState(0)
+        pts = sampling.UniformSampling([0.0, 0.0], [1.0, 2.0], random_state=rng).sample(3)
+        rng = numpy.random.RandomState(0)
+        sampler = sampling.UniformSampling([0.0, 0.0], [1.0, 2.0], random_state=rng)
+        numpy.testing.assert_array_equal(pts, [sampler.sample() for _ in range(3)])
+
+    def test_index(self):
+
+        # a walker draws the point of the sequence at its index
+        for name in ["sobol", "halton", "latin_hypercube"]:
+            method = sampling.sampling_methods[name]
+            rng = numpy.random.RandomState(0)
+            pts = method([0.0, 0.0], [1.0, 2.0], random_state=rng).sample(8)
+            for index in [0, 5]:
+                rng = numpy.random.RandomState(0)
+                kwargs = {"nsamples" : 8} if name == "latin_hypercube" else {}
+                p = method([0.0, 0.0], [1.0, 2.0], index=index, random_state=rng,
+                           **kwargs).sample()
+                numpy.testing.assert_array_equal(p, pts[index])
+
+        # each parameter of a Latin hypercube has one point in each stratum
+        strata = numpy.floor(pts / [1.0, 2.0] * 8)
+        for j in range(2):
+            self.assertEqual(sorted(strata[:, j]), list(range(8)))
+
+    def test_linspace(self):
+        pts = sampling.LinearSampling([0.0], [1.0], step=1, nsteps=4).sample(2)
+        numpy.testing.assert_allclose(pts, [[0.375], [0.625]])
+
+if __name__ == "__main__":
+    unittest.main()
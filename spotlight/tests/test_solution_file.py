@@ -0,0 +1,63 @@
+""" Test for the ``SolutionFile`` class.
+"""
+
+import dill
+import os
+import tempfile
+import unittest
+from mystic.models import rosen
+from spotlight import solver
+from spotlight.io import solution_file
+
+class TestSolutionFile(unittest.TestCase):
+
+    def test_points(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "solution.db")
+
+            # sampling methods that do not read the index do not write it
+            s = solver.Solver([-2.0] * 3, [2.0] * 3)
+            s.step(rosen, verbose=0)
+            solution_file.SolutionFile(path, None, "uniform").save_data("0_0_0", s)
+            self.assertFalse(os.path.exists(path + ".points"))
+
+            # a walker that is resumed from its state only adds new generations
+            fp_sol = solution_file.SolutionFile(path, None, "tolerance")
+            s = solver.Solver([-2.0] * 3, [2.0] * 3)
+            for _ in range(3):
+                s.step(rosen, verbose=0)
+            fp_sol.save_data("0_1_0", s)
+            self.assertEqual(len(fp_sol.points), len(s.stepmon))
+            s = dill.loads(dill.dumps(s))
+            ngenerations = len(s.stepmon)
+            for _ in range(2):
+                s.step(rosen, verbose=0)
+            fp_sol = solution_file.SolutionFile(path, None, "tolerance")
+            fp_sol.save_data("0_1_0", s)
+            self.assertEqual(len(fp_sol.points), len(s.stepmon) - ngenerations)
+
+    def test_basins(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "solution.db")
+
+            # sampling methods that do not read the index do not write it
+            s = solver.Solver([-2.0] * 3, [2.0] * 3, max_iterations=2,
+                              stop_change=0.1, stop_generations=1)
+            s.step(rosen, verbose=0)
+            s.step(rosen, verbose=0)
+            solution_file.SolutionFile(path, None, "uniform").save_data("0_0_0", s)
+            self.assertFalse(os.path.exists(path + ".basins"))
+
+            # a walker that is saved again after it terminated adds its basin once
+            fp_sol = solution_file.SolutionFile(path, None, "rejection")
+            fp_sol.save_data("0_1_0", s)
+            self.assertEqual(len(fp_sol.basins), len(s.stepmon) + 1)
+            self.assertEqual(fp_sol.get_basins().groups, 1)
+            s = dill.loads(dill.dumps(s))
+            s.step(rosen, verbose=0)
+            fp_sol = solution_file.SolutionFile(path, None, "rejection")
+            fp_sol.save_data("0_1_0", s)
+            self.assertEqual(len(fp_sol.basins), 0)
+
+if __name__ == "__main__":
+    unittest.main()
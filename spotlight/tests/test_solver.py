@@ -1,11 +1,18 @@
 """ A refinement plan for an analytical response function.
 """
 
+import dill
 import numpy
+import os
+import random
+import tempfile
 import unittest
+from mystic import monitors as mystic_monitors
 from scipy import stats
+from spotlight import gsas
 from spotlight import plan
 from spotlight import solver
+from spotlight.io import solution_file
 
 class Plan(plan.BasePlan):
 
@@ -77,3 +84,107 @@ class TestContainer(unittest.TestCase):
         
         #print(s.solution)
 
+    def test_ensemble_mapper(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            run_dir = os.path.join(tmp_dir, "run")
+            os.mkdir(run_dir)
+            gsas.set_working_dir(run_dir)
+            try:
+                results = []
+                for ensemble_mapper in [None, "process"]:
+                    numpy.random.seed(0)
+                    random.seed(0)
+                    s = solver.Solver([-9.5, -9.5], [9.5, 9.5],
+                                      local_solver="powell", ensemble_solver="buckshot",
+                                      nsolvers=3, ensemble_mapper=ensemble_mapper,
+                                      ensemble_clone="copy")
+                    p = Plan(["x", "y"])
+                    for _ in range(3):
+                        s.step(p, verbose=0)
+                    results.append((s.local_solver.bestEnergy, s.local_solver.evaluations))
+            finally:
+                gsas.set_working_dir(None)
+
+            # the nested solvers run in their own directories with the same results
+            self.assertEqual(results[0], results[1])
+            self.assertTrue(os.path.isdir(run_dir + "_solver_2"))
+
+    def test_prefetch(self):
+
+        class PrefetchPlan(Plan):
+            batches = []
+            def prefetch(self, P):
+                self.batches.append(len(P))
+                return super().prefetch(P)
+
+        # the starting points of the nested solvers are evaluated in one batch
+        # and each nested solver uses the value of its starting point
+        numpy.random.seed(0)
+        p = PrefetchPlan(["x", "y"])
+        s = solver.Solver([-9.5, -9.5], [9.5, 9.5], local_solver="powell",
+                          ensemble_solver="buckshot", nsolvers=3)
+        for _ in range(2):
+            s.step(p, verbose=0)
+        self.assertEqual(p.batches, [3])
+        self.assertFalse(p._prefetched)
+        self.assertIsNone(dill.loads(dill.dumps(s)).ensemble_map.cost)
+
+    def test_normalize(self):
+        numpy.random.seed(0)
+        p = Plan(["x", "y"])
+        s = solver.Solver([-9.5, 1.0], [9.5, 1.0], local_solver="powell", normalize=True,
+                          eliminate_fixed=True, stop_change=1e-6, stop_generations=5)
+        s.solve(p, verbose=0)
+
+        # the optimizer runs in the unit hypercube without the fixed parameter
+        # but the plan and solution use all parameters in their units
+        x, _, best_x, _ = s.solution
+        self.assertEqual(len(s.local_solver.bestSolution), 1)
+        self.assertTrue(0.0 <= s.local_solver.bestSolution[0] <= 1.0)
+        self.assertEqual(len(x[-1]), 2)
+        self.assertEqual(p.get("y"), 1.0)
+        numpy.testing.assert_allclose(best_x, x[-1])
+        self.assertEqual(best_x[1], 1.0)
+
+    def test_function(self):
+
+        # a plain cost function sees all parameters including fixed parameters
+        numpy.random.seed(0)
+        s = solver.Solver([-2.0, -2.0, 1.0], [2.0, 2.0, 1.0], stop_change=1e-6,
+                          stop_generations=5)
+        s.solve(lambda p: p[0] ** 2 + p[1] ** 2 + p[2] ** 2, verbose=0)
+        self.assertAlmostEqual(s.solution[3], 1.0, places=4)
+
+        # but cannot run in the units of the optimizer
+        s = solver.Solver([-2.0, -2.0], [2.0, 2.0], normalize=True)
+        with self.assertRaises(ValueError):
+            s.solve(lambda p: p[0] ** 2 + p[1] ** 2, verbose=0)
+
+    def test_resume(self):
+        numpy.random.seed(0)
+        p = Plan(["x", "y"])
+        s = solver.Solver([-9.5, -9.5], [9.5, 9.5], local_solver="powell",
+                          stop_change=0.1, stop_generations=5)
+
+        # a solver that was saved before the scaling and random streams were
+        # added has a Mystic monitor and neither attribute
+        s.stepmon = mystic_monitors.Monitor()
+        s.local_solver.SetGenerationMonitor(s.stepmon)
+        s.step(p, verbose=0)
+        del s.scaling
+        del s.random_state
+        del s.ensemble_map
+        s = dill.loads(dill.dumps(s))
+        self.assertIsNone(s.scaling)
+        self.assertIsNone(s.random_state)
+        self.assertIsNone(s.ensemble_map)
+
+        # the resumed solver steps and saves its history
+        for _ in range(2):
+            s.step(p, verbose=0)
+        self.assertEqual(len(s.solution[0]), 2)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            fp_sol = solution_file.SolutionFile(os.path.join(tmp_dir, "solution.db"), None,
+                                                "tolerance")
+            fp_sol.save_data("0_0_0", s)
+            self.assertEqual(len(fp_sol.points), 2)
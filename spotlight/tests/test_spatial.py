@@ -0,0 +1,74 @@
+""" Test for the spatial index of parameter vectors.
+"""
+
+import numpy
+import os
+import tempfile
+import unittest
+from spotlight import sampling
+from spotlight import spatial
+
+class TestPointIndex(unittest.TestCase):
+
+    def test_distance(self):
+        numpy.random.seed(0)
+        points = numpy.random.uniform(size=(1000, 3))
+        queries = numpy.random.uniform(size=(20, 3))
+        index = spatial.PointIndex(leaf_size=16)
+        for i in range(0, len(points), 37):
+            index.add(points[i:i + 37])
+        self.assertEqual(len(index), len(points))
+        expected = numpy.sqrt(((queries[:, None] - points[None]) ** 2).sum(axis=-1)).min(axis=1)
+        numpy.testing.assert_allclose(index.distance(queries), expected)
+
+    def test_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "solution.db.points")
+
+            # points of another process are added by load
+            index = spatial.PointIndex(path)
+            index.add([[0.0, 0.0]])
+            index.save()
+            os.rename(os.path.join(path, index._file_name), os.path.join(path, "other.pkl"))
+            other = spatial.PointIndex(path)
+            other.load()
+            index.add([[1.0, 1.0]])
+            index.save()
+            os.rename(os.path.join(path, index._file_name), os.path.join(path, "other_2.pkl"))
+            other.load()
+            other.load()
+            self.assertEqual(len(other), 2)
+
+    def test_tolerance(self):
+        numpy.random.seed(0)
+        index = spatial.PointIndex()
+        index.add([[0.0, 0.0], [1.0, 0.0], [0.0, 1.0]])
+        pt = sampling.ToleranceSampling([0.0, 0.0], [1.0, 1.0], index).sample()
+        numpy.testing.assert_allclose(pt, [1.0, 1.0], atol=0.05)
+
+    def test_rejection(self):
+
+        # terminated walkers searched the left basin of a cost function with
+        # one basin on each side of x = 0.5
+        numpy.random.seed(0)
+        index = spatial.PointIndex()
+        for start in [[x, y] for x in [0.0, 0.25, 0.5] for y in [0.0, 0.5, 1.0]]:
+            path = start + numpy.linspace(0.0, 1.0, 25)[:, None] * (0.25 - start[0], 0.5 - start[1])
+            index.add(path)
+        self.assertEqual(index.groups, 9)
+
+        # the radius counts the walkers rather than the points in their histories
+        method = sampling.RejectionSampling([0.0, 0.0], [1.0, 1.0], index)
+        self.assertEqual(method.critical_distance(1), 0.0)
+        self.assertGreater(method.critical_distance(index.groups),
+                           method.critical_distance(len(index)))
+
+        # new walkers start in the right basin
+        pts = method.sample(3)
+        self.assertEqual(pts.shape, (3, 2))
+        self.assertTrue((pts[:, 0] > 0.5).all())
+        pts = sampling.UniformSampling([0.0, 0.0], [1.0, 1.0]).sample(100)
+        self.assertTrue((pts[:, 0] < 0.5).any())
+
+if __name__ == "__main__":
+    unittest.main()
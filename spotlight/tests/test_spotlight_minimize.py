@@ -0,0 +1,105 @@
+""" Test for scheduling walkers in ``spotlight_minimize``.
+"""
+
+import collections
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from spotlight import early_stop
+from spotlight.cli import spotlight_minimize
+
+# a configuration file with a cheap cost function
+CONFIG = """
+from spotlight import plan
+
+class Plan(plan.BasePlan):
+
+    configuration = {
+        "solution_file" : "solution.db",
+        "state_file" : "state.db",
+        "checkpoint_stride" : 1,
+        "num_solvers" : 3,
+        "seed" : 0,
+    }
+
+    solver = {
+        "local_solver" : "powell",
+        "stop_change" : 0.1,
+        "stop_generations" : 2,
+        "max_evaluations" : 50,
+        "sampling_method" : "uniform",
+    }
+
+    parameters = {
+        "x" : [-2.0, 2.0],
+        "y" : [-2.0, 2.0],
+    }
+
+    def initialize(self):
+        pass
+
+    def compute(self):
+        return self.get("x") ** 2 + self.get("y") ** 2
+"""
+
+class TestSchedule(unittest.TestCase):
+
+    def setUp(self):
+        try:
+            from mpi4py import MPI
+        except ImportError:
+            self.skipTest("Requires mpi4py")
+        if MPI.Query_thread() < MPI.THREAD_MULTIPLE:
+            self.skipTest("Requires MPI_THREAD_MULTIPLE")
+        self.comm = MPI.COMM_SELF
+
+    def schedule(self, num_walkers, stopper):
+        """ Returns the walkers that rank 0 hands out to itself.
+        """
+        scheduler = threading.Thread(target=spotlight_minimize.schedule_walkers,
+                                     args=(self.comm, num_walkers, stopper),
+                                     kwargs={"num_workers" : 1})
+        scheduler.start()
+        indices = list(spotlight_minimize.request_walkers(self.comm))
+        scheduler.join()
+        return indices
+
+    def test_schedule(self):
+        self.assertEqual(self.schedule(5, early_stop.EarlyStop()), list(range(5)))
+
+        # no walkers are handed out once all walkers should stop
+        stopper = early_stop.EarlyStop(target_cost=1.0)
+        stopper.update(0.5)
+        self.assertEqual(self.schedule(5, stopper), [])
+
+class TestRunPool(unittest.TestCase):
+
+    def test_run_pool(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config_file = os.path.join(tmp_dir, "config_pool.py")
+            with open(config_file, "w") as fp:
+                fp.write(CONFIG)
+            env = dict(os.environ)
+            env["PYTHONPATH"] = os.pathsep.join(
+                                    [os.path.dirname(os.path.dirname(os.path.dirname(__file__)))]
+                                    + env.get("PYTHONPATH", "").split(os.pathsep))
+            proc = subprocess.run([sys.executable, spotlight_minimize.__file__,
+                                   "--config-files", config_file, "--nprocs", "2"],
+                                  cwd=tmp_dir, env=env, stdout=subprocess.PIPE,
+                                  stderr=subprocess.STDOUT, universal_newlines=True)
+            self.assertEqual(proc.returncode, 0, proc.stdout)
+
+            # every walker of the two processes runs exactly once
+            counts = collections.Counter(re.findall(r"Initializing a state for (\d+_\d+_\d+)",
+                                                    proc.stdout))
+            keys = ["{0}_{1}_{0}".format(*divmod(index, 3)) for index in range(6)]
+            self.assertEqual(counts, collections.Counter(keys))
+            self.assertEqual(sorted(os.listdir(os.path.join(tmp_dir, "solution.db"))),
+                             sorted("K_" + key for key in keys + ["config"]))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+""" Test for the random number streams of walkers.
+"""
+
+import dill
+import numpy
+import random
+import unittest
+from mystic.models import rosen
+from spotlight import solver
+from spotlight import streams
+
+class TestWalkerRandomState(unittest.TestCase):
+
+    def test_streams(self):
+
+        # the streams only depend on the seed and index
+        with streams.WalkerRandomState(0, 1):
+            a = numpy.random.uniform(size=3), random.random()
+        numpy.random.seed(5)
+        with streams.WalkerRandomState(0, 1):
+            b = numpy.random.uniform(size=3), random.random()
+        numpy.testing.assert_array_equal(a[0], b[0])
+        self.assertEqual(a[1], b[1])
+
+        # walkers and neighbouring seeds have different streams
+        with streams.WalkerRandomState(0, 2):
+            self.assertFalse(numpy.array_equal(numpy.random.uniform(size=3), a[0]))
+        with streams.WalkerRandomState(1, 1):
+            self.assertFalse(numpy.array_equal(numpy.random.uniform(size=3), a[0]))
+
+        # the global generators are restored
+        numpy.random.seed(5)
+        expected = numpy.random.uniform()
+        numpy.random.seed(5)
+        with streams.WalkerRandomState(0, 1):
+            numpy.random.uniform()
+        self.assertEqual(numpy.random.uniform(), expected)
+
+    def test_solver(self):
+
+        # a walker is the same if other walkers take steps in between or if it
+        # is pickled between steps
+        def get_solver(index):
+            return solver.Solver([-2.0] * 3, [2.0] * 3, local_solver="differential_evolution",
+                                 random_state=streams.WalkerRandomState(0, index))
+        s = get_solver(0)
+        for _ in range(5):
+            s.step(rosen, verbose=0)
+        s_0, s_1 = get_solver(0), get_solver(1)
+        for i in range(5):
+            s_0.step(rosen, verbose=0)
+            s_1.step(rosen, verbose=0)
+            if i == 2:
+                s_0 = dill.loads(dill.dumps(s_0))
+        numpy.testing.assert_array_equal(s.solution[0], s_0.solution[0])
+        self.assertFalse(numpy.array_equal(s.solution[0], s_1.solution[0]))
+
+    def test_threads(self):
+
+        # a walker in a thread draws its starting point from its own streams
+        # without changing the global generators
+        def get_solver(global_streams):
+            random_state = streams.WalkerRandomState(0, 1, global_streams=global_streams)
+            return solver.Solver([-2.0] * 3, [2.0] * 3, random_state=random_state)
+        numpy.random.seed(5)
+        expected = numpy.random.uniform()
+        numpy.random.seed(5)
+        s = get_solver(False)
+        self.assertEqual(numpy.random.uniform(), expected)
+        numpy.testing.assert_array_equal(s.local_solver.population[0],
+                                         get_solver(True).local_solver.population[0])
+
+        # other walkers do not take its streams
+        s = get_solver(False)
+        with s.random_state:
+            with streams.WalkerRandomState(0, 2):
+                numpy.random.uniform()
+            a = s.random_state.numpy_random.uniform(size=3)
+        b = get_solver(False).random_state.numpy_random
+        numpy.testing.assert_array_equal(a, b.uniform(size=3))
+
+        # the streams continue after the walker is pickled
+        s = dill.loads(dill.dumps(s))
+        self.assertTrue(s.random_state.global_streams)
+        numpy.testing.assert_array_equal(s.random_state.numpy_random.uniform(size=3),
+                                         b.uniform(size=3))
+
+if __name__ == "__main__":
+    unittest.main()
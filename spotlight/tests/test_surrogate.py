@@ -0,0 +1,43 @@
+""" Test for the ``SurrogateScreen`` class.
+"""
+
+import numpy
+import unittest
+from spotlight import surrogate
+
+class TestSurrogateScreen(unittest.TestCase):
+
+    def test_screen(self):
+        screen = surrogate.SurrogateScreen(min_points=10, margin=0.0)
+        rng = numpy.random.RandomState(0)
+        self.assertIsNone(screen.screen([0.5, 0.5]))
+        for p in rng.uniform(-1, 1, size=(50, 2)):
+            screen.screen(p)
+            screen.add(p, (p**2).sum())
+        self.assertIsNone(screen.screen([0.0, 0.0]))
+        self.assertGreater(screen.screen([1.0, 1.0]), screen.best)
+
+    def test_no_screening_without_errors(self):
+        screen = surrogate.SurrogateScreen(min_points=10, margin=0.0)
+        for p in numpy.random.RandomState(0).uniform(-1, 1, size=(30, 2)):
+            screen.add(p, (p**2).sum())
+        self.assertIsNone(screen.screen([1.0, 1.0]))
+
+    def test_reset(self):
+        screen = surrogate.SurrogateScreen(min_points=1)
+        screen.add([0.0], 1.0)
+        screen.add([1.0], 0.0)
+        self.assertEqual(screen.best, 0.0)
+        screen.reset()
+        self.assertIsNone(screen.best)
+        self.assertIsNone(screen.screen([0.5]))
+        self.assertEqual(len(screen), 2)
+
+    def test_max_points(self):
+        screen = surrogate.SurrogateScreen(max_points=3)
+        for i in range(5):
+            screen.add([float(i)], float(i))
+        self.assertEqual(len(screen), 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+""" Test for the ``Profiler`` class.
+"""
+
+import unittest
+from spotlight import timing
+
+class TestProfiler(unittest.TestCase):
+
+    def test_timer(self):
+        profiler = timing.Profiler()
+
+        @profiler.timer("square")
+        def square(x):
+            return x * x
+
+        # nothing is recorded until the profiler is enabled
+        self.assertEqual(square(2), 4)
+        self.assertEqual(profiler.stats, {})
+        profiler.enabled = True
+        for x in range(3):
+            square(x)
+        self.assertEqual(profiler.stats["square"]["count"], 3)
+
+        # walker statistics start over after they are popped
+        self.assertEqual(profiler.pop_walker()["square"]["count"], 3)
+        self.assertEqual(profiler.pop_walker(), {})
+
+    def test_merge_statistics(self):
+        profiler = timing.Profiler()
+        profiler.add("a", 0.1)
+        profiler.add("a", 10.0)
+        stats = timing.merge_statistics({}, profiler.stats)
+        timing.merge_statistics(stats, profiler.stats)
+        self.assertEqual(stats["a"]["count"], 4)
+        self.assertAlmostEqual(stats["a"]["total"], 20.2)
+        self.assertLess(timing.percentile(stats["a"], 25), 1.0)
+        self.assertGreater(timing.percentile(stats["a"], 75), 1.0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+""" Test for the pools of workers.
+"""
+
+import os
+import sys
+import tempfile
+import types
+import unittest
+from spotlight import gsas
+from spotlight import plan
+from spotlight import workers
+
+class DirectoryPlan(plan.BasePlan):
+
+    def compute(self):
+
+        # each worker reads the input file from its own directory
+        cwd = os.getcwd()
+        assert gsas.get_working_dir() == cwd
+        with open("input.txt") as fp:
+            offset = float(fp.read())
+        with open("pid.txt", "w") as fp:
+            fp.write(str(os.getpid()))
+        return offset + self.get("x")
+
+class DirectoryConfig:
+
+    def get_refinement_plan(self, initialize=True, reimport=True, pool=True):
+        return DirectoryPlan(["x"])
+
+def get_directory(value):
+    """ Returns the working directory and the contents of the input file.
+    """
+    with open("input.txt") as fp:
+        return os.getcwd(), gsas.get_working_dir(), fp.read(), value
+
+def get_function(function):
+    """ Returns a function that returns ``function`` and its argument.
+    """
+    def get_value(value):
+        return function, value
+    return get_value
+
+class TestWorkerPool(unittest.TestCase):
+
+    def test_context(self):
+
+        # workers are forked unless MPI is initialized
+        module = sys.modules.get("mpi4py.MPI")
+        try:
+            sys.modules["mpi4py.MPI"] = types.SimpleNamespace(
+                Is_initialized=lambda: False, Is_finalized=lambda: False)
+            self.assertEqual(workers._context().get_start_method(), "fork")
+            sys.modules["mpi4py.MPI"] = types.SimpleNamespace(
+                Is_initialized=lambda: True, Is_finalized=lambda: False)
+            self.assertEqual(workers._context().get_start_method(), "forkserver")
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                run_dir = os.path.join(tmp_dir, "run")
+                os.mkdir(run_dir)
+                with open(os.path.join(run_dir, "input.txt"), "w") as fp:
+                    fp.write("10")
+                gsas.set_working_dir(run_dir)
+                try:
+                    pool = workers.WorkerPool(DirectoryConfig(), 1, method="copy",
+                                              mapper="process")
+                    results = pool.evaluate([[1.0]])
+                    pool.shutdown()
+                finally:
+                    gsas.set_working_dir(None)
+        finally:
+            if module is None:
+                del sys.modules["mpi4py.MPI"]
+            else:
+                sys.modules["mpi4py.MPI"] = module
+        self.assertEqual(results[0][:2], (11.0, True))
+
+    def test_process(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            run_dir = os.path.join(tmp_dir, "run")
+            os.mkdir(run_dir)
+            with open(os.path.join(run_dir, "input.txt"), "w") as fp:
+                fp.write("10")
+            cwd = os.getcwd()
+            gsas.set_working_dir(run_dir)
+            try:
+                pool = workers.WorkerPool(DirectoryConfig(), 2, method="copy", mapper="process")
+                results = pool.evaluate([[float(i)] for i in range(6)])
+                pool.shutdown()
+            finally:
+                gsas.set_working_dir(None)
+
+            # the workers run in other processes in cloned directories
+            self.assertEqual(os.getcwd(), cwd)
+            self.assertEqual([value for value, _, _ in results], [10.0 + i for i in range(6)])
+            self.assertTrue(all(success for _, success, _ in results))
+            pids = set()
+            for i in range(2):
+                worker_dir = "{}_worker_{}".format(run_dir, i)
+                self.assertTrue(os.path.exists(os.path.join(worker_dir, "input.txt")))
+                if os.path.exists(os.path.join(worker_dir, "pid.txt")):
+                    with open(os.path.join(worker_dir, "pid.txt")) as fp:
+                        pids.add(int(fp.read()))
+            self.assertTrue(pids)
+            self.assertNotIn(os.getpid(), pids)
+            self.assertFalse(os.path.exists(os.path.join(run_dir, "pid.txt")))
+
+class TestEnsembleMapper(unittest.TestCase):
+
+    def test_process(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            run_dir = os.path.join(tmp_dir, "run")
+            os.mkdir(run_dir)
+            with open(os.path.join(run_dir, "input.txt"), "w") as fp:
+                fp.write("10")
+            gsas.set_working_dir(run_dir)
+            try:
+                mapper = workers.EnsembleMapper(method="copy", mapper="process")
+                results = mapper(get_directory, range(3))
+
+                # a function that the mapped function closes over is returned
+                # as the same object
+                function = lambda x: x
+                values = mapper(get_function(function), range(3))
+                self.assertTrue(all(value is function for value, _ in values))
+                self.assertEqual([i for _, i in values], [0, 1, 2])
+
+                # a new step reuses the cloned directories
+                with open(os.path.join(run_dir, "input.txt"), "w") as fp:
+                    fp.write("20")
+                again = mapper(get_directory, range(3))
+
+                # restarting the workers does not leave the finalizer of the
+                # previous workers behind
+                finalizer = mapper._finalizer
+                mapper.shutdown()
+                self.assertFalse(finalizer.alive)
+                mapper(get_directory, range(3))
+                self.assertTrue(mapper._finalizer.alive)
+                mapper.shutdown()
+            finally:
+                gsas.set_working_dir(None)
+
+            # each nested solver runs in its own directory in another process
+            for i, (cwd, working_dir, contents, value) in enumerate(results):
+                nested_dir = "{}_solver_{}".format(run_dir, i)
+                self.assertEqual(cwd, nested_dir)
+                self.assertEqual(working_dir, nested_dir)
+                self.assertEqual(contents, "10")
+                self.assertEqual(value, i)
+            self.assertEqual([contents for _, _, contents, _ in again], ["10"] * 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,228 @@
+""" This module contains classes for measuring where time is spent during an
+optimization.
+"""
+
+import functools
+import json
+import numpy
+import os
+import socket
+import threading
+import time
+
+# edges of the histogram of durations in seconds
+# there are ten bins per decade from a microsecond to a day
+BIN_EDGES = numpy.logspace(-6, 5, 111)
+
+def new_statistics():
+    """ Returns empty statistics for a timed phase. The statistics are a
+    ``dict`` with the number of calls, the total time in seconds, and a
+    histogram of the durations. Statistics are merged by adding each value.
+
+    Returns
+    -------
+    stats : dict
+        The statistics of a timed phase.
+    """
+    return {"count" : 0, "total" : 0.0,
+            "histogram" : numpy.zeros(len(BIN_EDGES) + 1, dtype=int)}
+
+def merge_statistics(stats, other):
+    """ Adds the statistics of timed phases in ``other`` to ``stats``.
+
+    Parameters
+    ----------
+    stats : dict
+        A ``dict`` with key phase name and value statistics, which is modified.
+    other : dict
+        A ``dict`` with key phase name and value statistics.
+
+    Returns
+    -------
+    stats : dict
+        The merged statistics.
+    """
+    for name, values in other.items():
+        if name not in stats:
+            stats[name] = new_statistics()
+        stats[name]["count"] += values["count"]
+        stats[name]["total"] += values["total"]
+        stats[name]["histogram"] = stats[name]["histogram"] + numpy.asarray(values["histogram"])
+    return stats
+
+def percentile(stats, q):
+    """ Returns an estimate of a percentile of the durations from the histogram.
+
+    Parameters
+    ----------
+    stats : dict
+        The statistics of a timed phase.
+    q : float
+        The percentile between 0 and 100.
+
+    Returns
+    -------
+    float
+        The duration in seconds at the geometric center of the bin that
+        contains the percentile.
+    """
+    histogram = numpy.asarray(stats["histogram"])
+    if histogram.sum() == 0:
+        return numpy.nan
+    i = numpy.searchsorted(numpy.cumsum(histogram), q / 100.0 * histogram.sum())
+    edges = numpy.hstack([BIN_EDGES[0], BIN_EDGES, BIN_EDGES[-1]])
+    return numpy.sqrt(edges[i] * edges[i + 1])
+
+def summary(stats, total=None):
+    """ Returns a table of the statistics of timed phases.
+
+    Parameters
+    ----------
+    stats : dict
+        A ``dict`` with key phase name and value statistics.
+    total : {None, float}
+        The wall time in seconds used for the fraction column.
+
+    Returns
+    -------
+    str
+        The table.
+    """
+    lines = ["{:<24} {:>10} {:>12} {:>8} {:>12} {:>12} {:>12}".format(
+                 "phase", "count", "total (s)", "percent", "p50 (s)", "p90 (s)", "p99 (s)")]
+    for name in sorted(stats, key=lambda name: -stats[name]["total"]):
+        values = stats[name]
+        fraction = 100.0 * values["total"] / total if total else numpy.nan
+        lines.append("{:<24} {:>10d} {:>12.4g} {:>8.1f} {:>12.3g} {:>12.3g} {:>12.3g}".format(
+                         name, values["count"], values["total"], fraction,
+                         percentile(values, 50), percentile(values, 90),
+                         percentile(values, 99)))
+    return "\n".join(lines)
+
+class Profiler:
+    """ This class records the number of calls and the durations of phases of
+    an optimization. Statistics are kept for the whole process and for the
+    walker currently running in each thread.
+
+    Recording is off until ``enabled`` is set, so the timed functions only
+    check a flag when not profiling.
+
+    Attributes
+    ----------
+    enabled : bool
+        Record durations.
+    stats : dict
+        A ``dict`` with key phase name and value statistics for the process.
+    t_start : float
+        The time the profiler was created.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.stats = {}
+        self.t_start = time.time()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def add(self, name, duration):
+        """ Records the duration of a phase.
+
+        Parameters
+        ----------
+        name : str
+            Name of the phase.
+        duration : float
+            The duration in seconds.
+        """
+        i = numpy.searchsorted(BIN_EDGES, duration)
+        with self._lock:
+            self._add(self.stats, name, duration, i)
+        self._add(self._walker_stats(), name, duration, i)
+
+    def timer(self, name):
+        """ Returns a decorator that records the durations of calls to a
+        function under a phase name.
+
+        Parameters
+        ----------
+        name : str
+            Name of the phase.
+
+        Returns
+        -------
+        function
+            The decorator.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                t_start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.add(name, time.perf_counter() - t_start)
+            return wrapper
+        return decorator
+
+    def pop_walker(self):
+        """ Returns the statistics recorded in this thread since the last call
+        and starts new statistics.
+
+        Returns
+        -------
+        stats : dict
+            A ``dict`` with key phase name and value statistics.
+        """
+        stats = self._walker_stats()
+        self._local.stats = {}
+        return stats
+
+    def save(self, path, **kwargs):
+        """ Writes the statistics of this process to a JSON file in a directory.
+
+        Parameters
+        ----------
+        path : str
+            Path to the directory.
+        kwargs : dict
+            Other information to write with the statistics.
+
+        Returns
+        -------
+        output_file : str
+            Path to the file that was written.
+        """
+        if not os.path.exists(path):
+            os.makedirs(path, exist_ok=True)
+        output_file = os.path.join(path, "{}_{}.json".format(socket.gethostname(), os.getpid()))
+        data = dict(kwargs)
+        data["wall_time"] = time.time() - self.t_start
+        data["stats"] = {name : {"count" : values["count"], "total" : values["total"],
+                                 "histogram" : values["histogram"].tolist()}
+                         for name, values in self.stats.items()}
+        with open(output_file, "w") as fp:
+            json.dump(data, fp, indent=1)
+        return output_file
+
+    @staticmethod
+    def _add(stats, name, duration, i):
+        """ Adds a duration in histogram bin ``i`` to the statistics.
+        """
+        if name not in stats:
+            stats[name] = new_statistics()
+        stats[name]["count"] += 1
+        stats[name]["total"] += duration
+        stats[name]["histogram"][i] += 1
+
+    def _walker_stats(self):
+        """ Returns the statistics of the walker in this thread.
+        """
+        if not hasattr(self._local, "stats"):
+            self._local.stats = {}
+        return self._local.stats
+
+# profiler of this process
+profiler = Profiler()
+timer = profiler.timer
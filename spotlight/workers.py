@@ -0,0 +1,390 @@
+""" This module contains classes for evaluating many parameter vectors of a
+refinement plan at the same time.
+"""
+
+import concurrent.futures
+import dill
+import io
+import multiprocessing
+import os
+import sys
+import threading
+import types
+import weakref
+from mystic.python_map import python_map
+from spotlight import filesystem
+from spotlight import gsas
+
+# refinement plan of each worker
+_local = threading.local()
+
+def _initialize(config, source, method, counter, change):
+    """ Makes the directory and refinement plan of a worker. Workers are
+    numbered with ``counter`` or with their rank if ``counter`` is ``None``.
+    """
+    if counter is None:
+        from mpi4py import MPI
+        worker = MPI.COMM_WORLD.Get_rank()
+    else:
+        with counter.get_lock():
+            worker = counter.value
+            counter.value += 1
+    worker_dir = "{}_worker_{}".format(source, worker)
+    filesystem.clone(source, worker_dir, method=method)
+    gsas.set_working_dir(worker_dir)
+    if change:
+        os.chdir(worker_dir)
+    _local.plan = config.get_refinement_plan(
+                      initialize=False, reimport=False, pool=False)
+
+def _evaluate(p):
+    """ Evaluates a parameter vector with the refinement plan of a worker.
+    """
+    plan = _local.plan
+    plan._p = p
+    value, success = plan._evaluate()
+    return value, success, plan.pop_failures()
+
+def _context():
+    """ Returns the ``multiprocessing`` context of workers in other processes.
+    Workers are forked from this process unless MPI was initialized in this
+    process, since MPI libraries do not support forking a process that uses
+    MPI, and then workers are forked from a new server process instead.
+    """
+    mpi = sys.modules.get("mpi4py.MPI")
+    if mpi is not None and mpi.Is_initialized() and not mpi.Is_finalized():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("fork")
+
+def _closure_functions(func):
+    """ Returns the functions that a function closes over, e.g. the cost
+    function of the function that an ensemble solver maps.
+    """
+    functions = []
+    for cell in func.__closure__ or ():
+        try:
+            value = cell.cell_contents
+        except ValueError:
+            continue
+        if isinstance(value, types.FunctionType):
+            functions.append(value)
+    return functions
+
+class _ResultPickler(dill.Pickler):
+    """ This class pickles the value of a mapped function in a worker, where
+    the functions that the mapped function closes over are pickled as
+    references to the functions of the caller.
+    """
+
+    def __init__(self, fp, func):
+        super().__init__(fp)
+        self.functions = {id(value) : i for i, value in enumerate(_closure_functions(func))}
+
+    def persistent_id(self, obj):
+        return self.functions.get(id(obj))
+
+class _ResultUnpickler(dill.Unpickler):
+    """ This class unpickles the value from ``_ResultPickler`` with the
+    functions of the caller.
+    """
+
+    def __init__(self, fp, func):
+        super().__init__(fp)
+        self.functions = _closure_functions(func)
+
+    def persistent_load(self, pid):
+        return self.functions[pid]
+
+def _run_nested(call, nested_dir):
+    """ Calls a function of a Mystic ensemble solver in the directory of a
+    nested solver. The function and arguments are pickled with ``dill``.
+    The functions that the function closes over, e.g. the cost function, are
+    returned as references, so the caller gets its own functions back.
+    """
+    gsas.set_working_dir(nested_dir)
+    os.chdir(nested_dir)
+    if nested_dir not in sys.path:
+        sys.path.append(nested_dir)
+    func, args = dill.loads(call)
+    fp = io.BytesIO()
+    _ResultPickler(fp, func).dump(func(*args))
+    return fp.getvalue()
+
+class WorkerPool:
+    """ This class evaluates parameter vectors in a pool of workers, which
+    overlaps the time spent waiting on external programs such as GSAS.
+
+    There are a couple choices of mappers listed below.
+
+     * ``thread`` : Evaluates in threads of this process.
+     * ``process`` : Evaluates in processes forked from this process, or from
+       a server process if MPI is initialized in this process.
+     * ``mpi`` : Evaluates in processes spawned with ``mpi4py.futures``.
+
+    Each worker has its own refinement plan and works in its own directory
+    ``<dir>_worker_<i>`` which is set with ``gsas.set_working_dir``. The
+    directory is cloned from the directory ``<dir>`` of the refinement plan that
+    starts the pool, so the refinement plans of the workers are not
+    initialized again. Workers in other processes also change into their
+    directory. The workers are started on the first call to ``evaluate``.
+
+    Attributes
+    ----------
+    config : ConfigurationFile
+        The configuration that creates the refinement plans of the workers.
+    nworkers : int
+        The number of workers.
+    method : str
+        How to clone the directory of each worker, see ``filesystem.clone``.
+    mapper : str
+        The kind of workers.
+
+    Parameters
+    ----------
+    config : ConfigurationFile
+        The configuration that creates the refinement plans of the workers.
+    nworkers : int
+        The number of workers.
+    method : str
+        How to clone the directory of each worker, see ``filesystem.clone``.
+        Default is ``"reflink"``.
+    mapper : str
+        The kind of workers. Default is ``"thread"``.
+    """
+
+    mappers = ["thread", "process", "mpi"]
+
+    def __init__(self, config, nworkers, method="reflink", mapper="thread"):
+        if nworkers < 1:
+            raise ValueError("The number of workers must be at least 1!")
+        if mapper not in self.mappers:
+            raise ValueError("Unrecognized mapper {}!".format(mapper))
+        self.config = config
+        self.nworkers = nworkers
+        self.method = method
+        self.mapper = mapper
+        self._executor = None
+
+    def __getstate__(self):
+        """ Returns the state to pickle without the configuration and the
+        workers. The refinement plan that holds the pool is pickled with the
+        state of a solver, but only the refinement plan of the process is used
+        to evaluate parameter vectors after the state is loaded.
+        """
+        return {"nworkers" : self.nworkers, "method" : self.method,
+                "mapper" : self.mapper}
+
+    def __setstate__(self, state):
+        self.__init__(None, **state)
+
+    def _start(self):
+        """ Starts the workers from the working directory of this thread.
+        """
+        source = os.path.abspath(gsas.get_working_dir() or os.getcwd())
+        context = _context()
+        counter = context.Value("i", 0)
+        if self.mapper == "thread":
+            initargs = (self.config, source, self.method, counter, False)
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                                 self.nworkers, initializer=_initialize, initargs=initargs)
+        elif self.mapper == "process":
+            initargs = (self.config, source, self.method, counter, True)
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                                 self.nworkers, mp_context=context,
+                                 initializer=_initialize, initargs=initargs)
+        else:
+            from mpi4py.futures import MPIPoolExecutor
+            initargs = (self.config, source, self.method, None, True)
+            self._executor = MPIPoolExecutor(
+                                 self.nworkers, main=False,
+                                 initializer=_initialize, initargs=initargs)
+
+    def evaluate(self, P):
+        """ Evaluates parameter vectors in the workers and handles failed
+        evaluations as ``BasePlan._evaluate`` does.
+
+        Parameters
+        ----------
+        P : numpy.array
+            An array with shape ``(n, ndim)`` of parameter vectors.
+
+        Returns
+        -------
+        list
+            A ``list`` of tuples of the value, whether the evaluation
+            succeeded, and a ``dict`` of the number of failures of each
+            parameter vector.
+        """
+        if self._executor is None:
+            self._start()
+        return list(self._executor.map(_evaluate, list(P)))
+
+    def shutdown(self):
+        """ Stops the workers.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+class EnsembleMapper:
+    """ This class is a map for Mystic ensemble solvers that runs the nested
+    solvers at the same time in a pool of processes. The functions that an
+    ensemble solver maps are not pickled by ``pickle`` so the function and
+    arguments are pickled with ``dill``, which includes the refinement plan.
+
+    Each nested solver works in its own directory ``<dir>_solver_<i>`` which
+    is set with ``gsas.set_working_dir``. The directory is cloned from the
+    directory ``<dir>`` of the refinement plan before the first step of the
+    nested solver, so the refinement plans of the nested solvers do not write
+    to the same files. The workers are started on the first call to the map.
+
+    Attributes
+    ----------
+    nworkers : {None, int}
+        The number of workers.
+    method : str
+        How to clone the directory of each nested solver, see
+        ``filesystem.clone``.
+    mapper : str
+        The kind of workers, either ``"process"`` or ``"mpi"``.
+
+    Parameters
+    ----------
+    nworkers : {None, int}
+        The number of workers. Default is ``None`` which uses one worker for
+        each nested solver.
+    method : str
+        How to clone the directory of each nested solver, see
+        ``filesystem.clone``. Default is ``"reflink"``.
+    mapper : str
+        The kind of workers, either ``"process"`` or ``"mpi"``. Default is
+        ``"process"``.
+    """
+
+    mappers = ["process", "mpi"]
+
+    def __init__(self, nworkers=None, method="reflink", mapper="process"):
+        if nworkers is not None and nworkers < 1:
+            raise ValueError("The number of workers must be at least 1!")
+        if mapper not in self.mappers:
+            raise ValueError("Unrecognized mapper {}!".format(mapper))
+        self.nworkers = nworkers
+        self.method = method
+        self.mapper = mapper
+        self._executor = None
+        self._finalizer = None
+        self._cloned = set()
+
+    def __getstate__(self):
+        """ Returns the state to pickle without the workers. Directories are
+        cloned again after the state is loaded.
+        """
+        return {"nworkers" : self.nworkers, "method" : self.method,
+                "mapper" : self.mapper}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _start(self, nworkers):
+        """ Starts the workers.
+        """
+        if self.mapper == "process":
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                                 nworkers, mp_context=_context())
+        else:
+            from mpi4py.futures import MPIPoolExecutor
+            self._executor = MPIPoolExecutor(nworkers, main=False)
+
+        # stop the workers when the map is deleted or the interpreter exits
+        self._finalizer = weakref.finalize(self, self._executor.shutdown)
+
+    def __call__(self, func, *iterables, **kwargs):
+        """ Maps a function over the arguments of each nested solver.
+
+        Returns
+        -------
+        list
+            A ``list`` of the values returned by the function.
+        """
+        calls = list(zip(*iterables))
+        if self._executor is None:
+            self._start(self.nworkers or len(calls))
+
+        # clone the directory of each nested solver
+        source = os.path.abspath(gsas.get_working_dir() or os.getcwd())
+        nested_dirs = []
+        for i in range(len(calls)):
+            nested_dir = "{}_solver_{}".format(source, i)
+            if i not in self._cloned:
+                filesystem.clone(source, nested_dir, method=self.method)
+                self._cloned.add(i)
+            nested_dirs.append(nested_dir)
+
+        # pickle the function with the arguments since the nested solver and
+        # the function share the cost function, and a nested solver decorates
+        # the cost function again and resets its evaluations if it is not the
+        # same object, and unpickle the values with the functions of this
+        # process for the same reason
+        futures = [self._executor.submit(_run_nested, dill.dumps((func, args)), nested_dir)
+                   for args, nested_dir in zip(calls, nested_dirs)]
+        return [_ResultUnpickler(io.BytesIO(future.result()), func).load()
+                for future in futures]
+
+    def shutdown(self):
+        """ Stops the workers.
+        """
+        if self._executor is not None:
+            self._finalizer.detach()
+            self._finalizer = None
+            self._executor.shutdown()
+            self._executor = None
+
+class PrefetchMapper:
+    """ This class is a map for Mystic ensemble solvers that evaluates the
+    starting points of the nested solvers in one batch with ``prefetch`` of
+    the refinement plan before a map over the nested solvers that are given
+    starting points. The first evaluation of each nested solver then uses the
+    value from the batch.
+
+    Attributes
+    ----------
+    map : callable
+        The map over the nested solvers.
+    cost : {None, Plan}
+        The refinement plan that evaluates the starting points. This is not
+        pickled.
+
+    Parameters
+    ----------
+    map : {None, callable}
+        The map over the nested solvers, e.g. an ``EnsembleMapper``. Default is
+        ``None`` which uses the map of Mystic solvers.
+    """
+
+    def __init__(self, map=None):
+        self.map = python_map if map is None else map
+        self.cost = None
+
+    def __getstate__(self):
+        """ Returns the state to pickle without the refinement plan.
+        """
+        return {"map" : self.map}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __call__(self, func, solvers, points, *iterables, **kwargs):
+        """ Maps a function over the nested solvers, their starting points,
+        and other arguments. A starting point is ``None`` if the nested
+        solver continues from its last step.
+
+        Returns
+        -------
+        list
+            A ``list`` of the values returned by the function.
+        """
+        points = list(points)
+        batch = [point for point in points if point is not None]
+        if batch and hasattr(self.cost, "prefetch"):
+            self.cost.prefetch(batch)
+        return self.map(func, solvers, points, *iterables, **kwargs)